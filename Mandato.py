@@ -1,16 +1,74 @@
 # app.py - Arquivo principal da aplicação
-from flask import Flask, render_template_string, request, redirect, url_for, session, flash
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, Response, stream_with_context, send_file, abort
 import os
+import secrets
+from datetime import date
+import tempfile
+import auth
+from senhas import ServicoSenhasOcupado
+from registro_templates import registrar_templates
+from estaticos import registrar_estaticos
+from listagens import LISTAGENS, inteiro_sqlite, ler_filtros, listar
+from exportacao import COLUNAS_EMENDAS, FORMATOS, exportar, formatos_disponiveis, nome_arquivo
+from importacao import importar_emendas, ler_planilha
+from busca import INDICES_BUSCA, buscar, destacar
+from contadores import CATEGORIAS_DEMANDAS, ler_contadores
+from resumos import DIMENSOES, relatorio
+from aniversarios import agendar_lembretes, obter_lembretes
+from calendario import (VISOES, etag_feed, gerar_ics, gerar_token, intervalo, ler_token,
+                        listar_intervalo)
+from migracoes import migrar
+from metricas import registrar_metricas
+from condicional import pagina_condicional, versao_conteudo
+from compressao import registrar_compressao
 
 app = Flask(__name__)
 app.secret_key = 'sua_chave_secreta_aqui'  # Mude para uma chave mais segura em produção
-
-# Dados dos usuários (em produção, use um banco de dados)
-users = {
-    'admin': generate_password_hash('admin'),
-    'usuario': generate_password_hash('admin123')
-}
+# Migrações pendentes do banco (com o banco em dia, só compara o user_version)
+migrar(auth.DATABASE)
+auth.init_app(app)
+registrar_metricas(app, auth.estatisticas_pool)
+registrar_compressao(app)
+
+# Formatação usada nas listagens
+@app.template_filter('data_br')
+def data_br(valor):
+    """Converte AAAA-MM-DD para DD/MM/AAAA"""
+    if not valor:
+        return ''
+    partes = str(valor)[:10].split('-')
+    if len(partes) != 3:
+        return valor
+    return '/'.join(reversed(partes))
+
+@app.template_filter('moeda')
+def moeda(valor):
+    """Formata valor em reais (R$ 1.234,56)"""
+    if valor is None or valor == '':
+        return '-'
+    try:
+        texto = f'{float(valor):,.2f}'
+    except (TypeError, ValueError):
+        return valor
+    return 'R$ ' + texto.replace(',', '_').replace('.', ',').replace('_', '.')
+
+@app.template_filter('iniciais')
+def iniciais(nome):
+    """Iniciais do primeiro e do último nome"""
+    partes = (nome or '').split()
+    if not partes:
+        return '?'
+    if len(partes) == 1:
+        return partes[0][:2].upper()
+    return (partes[0][0] + partes[-1][0]).upper()
+
+app.add_template_filter(destacar)
+
+@app.template_global()
+def total_registros(pagina):
+    """Total da listagem, indicando quando é estimado"""
+    total = f"{pagina['total']:,}".replace(',', '.')
+    return f'~{total}' if pagina['total_estimado'] else total
 
 # Template HTML principal
 HTML_TEMPLATE = '''
@@ -20,321 +78,7 @@ HTML_TEMPLATE = '''
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Sistema de Gestão</title>
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-
-        body {
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-            display: flex;
-        }
-
-        /* Sidebar */
-        .sidebar {
-            width: 250px;
-            background: linear-gradient(180deg, #2c3e50 0%, #34495e 100%);
-            box-shadow: 2px 0 10px rgba(0,0,0,0.1);
-            position: fixed;
-            height: 100vh;
-            left: 0;
-            top: 0;
-            transition: all 0.3s ease;
-        }
-
-        .sidebar-header {
-            padding: 30px 20px;
-            border-bottom: 1px solid #34495e;
-            text-align: center;
-        }
-
-        .sidebar-header h2 {
-            color: #ecf0f1;
-            font-size: 24px;
-            font-weight: 300;
-        }
-
-        .sidebar-menu {
-            padding: 20px 0;
-        }
-
-        .menu-item {
-            display: block;
-            padding: 15px 25px;
-            color: #bdc3c7;
-            text-decoration: none;
-            transition: all 0.3s ease;
-            border-left: 3px solid transparent;
-            font-size: 16px;
-        }
-
-        .menu-item:hover, .menu-item.active {
-            background: rgba(52, 152, 219, 0.1);
-            color: #3498db;
-            border-left-color: #3498db;
-            transform: translateX(5px);
-        }
-
-        .menu-item i {
-            margin-right: 12px;
-            width: 20px;
-        }
-
-        .logout-btn {
-            position: absolute;
-            bottom: 20px;
-            left: 20px;
-            right: 20px;
-            padding: 12px;
-            background: #e74c3c;
-            color: white;
-            text-decoration: none;
-            text-align: center;
-            border-radius: 5px;
-            transition: background 0.3s ease;
-        }
-
-        .logout-btn:hover {
-            background: #c0392b;
-        }
-
-        /* Main Content */
-        .main-content {
-            margin-left: 250px;
-            flex: 1;
-            padding: 30px;
-            background: rgba(255, 255, 255, 0.95);
-            min-height: 100vh;
-        }
-
-        .page-header {
-            margin-bottom: 30px;
-            padding-bottom: 20px;
-            border-bottom: 2px solid #ecf0f1;
-        }
-
-        .page-title {
-            font-size: 32px;
-            color: #2c3e50;
-            font-weight: 300;
-        }
-
-        .content-card {
-            background: white;
-            padding: 30px;
-            border-radius: 10px;
-            box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-            margin-bottom: 20px;
-        }
-
-        /* Login Page */
-        .login-container {
-            display: flex;
-            justify-content: center;
-            align-items: center;
-            min-height: 100vh;
-            margin: 0;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        }
-
-        .login-form {
-            background: white;
-            padding: 40px;
-            border-radius: 15px;
-            box-shadow: 0 15px 35px rgba(0,0,0,0.1);
-            width: 100%;
-            max-width: 400px;
-        }
-
-        .login-form h2 {
-            text-align: center;
-            margin-bottom: 30px;
-            color: #2c3e50;
-            font-weight: 300;
-        }
-
-        .form-group {
-            margin-bottom: 20px;
-        }
-
-        .form-group label {
-            display: block;
-            margin-bottom: 8px;
-            color: #555;
-            font-weight: 500;
-        }
-
-        .form-group input {
-            width: 100%;
-            padding: 12px 15px;
-            border: 2px solid #ddd;
-            border-radius: 8px;
-            font-size: 16px;
-            transition: border-color 0.3s ease;
-        }
-
-        .form-group input:focus {
-            outline: none;
-            border-color: #3498db;
-        }
-
-        .btn-login {
-            width: 100%;
-            padding: 12px;
-            background: linear-gradient(135deg, #3498db, #2980b9);
-            color: white;
-            border: none;
-            border-radius: 8px;
-            font-size: 16px;
-            cursor: pointer;
-            transition: transform 0.2s ease;
-        }
-
-        .btn-login:hover {
-            transform: translateY(-2px);
-        }
-
-        .btn-primary {
-            background: linear-gradient(135deg, #3498db, #2980b9);
-            color: white;
-            border: none;
-            padding: 10px 20px;
-            border-radius: 5px;
-            cursor: pointer;
-            text-decoration: none;
-            display: inline-block;
-            transition: transform 0.2s ease;
-            margin-right: 10px;
-        }
-
-        .btn-primary:hover {
-            transform: translateY(-2px);
-            color: white;
-            text-decoration: none;
-        }
-
-        .btn-danger {
-            background: linear-gradient(135deg, #e74c3c, #c0392b);
-            color: white;
-            border: none;
-            padding: 8px 15px;
-            border-radius: 5px;
-            cursor: pointer;
-            text-decoration: none;
-            display: inline-block;
-            transition: transform 0.2s ease;
-            font-size: 14px;
-        }
-
-        .btn-danger:hover {
-            transform: translateY(-2px);
-            color: white;
-            text-decoration: none;
-        }
-
-        .btn-success {
-            background: linear-gradient(135deg, #27ae60, #229954);
-            color: white;
-            border: none;
-            padding: 10px 20px;
-            border-radius: 5px;
-            cursor: pointer;
-            text-decoration: none;
-            display: inline-block;
-            transition: transform 0.2s ease;
-        }
-
-        .btn-success:hover {
-            transform: translateY(-2px);
-            color: white;
-            text-decoration: none;
-        }
-
-        .user-table {
-            width: 100%;
-            border-collapse: collapse;
-            margin-top: 20px;
-            background: white;
-            border-radius: 8px;
-            overflow: hidden;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-        }
-
-        .user-table th,
-        .user-table td {
-            padding: 15px;
-            text-align: left;
-            border-bottom: 1px solid #dee2e6;
-        }
-
-        .user-table th {
-            background: #f8f9fa;
-            font-weight: 600;
-            color: #2c3e50;
-        }
-
-        .user-table tbody tr:hover {
-            background: #f8f9fa;
-        }
-
-        .form-inline {
-            background: #f8f9fa;
-            padding: 20px;
-            border-radius: 8px;
-            margin-bottom: 30px;
-        }
-
-        .form-inline .form-group {
-            display: inline-block;
-            margin-right: 15px;
-            margin-bottom: 10px;
-        }
-
-        .form-inline input {
-            padding: 8px 12px;
-            border: 1px solid #ddd;
-            border-radius: 5px;
-            font-size: 14px;
-        }
-
-        .form-inline input:focus {
-            outline: none;
-            border-color: #3498db;
-        }
-
-        .alert-success {
-            padding: 12px;
-            margin-bottom: 20px;
-            border-radius: 5px;
-            background: #d1eddd;
-            color: #155724;
-            border: 1px solid #c3e6cb;
-        }
-
-        .alert {
-            padding: 12px;
-            margin-bottom: 20px;
-            border-radius: 5px;
-            background: #f8d7da;
-            color: #721c24;
-            border: 1px solid #f5c6cb;
-        }
-
-        /* Responsive */
-        @media (max-width: 768px) {
-            .sidebar {
-                transform: translateX(-100%);
-            }
-            
-            .main-content {
-                margin-left: 0;
-            }
-        }
-    </style>
+    <link rel="stylesheet" href="{{ asset_url('css/sistema.css') }}">
 </head>
 <body>
     {% if session.logged_in %}
@@ -358,6 +102,9 @@ HTML_TEMPLATE = '''
             <a href="{{ url_for('usuarios') }}" class="menu-item {{ 'active' if request.endpoint == 'usuarios' }}">
                 👤 Usuários
             </a>
+            <a href="{{ url_for('busca') }}" class="menu-item {{ 'active' if request.endpoint == 'busca' }}">
+                🔍 Pesquisa
+            </a>
         </nav>
         <a href="{{ url_for('logout') }}" class="logout-btn">Sair</a>
     </div>
@@ -368,12 +115,20 @@ HTML_TEMPLATE = '''
         </div>
         
         <div class="content-card">
-            {{ content | safe }}
+            {% with messages = get_flashed_messages(with_categories=true) %}
+                {% for category, message in messages %}
+                    <div class="alert {% if category == 'success' %}alert-success{% else %}alert{% endif %}">
+                        {{ message }}
+                    </div>
+                {% endfor %}
+            {% endwith %}
+            {% block content %}{{ content | safe }}{% endblock %}
         </div>
     </div>
     {% else %}
     <div class="login-container">
         <form method="POST" class="login-form">
+            <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
             <h2>Login do Sistema</h2>
             
             {% with messages = get_flashed_messages(with_categories=true) %}
@@ -397,12 +152,6 @@ HTML_TEMPLATE = '''
             </div>
             
             <button type="submit" class="btn-login">Entrar</button>
-            
-            <div style="margin-top: 20px; font-size: 14px; color: #666; text-align: center;">
-                <strong>Usuários de teste:</strong><br>
-                admin / admin<br>
-                usuario / admin123
-            </div>
         </form>
     </div>
     {% endif %}
@@ -410,240 +159,189 @@ HTML_TEMPLATE = '''
 </html>
 '''
 
-@app.route('/', methods=['GET', 'POST'])
-def login():
-    if request.method == 'POST':
-        username = request.form['username']
-        password = request.form['password']
-        
-        if username in users and check_password_hash(users[username], password):
-            session['logged_in'] = True
-            session['username'] = username
-            return redirect(url_for('agenda'))
-        else:
-            flash('Usuário ou senha incorretos!')
-    
-    return render_template_string(HTML_TEMPLATE)
-
-@app.route('/logout')
-def logout():
-    session.clear()
-    return redirect(url_for('login'))
-
-def login_required(f):
-    def decorated_function(*args, **kwargs):
-        if not session.get('logged_in'):
-            return redirect(url_for('login'))
-        return f(*args, **kwargs)
-    decorated_function.__name__ = f.__name__
-    return decorated_function
-
-@app.route('/agenda')
-@login_required
-def agenda():
-    content = """
+# Conteúdo de cada módulo
+AGENDA_TEMPLATE = '''
+{% extends 'base.html' %}
+{% from 'paginacao.html' import navegacao %}
+{% block content %}
     <h3>📅 Agenda de Compromissos</h3>
     <p>Bem-vindo à seção de Agenda! Aqui você pode gerenciar seus compromissos e eventos.</p>
     
+    {% if lembretes.hoje or lembretes.semana %}
+    <div style="margin-top: 20px; background: #fff8e1; padding: 20px; border-radius: 8px; border-left: 4px solid #f39c12;">
+        <h5 style="margin: 0 0 10px 0; color: #2c3e50;">🎂 Aniversários</h5>
+        {% for contato in lembretes.hoje %}
+        <div><strong>Hoje:</strong> {{ contato.nome }}{% if contato.idade %} ({{ contato.idade }} anos){% endif %}{% if contato.cidade %} - {{ contato.cidade }}{% endif %}</div>
+        {% endfor %}
+        {% for contato in lembretes.semana %}
+        <div><small style="color: #666;">{{ contato.dia | data_br }}</small> {{ contato.nome }}{% if contato.cidade %} - {{ contato.cidade }}{% endif %}</div>
+        {% endfor %}
+    </div>
+    {% endif %}
+    
     <div style="margin-top: 30px;">
-        <h4>Próximos Compromissos:</h4>
+        <h4>Compromissos ({{ total_registros(pagina) }}):</h4>
         <div style="background: #f8f9fa; padding: 20px; border-radius: 8px; margin-top: 15px;">
-            <div style="border-left: 4px solid #3498db; padding-left: 15px; margin-bottom: 15px;">
-                <strong>Reunião com a equipe</strong><br>
-                <small style="color: #666;">Hoje, 14:00 - Sala de Conferências</small>
-            </div>
-            <div style="border-left: 4px solid #e74c3c; padding-left: 15px; margin-bottom: 15px;">
-                <strong>Apresentação do projeto</strong><br>
-                <small style="color: #666;">Amanhã, 09:30 - Auditório Principal</small>
-            </div>
-            <div style="border-left: 4px solid #f39c12; padding-left: 15px;">
-                <strong>Revisão mensal</strong><br>
-                <small style="color: #666;">Sexta-feira, 16:00 - Online</small>
+            {% for item in pagina.itens %}
+            <div style="border-left: 4px solid {{ '#27ae60' if item.realizada else '#3498db' }}; padding-left: 15px; margin-bottom: 15px;">
+                <strong>{{ item.compromisso }}</strong><br>
+                <small style="color: #666;">{{ item.data | data_br }}{% if item.horario %}, {{ item.horario }}{% endif %}{% if item.local %} - {{ item.local }}{% endif %}{% if item.realizada %} | Realizada{% endif %}</small>
             </div>
+            {% else %}
+            <p style="color: #666;">Nenhum compromisso cadastrado.</p>
+            {% endfor %}
         </div>
+        {{ navegacao('agenda', pagina) }}
+        {% if feed_url %}
+        <p style="margin-top: 20px; color: #666; font-size: 13px;">📆 Assinar no calendário do celular: <code>{{ feed_url }}</code></p>
+        {% endif %}
     </div>
-    """
-    return render_template_string(HTML_TEMPLATE, page_title="Agenda", content=content)
+{% endblock %}
+'''
 
-@app.route('/contatos')
-@login_required
-def contatos():
-    content = """
+CONTATOS_TEMPLATE = '''
+{% extends 'base.html' %}
+{% from 'paginacao.html' import navegacao %}
+{% block content %}
     <h3>👥 Gerenciamento de Contatos</h3>
     <p>Gerencie todos os seus contatos importantes em um só lugar.</p>
     
     <div style="margin-top: 30px;">
-        <h4>Contatos Recentes:</h4>
+        <h4>Contatos ({{ total_registros(pagina) }}):</h4>
         <div style="background: #f8f9fa; padding: 20px; border-radius: 8px; margin-top: 15px;">
-            <div style="display: flex; align-items: center; padding: 15px; border-bottom: 1px solid #dee2e6;">
-                <div style="width: 50px; height: 50px; background: #3498db; border-radius: 50%; display: flex; align-items: center; justify-content: center; color: white; font-weight: bold; margin-right: 15px;">
-                    JS
-                </div>
-                <div>
-                    <strong>João Silva</strong><br>
-                    <small style="color: #666;">joao.silva@email.com | (11) 99999-9999</small>
-                </div>
-            </div>
-            <div style="display: flex; align-items: center; padding: 15px; border-bottom: 1px solid #dee2e6;">
-                <div style="width: 50px; height: 50px; background: #e74c3c; border-radius: 50%; display: flex; align-items: center; justify-content: center; color: white; font-weight: bold; margin-right: 15px;">
-                    MO
-                </div>
-                <div>
-                    <strong>Maria Oliveira</strong><br>
-                    <small style="color: #666;">maria.oliveira@email.com | (11) 88888-8888</small>
-                </div>
-            </div>
-            <div style="display: flex; align-items: center; padding: 15px;">
-                <div style="width: 50px; height: 50px; background: #f39c12; border-radius: 50%; display: flex; align-items: center; justify-content: center; color: white; font-weight: bold; margin-right: 15px;">
-                    PS
+            {% for item in pagina.itens %}
+            <div style="display: flex; align-items: center; padding: 15px;{% if not loop.last %} border-bottom: 1px solid #dee2e6;{% endif %}">
+                <div style="width: 50px; height: 50px; background: {{ loop.cycle('#3498db', '#e74c3c', '#f39c12') }}; border-radius: 50%; display: flex; align-items: center; justify-content: center; color: white; font-weight: bold; margin-right: 15px;">
+                    {{ item.nome | iniciais }}
                 </div>
                 <div>
-                    <strong>Pedro Santos</strong><br>
-                    <small style="color: #666;">pedro.santos@email.com | (11) 77777-7777</small>
+                    <strong>{{ item.nome }}</strong>{% if item.apelido %} ({{ item.apelido }}){% endif %}<br>
+                    <small style="color: #666;">{{ [item.cidade ~ ('/' ~ item.uf if item.uf else ''), item.empresa, item.cargo] | select | join(' | ') }}</small>
                 </div>
             </div>
+            {% else %}
+            <p style="color: #666;">Nenhum contato cadastrado.</p>
+            {% endfor %}
         </div>
+        {{ navegacao('contatos', pagina) }}
     </div>
-    """
-    return render_template_string(HTML_TEMPLATE, page_title="Contatos", content=content)
+{% endblock %}
+'''
 
-@app.route('/emendas')
-@login_required
-def emendas():
-    content = """
+EMENDAS_TEMPLATE = '''
+{% extends 'base.html' %}
+{% from 'paginacao.html' import navegacao %}
+{% block content %}
     <h3>📋 Controle de Emendas</h3>
     <p>Acompanhe o status e progresso das emendas parlamentares.</p>
     
+    <form method="GET" class="form-inline" style="margin-top: 20px; display: flex; gap: 15px; flex-wrap: wrap; align-items: end;">
+        <div class="form-group"><input type="number" name="ano" value="{{ pagina.filtros.ano }}" placeholder="Ano"></div>
+        <div class="form-group"><input type="text" name="situacao" value="{{ pagina.filtros.situacao }}" placeholder="Situação"></div>
+        <div class="form-group"><input type="text" name="cidade" value="{{ pagina.filtros.cidade }}" placeholder="Cidade"></div>
+        <div class="form-group"><input type="text" name="assessor" value="{{ pagina.filtros.assessor }}" placeholder="Assessor"></div>
+        <div class="form-group"><input type="text" name="regiao" value="{{ pagina.filtros.regiao }}" placeholder="Região"></div>
+        <div class="form-group">
+            <button type="submit" class="btn-primary">Filtrar</button>
+            {% for formato in formatos_exportacao %}
+            <a href="{{ url_for('exportar_emendas', formato=formato, **pagina.filtros) }}" class="btn-success">📥 {{ 'Excel' if formato == 'xlsx' else formato | upper }}</a>
+            {% endfor %}
+        </div>
+    </form>
+    
+    <form method="POST" action="{{ url_for('importar_emendas_planilha') }}" enctype="multipart/form-data" class="form-inline" style="display: flex; gap: 15px; align-items: end;">
+        <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
+        <div class="form-group"><input type="file" name="planilha" accept=".xlsx,.csv" required></div>
+        <div class="form-group"><button type="submit" class="btn-primary">📤 Importar Excel</button></div>
+    </form>
+    
     <div style="margin-top: 30px;">
-        <h4>Emendas em Andamento:</h4>
+        <h4>Emendas ({{ total_registros(pagina) }}):</h4>
         <div style="background: #f8f9fa; padding: 20px; border-radius: 8px; margin-top: 15px;">
-            <div style="background: white; padding: 20px; border-radius: 8px; margin-bottom: 15px; border-left: 4px solid #27ae60;">
-                <div style="display: flex; justify-content: between; align-items: center; margin-bottom: 10px;">
-                    <strong>Emenda Nº 2024/001 - Saúde Pública</strong>
-                    <span style="background: #27ae60; color: white; padding: 4px 12px; border-radius: 20px; font-size: 12px;">APROVADA</span>
-                </div>
-                <p style="color: #666; margin-bottom: 10px;">Recursos para ampliação de UBS no município</p>
-                <small style="color: #888;">Valor: R$ 2.500.000,00 | Prazo: 30/06/2025</small>
-            </div>
-            
-            <div style="background: white; padding: 20px; border-radius: 8px; margin-bottom: 15px; border-left: 4px solid #f39c12;">
-                <div style="display: flex; justify-content: between; align-items: center; margin-bottom: 10px;">
-                    <strong>Emenda Nº 2024/002 - Educação</strong>
-                    <span style="background: #f39c12; color: white; padding: 4px 12px; border-radius: 20px; font-size: 12px;">ANÁLISE</span>
-                </div>
-                <p style="color: #666; margin-bottom: 10px;">Construção de creche municipal</p>
-                <small style="color: #888;">Valor: R$ 1.800.000,00 | Prazo: 15/08/2025</small>
-            </div>
-            
-            <div style="background: white; padding: 20px; border-radius: 8px; border-left: 4px solid #3498db;">
-                <div style="display: flex; justify-content: between; align-items: center; margin-bottom: 10px;">
-                    <strong>Emenda Nº 2024/003 - Infraestrutura</strong>
-                    <span style="background: #3498db; color: white; padding: 4px 12px; border-radius: 20px; font-size: 12px;">TRAMITANDO</span>
+            {% for item in pagina.itens %}
+            <div style="background: white; padding: 20px; border-radius: 8px; margin-bottom: 15px; border-left: 4px solid {{ loop.cycle('#27ae60', '#f39c12', '#3498db') }};">
+                <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 10px;">
+                    <strong>Emenda Nº {{ item.numero }}/{{ item.ano }}{% if item.cidade %} - {{ item.cidade }}{% endif %}</strong>
+                    {% if item.situacao %}<span style="background: #3498db; color: white; padding: 4px 12px; border-radius: 20px; font-size: 12px;">{{ item.situacao | upper }}</span>{% endif %}
                 </div>
-                <p style="color: #666; margin-bottom: 10px;">Pavimentação de vias urbanas</p>
-                <small style="color: #888;">Valor: R$ 3.200.000,00 | Prazo: 20/09/2025</small>
+                <p style="color: #666; margin-bottom: 10px;">{{ item.objeto or '' }}</p>
+                <small style="color: #888;">Valor: {{ item.valor | moeda }} | Pago: {{ item.valor_pago | moeda }}{% if item.assessor %} | Assessor: {{ item.assessor }}{% endif %}</small>
             </div>
+            {% else %}
+            <p style="color: #666;">Nenhuma emenda cadastrada.</p>
+            {% endfor %}
         </div>
+        {{ navegacao('emendas', pagina) }}
     </div>
-    """
-    return render_template_string(HTML_TEMPLATE, page_title="Emendas", content=content)
+{% endblock %}
+'''
 
-@app.route('/demandas')
-@login_required
-def demandas():
-    content = """
+DEMANDAS_TEMPLATE = '''
+{% extends 'base.html' %}
+{% from 'paginacao.html' import navegacao %}
+{% block content %}
     <h3>📊 Gestão de Demandas</h3>
     <p>Controle e acompanhamento de todas as demandas recebidas.</p>
     
     <div style="margin-top: 30px;">
         <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 20px; margin-bottom: 30px;">
             <div style="background: #3498db; color: white; padding: 20px; border-radius: 10px; text-align: center;">
-                <h2 style="margin: 0; font-size: 36px;">47</h2>
+                <h2 style="margin: 0; font-size: 36px;">{{ contadores.total }}</h2>
                 <p style="margin: 5px 0 0 0;">Total de Demandas</p>
             </div>
-            <div style="background: #27ae60; color: white; padding: 20px; border-radius: 10px; text-align: center;">
-                <h2 style="margin: 0; font-size: 36px;">23</h2>
-                <p style="margin: 5px 0 0 0;">Resolvidas</p>
-            </div>
-            <div style="background: #f39c12; color: white; padding: 20px; border-radius: 10px; text-align: center;">
-                <h2 style="margin: 0; font-size: 36px;">18</h2>
-                <p style="margin: 5px 0 0 0;">Em Andamento</p>
-            </div>
-            <div style="background: #e74c3c; color: white; padding: 20px; border-radius: 10px; text-align: center;">
-                <h2 style="margin: 0; font-size: 36px;">6</h2>
-                <p style="margin: 5px 0 0 0;">Pendentes</p>
+            {% for chave, titulo, cor in categorias %}
+            <div style="background: {{ cor }}; color: white; padding: 20px; border-radius: 10px; text-align: center;">
+                <h2 style="margin: 0; font-size: 36px;">{{ contadores[chave] }}</h2>
+                <p style="margin: 5px 0 0 0;">{{ titulo }}</p>
             </div>
+            {% endfor %}
         </div>
         
-        <h4>Demandas Recentes:</h4>
+        <h4>Demandas ({{ total_registros(pagina) }}):</h4>
         <div style="background: #f8f9fa; padding: 20px; border-radius: 8px; margin-top: 15px;">
-            <div style="background: white; padding: 15px; border-radius: 8px; margin-bottom: 10px; border-left: 4px solid #e74c3c;">
-                <div style="display: flex; justify-content: between; align-items: center;">
-                    <div>
-                        <strong>Demanda #2024-089</strong> - Iluminação Pública<br>
-                        <small style="color: #666;">Rua das Flores, 123 | Solicitante: Ana Costa</small>
-                    </div>
-                    <span style="background: #e74c3c; color: white; padding: 4px 12px; border-radius: 20px; font-size: 12px;">URGENTE</span>
-                </div>
-            </div>
-            
-            <div style="background: white; padding: 15px; border-radius: 8px; margin-bottom: 10px; border-left: 4px solid #f39c12;">
-                <div style="display: flex; justify-content: between; align-items: center;">
+            {% for item in pagina.itens %}
+            {% set cor = '#27ae60' if item.situacao == 'concluida' else '#f39c12' %}
+            <div style="background: white; padding: 15px; border-radius: 8px; margin-bottom: 10px; border-left: 4px solid {{ cor }};">
+                <div style="display: flex; justify-content: space-between; align-items: center;">
                     <div>
-                        <strong>Demanda #2024-088</strong> - Buraco na Via<br>
-                        <small style="color: #666;">Av. Principal, 456 | Solicitante: Carlos Lima</small>
+                        <strong>Demanda #{{ item.id }}</strong> - {{ item.demanda }}<br>
+                        <small style="color: #666;">Solicitante: {{ item.solicitante }} | Início: {{ item.data_inicial | data_br }}{% if item.andamento %} | {{ item.andamento }}{% endif %}</small>
                     </div>
-                    <span style="background: #f39c12; color: white; padding: 4px 12px; border-radius: 20px; font-size: 12px;">PROGRESSO</span>
-                </div>
-            </div>
-            
-            <div style="background: white; padding: 15px; border-radius: 8px; border-left: 4px solid #27ae60;">
-                <div style="display: flex; justify-content: between; align-items: center;">
-                    <div>
-                        <strong>Demanda #2024-087</strong> - Poda de Árvore<br>
-                        <small style="color: #666;">Rua Verde, 789 | Solicitante: Maria Silva</small>
-                    </div>
-                    <span style="background: #27ae60; color: white; padding: 4px 12px; border-radius: 20px; font-size: 12px;">CONCLUÍDA</span>
+                    <span style="background: {{ cor }}; color: white; padding: 4px 12px; border-radius: 20px; font-size: 12px;">{{ 'CONCLUÍDA' if item.situacao == 'concluida' else 'ABERTA' }}</span>
                 </div>
             </div>
+            {% else %}
+            <p style="color: #666;">Nenhuma demanda cadastrada.</p>
+            {% endfor %}
         </div>
+        {{ navegacao('demandas', pagina) }}
     </div>
-    """
-    return render_template_string(HTML_TEMPLATE, page_title="Demandas", content=content)
+{% endblock %}
+'''
 
-@app.route('/usuarios', methods=['GET', 'POST'])
-@login_required
-def usuarios():
-    if request.method == 'POST':
-        username = request.form['username'].strip()
-        password = request.form['password'].strip()
-        
-        if not username or not password:
-            flash('Usuário e senha são obrigatórios!', 'error')
-        elif username in users:
-            flash('Usuário já existe!', 'error')
-        else:
-            users[username] = generate_password_hash(password)
-            flash(f'Usuário "{username}" criado com sucesso!', 'success')
-    
-    users_list = []
-    for username in users.keys():
-        users_list.append({
-            'username': username,
-            'can_delete': username != session.get('username')  # Não pode deletar a si mesmo
-        })
-    
-    content = f"""
+USUARIOS_TEMPLATE = '''
+{% extends 'base.html' %}
+{% block content %}
     <h3>👤 Gerenciamento de Usuários</h3>
     <p>Adicione ou remova usuários do sistema.</p>
     
+    {% if pode_adicionar %}
     <div class="form-inline">
         <h4 style="margin-bottom: 20px;">Adicionar Novo Usuário</h4>
         <form method="POST" style="display: flex; align-items: end; gap: 15px; flex-wrap: wrap;">
+            <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
             <div class="form-group">
                 <label for="username" style="display: block; margin-bottom: 5px; font-weight: 500;">Usuário:</label>
                 <input type="text" id="username" name="username" required placeholder="Digite o usuário">
             </div>
+            <div class="form-group">
+                <label for="nome" style="display: block; margin-bottom: 5px; font-weight: 500;">Nome:</label>
+                <input type="text" id="nome" name="nome" placeholder="Nome completo">
+            </div>
+            <div class="form-group">
+                <label for="email" style="display: block; margin-bottom: 5px; font-weight: 500;">E-mail:</label>
+                <input type="email" id="email" name="email" required placeholder="email@exemplo.com">
+            </div>
             <div class="form-group">
                 <label for="password" style="display: block; margin-bottom: 5px; font-weight: 500;">Senha:</label>
                 <input type="password" id="password" name="password" required placeholder="Digite a senha">
@@ -655,42 +353,39 @@ def usuarios():
             </div>
         </form>
     </div>
+    {% endif %}
     
     <h4>Usuários Cadastrados</h4>
     <table class="user-table">
         <thead>
             <tr>
                 <th>👤 Usuário</th>
+                <th>📛 Nome</th>
+                <th>📧 E-mail</th>
                 <th>📅 Status</th>
                 <th>⚙️ Ações</th>
             </tr>
         </thead>
         <tbody>
-    """
-    
-    for user in users_list:
-        status_badge = '🟢 Ativo' if user['username'] == session.get('username') else '🔵 Ativo'
-        delete_button = ''
-        if user['can_delete']:
-            delete_button = f'''
-                <a href="/delete_user/{user['username']}" 
-                   class="btn-danger" 
-                   onclick="return confirm('Tem certeza que deseja excluir o usuário {user['username']}?')">
-                    🗑️ Excluir
-                </a>
-            '''
-        else:
-            delete_button = '<span style="color: #999; font-size: 12px;">Usuário atual</span>'
-            
-        content += f"""
+        {% for user in users_list %}
             <tr>
-                <td><strong>{user['username']}</strong></td>
-                <td>{status_badge}</td>
-                <td>{delete_button}</td>
+                <td><strong>{{ user.username }}</strong></td>
+                <td>{{ user.nome }}</td>
+                <td>{{ user.email }}</td>
+                <td>{% if not user.ativo %}⚪ Inativo{% elif user.username == session.username %}🟢 Ativo{% else %}🔵 Ativo{% endif %}</td>
+                <td>
+                {% if user.can_delete %}
+                    <form method="POST" action="{{ url_for('delete_user', username=user.username) }}" style="display: inline;"
+                          onsubmit="return confirm('Tem certeza que deseja excluir o usuário {{ user.username }}?')">
+                        <input type="hidden" name="csrf_token" value="{{ csrf_token() }}">
+                        <button type="submit" class="btn-danger">🗑️ Excluir</button>
+                    </form>
+                {% elif user.username == session.username %}
+                    <span style="color: #999; font-size: 12px;">Usuário atual</span>
+                {% endif %}
+                </td>
             </tr>
-        """
-    
-    content += """
+        {% endfor %}
         </tbody>
     </table>
     
@@ -703,20 +398,368 @@ def usuarios():
             <li>Você não pode excluir seu próprio usuário</li>
         </ul>
     </div>
-    """
+{% endblock %}
+'''
+
+BUSCA_TEMPLATE = '''
+{% extends 'base.html' %}
+{% block content %}
+    <h3>🔍 Pesquisa</h3>
+    <p>Pesquise contatos, emendas e demandas por nome, objeto, endereço e outros campos.</p>
+    
+    <form method="GET" class="form-inline" style="margin-top: 20px; display: flex; gap: 15px; align-items: end;">
+        <div class="form-group">
+            <input type="text" name="q" value="{{ q }}" placeholder="Digite o termo de busca" autofocus>
+        </div>
+        <div class="form-group">
+            <button type="submit" class="btn-primary">Pesquisar</button>
+        </div>
+    </form>
+    
+    {% for modulo, itens in resultados.items() %}
+    <h4 style="margin-top: 20px;">{{ modulo | capitalize }} ({{ itens | length }})</h4>
+    <div style="background: #f8f9fa; padding: 20px; border-radius: 8px; margin-top: 15px;">
+        {% for item in itens %}
+        <div style="border-left: 4px solid #3498db; padding-left: 15px; margin-bottom: 15px;">
+            <a href="{{ url_for(modulo) }}"><strong>{{ item.titulo }}</strong></a>{% if item.detalhe %} - {{ item.detalhe }}{% endif %}<br>
+            <small style="color: #666;">{{ item.trecho | destacar }}</small>
+        </div>
+        {% else %}
+        <p style="color: #666;">Nenhum resultado.</p>
+        {% endfor %}
+    </div>
+    {% endfor %}
+{% endblock %}
+'''
+
+IMPORTACAO_TEMPLATE = '''
+{% extends 'base.html' %}
+{% block content %}
+    <h3>📤 Importação de Emendas</h3>
+    {% if erro %}
+    <div class="alert">{{ erro }}</div>
+    {% else %}
+    <div class="alert-success">Importação concluída em {{ '%.1f' | format(resumo.segundos) }}s.</div>
+    <table class="user-table">
+        <tbody>
+            <tr><th>Linhas processadas</th><td>{{ resumo.linhas }}</td></tr>
+            <tr><th>Inseridas</th><td>{{ resumo.inseridas }}</td></tr>
+            <tr><th>Atualizadas</th><td>{{ resumo.atualizadas }}</td></tr>
+            <tr><th>Rejeitadas</th><td>{{ resumo.erros }}</td></tr>
+        </tbody>
+    </table>
+    {% if token_erros %}
+    <p style="margin-top: 20px;"><a href="{{ url_for('erros_importacao', token=token_erros) }}" class="btn-danger">📄 Baixar linhas rejeitadas</a></p>
+    {% endif %}
+    {% endif %}
+    <p style="margin-top: 20px;"><a href="{{ url_for('emendas') }}" class="btn-primary">Voltar para Emendas</a></p>
+{% endblock %}
+'''
+
+PAGINACAO_TEMPLATE = '''
+{% macro navegacao(endpoint, pagina) %}
+    <div style="margin-top: 20px; display: flex; gap: 10px;">
+        {% if not pagina.primeira %}
+        <a href="{{ url_for(endpoint, tamanho=pagina.tamanho, **pagina.filtros) }}" class="btn-primary">⏮ Início</a>
+        {% endif %}
+        {% if pagina.proximo %}
+        <a href="{{ url_for(endpoint, cursor=pagina.proximo, tamanho=pagina.tamanho, **pagina.filtros) }}" class="btn-primary">Próxima página ▶</a>
+        {% endif %}
+    </div>
+{% endmacro %}
+'''
+
+# Templates compilados uma única vez na inicialização
+TEMPLATES = {
+    'base.html': HTML_TEMPLATE,
+    'paginacao.html': PAGINACAO_TEMPLATE,
+    'agenda.html': AGENDA_TEMPLATE,
+    'contatos.html': CONTATOS_TEMPLATE,
+    'emendas.html': EMENDAS_TEMPLATE,
+    'demandas.html': DEMANDAS_TEMPLATE,
+    'usuarios.html': USUARIOS_TEMPLATE,
+    'busca.html': BUSCA_TEMPLATE,
+    'importacao.html': IMPORTACAO_TEMPLATE,
+}
+
+manifesto_estaticos = registrar_estaticos(app, ['css/sistema.css'])
+registrar_templates(app, TEMPLATES)
+app.config['VERSAO_PAGINAS'] = versao_conteudo(TEMPLATES, manifesto_estaticos)
+
+# Lembretes de aniversário calculados na inicialização e a cada virada de dia
+_conn = auth.conectar_db()
+try:
+    obter_lembretes(_conn)
+finally:
+    auth.devolver_db(_conn)
+agendar_lembretes(auth.conectar_db, auth.devolver_db)
+
+@app.route('/', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        username = request.form['username']
+        password = request.form['password']
+        
+        try:
+            usuario = auth.verificar_login(username, password)
+        except ServicoSenhasOcupado:
+            flash('Muitos acessos no momento. Tente novamente em instantes.')
+            return render_template('base.html'), 503
+        
+        if usuario:
+            session['logged_in'] = True
+            session['user_id'] = usuario['id']
+            session['username'] = usuario['username']
+            return redirect(url_for('agenda'))
+        else:
+            flash('Usuário ou senha incorretos!')
+    
+    return render_template('base.html')
+
+@app.route('/logout')
+def logout():
+    session.clear()
+    return redirect(url_for('login'))
+
+def login_required(f):
+    def decorated_function(*args, **kwargs):
+        if not session.get('logged_in'):
+            return redirect(url_for('login'))
+        return f(*args, **kwargs)
+    decorated_function.__name__ = f.__name__
+    return decorated_function
+
+def obter_pagina(modulo):
+    """Obtém a página da listagem pedida nos parâmetros cursor e tamanho"""
+    return listar(auth.get_db(), modulo,
+                  cursor=request.args.get('cursor'),
+                  tamanho=request.args.get('tamanho'),
+                  filtros=ler_filtros(modulo, request.args))
+
+@app.route('/api/<modulo>')
+@login_required
+def api_listagem(modulo):
+    if modulo not in LISTAGENS:
+        return jsonify({'erro': 'Módulo não encontrado'}), 404
+    return jsonify(obter_pagina(modulo))
+
+@app.route('/busca')
+@login_required
+def busca():
+    q = request.args.get('q', '').strip()
+    resultados = buscar(auth.get_db(), q) if q else {}
+    return render_template('busca.html', page_title="Pesquisa", q=q, resultados=resultados)
+
+@app.route('/api/busca')
+@login_required
+def api_busca():
+    modulos = [m for m in request.args.getlist('modulo') if m in INDICES_BUSCA] or None
+    resultados = buscar(auth.get_db(), request.args.get('q', ''), modulos)
+    for itens in resultados.values():
+        for item in itens:
+            item['trecho'] = str(destacar(item['trecho']))
+    return jsonify(resultados)
+
+@app.route('/agenda')
+@login_required
+@pagina_condicional('agenda', 'contatos')
+def agenda():
+    pagina = obter_pagina('agenda')
+    lembretes = obter_lembretes(auth.get_db())
+    feed_url = None
+    if 'user_id' in session:
+        feed_url = url_for('feed_agenda', token=gerar_token(app.secret_key, session['user_id']),
+                           _external=True)
+    return render_template('agenda.html', page_title="Agenda", pagina=pagina, lembretes=lembretes,
+                           feed_url=feed_url)
+
+@app.route('/api/agenda')
+@login_required
+def api_agenda():
+    visao = request.args.get('visao', 'semana')
+    if visao not in VISOES:
+        return jsonify({'erro': f'Use visao={"|".join(VISOES)}'}), 400
+    try:
+        referencia = date.fromisoformat(request.args['data']) if request.args.get('data') else date.today()
+    except ValueError:
+        return jsonify({'erro': 'Data inválida (use AAAA-MM-DD)'}), 400
+    
+    inicio, fim, anterior, proximo = intervalo(visao, referencia)
+    return jsonify({
+        'visao': visao,
+        'inicio': inicio.isoformat(),
+        'fim': fim.isoformat(),
+        'anterior': anterior.isoformat(),
+        'proximo': proximo.isoformat(),
+        'itens': listar_intervalo(auth.get_db(), inicio, fim),
+    })
+
+@app.route('/agenda/feed/<token>.ics')
+def feed_agenda(token):
+    # Sem login_required: aplicativos de calendário se identificam pelo token da URL
+    user_id = ler_token(app.secret_key, token)
+    usuario = auth.obter_usuario_por_id(user_id) if isinstance(user_id, int) else None
+    if usuario is None or not usuario['ativo']:
+        abort(404)
+    
+    conn = auth.get_db()
+    etag = etag_feed(conn)
+    if request.if_none_match.contains_weak(etag):
+        # Agenda sem alterações: responde sem ler nenhum compromisso
+        resposta = Response(status=304)
+    else:
+        resposta = Response(stream_with_context(gerar_ics(conn)), mimetype='text/calendar')
+        resposta.headers['Content-Disposition'] = 'inline; filename="agenda.ics"'
+    resposta.set_etag(etag, weak=True)
+    resposta.headers['Cache-Control'] = 'private, no-cache'
+    return resposta
+
+@app.route('/api/aniversarios')
+@login_required
+def api_aniversarios():
+    return jsonify(obter_lembretes(auth.get_db()))
+
+@app.route('/contatos')
+@login_required
+def contatos():
+    pagina = obter_pagina('contatos')
+    return render_template('contatos.html', page_title="Contatos", pagina=pagina)
+
+@app.route('/emendas')
+@login_required
+@pagina_condicional('emendas')
+def emendas():
+    pagina = obter_pagina('emendas')
+    return render_template('emendas.html', page_title="Emendas", pagina=pagina,
+                           formatos_exportacao=formatos_disponiveis())
+
+@app.route('/emendas/exportar')
+@login_required
+def exportar_emendas():
+    formato = request.args.get('formato', 'xlsx')
+    if formato not in formatos_disponiveis():
+        flash('Formato de exportação indisponível.', 'error')
+        return redirect(url_for('emendas'))
+    
+    filtros = ler_filtros('emendas', request.args)
+    conteudo = exportar(auth.get_db(), 'emendas', COLUNAS_EMENDAS, formato, filtros)
+    return Response(stream_with_context(conteudo), mimetype=FORMATOS[formato], headers={
+        'Content-Disposition': f'attachment; filename={nome_arquivo("emendas", formato)}'
+    })
+
+# Arquivos com as linhas rejeitadas nas importações
+PASTA_IMPORTACOES = os.path.join(tempfile.gettempdir(), 'mandato_importacoes')
+
+@app.route('/emendas/importar', methods=['POST'])
+@login_required
+def importar_emendas_planilha():
+    arquivo = request.files.get('planilha')
+    if not arquivo or not arquivo.filename.lower().endswith(('.xlsx', '.csv')):
+        return render_template('importacao.html', page_title="Emendas",
+                               erro='Envie uma planilha .xlsx ou .csv.')
+    
+    os.makedirs(PASTA_IMPORTACOES, exist_ok=True)
+    token = secrets.token_hex(16)
+    caminho_planilha = os.path.join(PASTA_IMPORTACOES, f'{token}_{os.path.splitext(arquivo.filename)[1].lower()}')
+    caminho_erros = os.path.join(PASTA_IMPORTACOES, f'{token}.csv')
+    arquivo.save(caminho_planilha)
+    
+    try:
+        with open(caminho_erros, 'w', newline='', encoding='utf-8-sig') as erros:
+            resumo = importar_emendas(auth.get_db(), ler_planilha(caminho_planilha), erros)
+    except (ValueError, RuntimeError) as e:
+        os.remove(caminho_erros)
+        return render_template('importacao.html', page_title="Emendas", erro=str(e))
+    finally:
+        os.remove(caminho_planilha)
+    
+    if not resumo['erros']:
+        os.remove(caminho_erros)
+        token = None
+    return render_template('importacao.html', page_title="Emendas", resumo=resumo, token_erros=token)
+
+@app.route('/emendas/importar/erros/<token>')
+@login_required
+def erros_importacao(token):
+    caminho = os.path.join(PASTA_IMPORTACOES, f'{token}.csv')
+    if not token.isalnum() or not os.path.exists(caminho):
+        abort(404)
+    return send_file(caminho, mimetype='text/csv', as_attachment=True,
+                     download_name=f'erros_importacao_{token[:8]}.csv')
+
+@app.route('/api/emendas/resumo')
+@login_required
+def resumo_emendas():
+    dimensao = request.args.get('por', 'ano')
+    if dimensao not in DIMENSOES:
+        return jsonify({'erro': f'Use por={"|".join(DIMENSOES)}'}), 400
+    ano = request.args.get('ano', '').strip() or None
+    if ano is not None:
+        try:
+            ano = inteiro_sqlite(ano)
+        except ValueError:
+            return jsonify({'erro': 'Ano inválido'}), 400
+    return jsonify(relatorio(auth.get_db(), dimensao, ano))
+
+@app.route('/demandas')
+@login_required
+@pagina_condicional('demandas')
+def demandas():
+    pagina = obter_pagina('demandas')
+    contadores = ler_contadores(auth.get_db())
+    return render_template('demandas.html', page_title="Demandas", pagina=pagina,
+                           contadores=contadores, categorias=CATEGORIAS_DEMANDAS)
+
+@app.route('/usuarios', methods=['GET', 'POST'])
+@login_required
+@auth.verificar_permissao('usuarios')
+def usuarios():
+    pode_adicionar = auth.tem_permissao('usuarios', 'adicionar')
+    pode_excluir = auth.tem_permissao('usuarios', 'excluir')
+    if request.method == 'POST' and not pode_adicionar:
+        flash('Você não tem permissão para adicionar no módulo usuarios.', 'error')
+    elif request.method == 'POST':
+        username = request.form['username'].strip()
+        nome = request.form.get('nome', '').strip() or username
+        email = request.form.get('email', '').strip()
+        password = request.form['password'].strip()
+        
+        if not username or not password or not email:
+            flash('Usuário, e-mail e senha são obrigatórios!', 'error')
+        else:
+            try:
+                sucesso, mensagem = auth.criar_usuario(username, nome, email, password, {})
+            except ServicoSenhasOcupado:
+                sucesso, mensagem = False, 'Sistema ocupado. Tente novamente em instantes.'
+            if sucesso:
+                flash(f'Usuário "{username}" criado com sucesso!', 'success')
+            else:
+                flash(mensagem, 'error')
     
-    return render_template_string(HTML_TEMPLATE, page_title="Usuários", content=content)
+    users_list = []
+    for usuario in auth.listar_usuarios():
+        # Não pode deletar a si mesmo
+        usuario['can_delete'] = pode_excluir and usuario['username'] != session.get('username')
+        users_list.append(usuario)
+    
+    return render_template('usuarios.html', page_title="Usuários", users_list=users_list,
+                           pode_adicionar=pode_adicionar)
 
-@app.route('/delete_user/<username>')
+@app.route('/delete_user/<username>', methods=['POST'])
 @login_required
+@auth.verificar_permissao('usuarios', 'excluir')
 def delete_user(username):
+    usuario = auth.obter_usuario(username)
     if username == session.get('username'):
         flash('Você não pode excluir seu próprio usuário!', 'error')
-    elif username not in users:
+    elif usuario is None:
         flash('Usuário não encontrado!', 'error')
     else:
-        del users[username]
-        flash(f'Usuário "{username}" excluído com sucesso!', 'success')
+        sucesso, mensagem = auth.excluir_usuario(usuario['id'])
+        if sucesso:
+            flash(f'Usuário "{username}" excluído com sucesso!', 'success')
+        else:
+            flash(mensagem, 'error')
     
     return redirect(url_for('usuarios'))
 
@@ -0,0 +1,160 @@
+# aniversarios.py - Lembretes de aniversário dos contatos, por dia do ano indexado
+import sys
+import threading
+from datetime import date, datetime, timedelta
+
+# Quantos dias à frente entram nos lembretes semanais
+DIAS_SEMANA = 7
+
+# Dia do ano no formato MMDD (612 = 12/06): a chave não depende de o ano ser
+# bissexto e a ordem numérica é a ordem do calendário
+SQL_COLUNA_DIA = '''ALTER TABLE contatos ADD COLUMN aniversario_dia INTEGER
+    GENERATED ALWAYS AS (CAST(strftime('%m%d', aniversario) AS INTEGER)) VIRTUAL'''
+# Só contatos com lembrete entram no índice
+SQL_INDICE_DIA = '''CREATE INDEX IF NOT EXISTS idx_contatos_aniversario_dia
+    ON contatos(aniversario_dia) WHERE lembrete IS NOT NULL'''
+
+_cache = {}  # (data, versão dos contatos) -> lembretes (apenas a chave atual é mantida)
+_cache_lock = threading.Lock()
+_agendamento = None
+
+def criar_indice_aniversarios(conn):
+    """Cria a coluna aniversario_dia e o índice (migração; não faz commit)"""
+    colunas = {row[1] for row in conn.execute('PRAGMA table_xinfo(contatos)')}
+    if 'aniversario_dia' not in colunas:
+        conn.execute(SQL_COLUNA_DIA)
+    conn.execute(SQL_INDICE_DIA)
+
+def _chave(dia):
+    return dia.month * 100 + dia.day
+
+def _bissexto(ano):
+    return ano % 4 == 0 and (ano % 100 != 0 or ano % 400 == 0)
+
+def _faixas(hoje, dias):
+    """Faixas de chaves MMDD de hoje até hoje + dias (duas se passar da virada do ano)"""
+    fim = hoje + timedelta(days=dias)
+    if fim.year == hoje.year:
+        faixas = [(_chave(hoje), _chave(fim))]
+    else:
+        faixas = [(_chave(hoje), 1231), (101, _chave(fim))]
+    # Fora de ano bissexto, quem nasceu em 29/02 é lembrado em 28/02
+    return [(inicio, 229 if f == 228 and not _bissexto(hoje.year) else f)
+            for inicio, f in faixas]
+
+def _proximo_aniversario(nascimento, hoje):
+    """Data do próximo aniversário a partir de hoje (29/02 vira 28/02 fora de ano bissexto)"""
+    for ano in (hoje.year, hoje.year + 1):
+        dia = nascimento.day
+        if nascimento.month == 2 and dia == 29 and not _bissexto(ano):
+            dia = 28
+        proximo = date(ano, nascimento.month, dia)
+        if proximo >= hoje:
+            return proximo
+
+def calcular_lembretes(conn, hoje=None, dias=DIAS_SEMANA):
+    """Calcula os lembretes do dia com uma consulta por faixa de dia do ano
+
+    'hoje' traz os aniversariantes do dia (lembrete diário ou semanal);
+    'semana' traz os próximos `dias` dias de quem pediu lembrete semanal.
+    """
+    hoje = hoje or date.today()
+    faixas = _faixas(hoje, dias)
+    # UNION ALL em vez de OR: cada faixa vira uma busca no índice (com OR o
+    # SQLite percorreria o índice inteiro)
+    sql = ' UNION ALL '.join('''
+        SELECT id, nome, apelido, cidade, aniversario, lembrete
+        FROM contatos
+        WHERE lembrete IS NOT NULL AND aniversario_dia BETWEEN ? AND ?''' for _ in faixas)
+    cursor = conn.execute(sql, [chave for faixa in faixas for chave in faixa])
+    nomes = [d[0] for d in cursor.description]
+
+    resultado = {'data': hoje.isoformat(), 'hoje': [], 'semana': [],
+                 'gerado_em': datetime.now().isoformat(timespec='seconds')}
+    for row in cursor:
+        contato = dict(zip(nomes, row))
+        try:
+            nascimento = date.fromisoformat(contato['aniversario'][:10])
+        except ValueError:
+            # O SQLite aceita datas inválidas como 1990-02-30 (e strftime ainda
+            # gera a chave 230); esses contatos ficam sem lembrete
+            continue
+        proximo = _proximo_aniversario(nascimento, hoje)
+        contato['dia'] = proximo.isoformat()
+        contato['faltam'] = (proximo - hoje).days
+        # Datas sem o ano de nascimento costumam ser gravadas com o ano atual
+        contato['idade'] = proximo.year - nascimento.year if nascimento.year < hoje.year else None
+        if contato['faltam'] == 0:
+            resultado['hoje'].append(contato)
+        elif contato['faltam'] <= dias and contato['lembrete'] == 'semanal':
+            resultado['semana'].append(contato)
+
+    resultado['hoje'].sort(key=lambda c: c['nome'])
+    resultado['semana'].sort(key=lambda c: (c['faltam'], c['nome']))
+    return resultado
+
+def _versao_contatos(conn):
+    """Contador de cache_versoes que muda quando nome, cidade, aniversário ou
+    lembrete de algum contato muda (triggers criados em condicional.py)"""
+    row = conn.execute("SELECT versao FROM cache_versoes WHERE nome = 'contatos'").fetchone()
+    return row[0] if row else None
+
+def obter_lembretes(conn, hoje=None):
+    """Lembretes do dia, mantidos em cache até o dia virar ou os contatos mudarem"""
+    chave = (hoje or date.today(), _versao_contatos(conn))
+    with _cache_lock:
+        if chave in _cache:
+            return _cache[chave]
+    lembretes = calcular_lembretes(conn, chave[0])
+    with _cache_lock:
+        _cache.clear()
+        _cache[chave] = lembretes
+    return lembretes
+
+def agendar_lembretes(conectar, devolver):
+    """Recalcula os lembretes logo após cada meia-noite, em uma thread de fundo
+
+    `conectar`/`devolver` obtêm e devolvem uma conexão (ex.: auth.conectar_db).
+    """
+    global _agendamento
+
+    def executar():
+        try:
+            conn = conectar()
+            try:
+                obter_lembretes(conn)
+            finally:
+                devolver(conn)
+        finally:
+            # Mesmo se o cálculo falhar, a próxima meia-noite continua agendada
+            agendar_lembretes(conectar, devolver)
+
+    amanha = datetime.combine(date.today() + timedelta(days=1), datetime.min.time())
+    segundos = (amanha - datetime.now()).total_seconds() + 60
+    _agendamento = threading.Timer(segundos, executar)
+    _agendamento.daemon = True
+    _agendamento.start()
+    return _agendamento
+
+def main():
+    """Linha de comando: python aniversarios.py [AAAA-MM-DD]"""
+    import auth
+    from migracoes import migrar
+
+    hoje = date.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else date.today()
+    migrar(auth.DATABASE)
+    conn = auth.conectar_db()
+    try:
+        lembretes = calcular_lembretes(conn, hoje)
+    finally:
+        auth.devolver_db(conn)
+
+    print(f"🎂 Aniversariantes de {hoje.strftime('%d/%m/%Y')}: {len(lembretes['hoje'])}")
+    for contato in lembretes['hoje']:
+        print(f"   {contato['nome']}")
+    print(f"📅 Próximos {DIAS_SEMANA} dias: {len(lembretes['semana'])}")
+    for contato in lembretes['semana']:
+        print(f"   {date.fromisoformat(contato['dia']).strftime('%d/%m')} {contato['nome']}")
+
+if __name__ == '__main__':
+    main()
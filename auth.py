@@ -1,18 +1,50 @@
 # auth.py - Sistema de autenticação e permissões
 
+import hmac
+import secrets
 import sqlite3
-import hashlib
+import threading
+from collections import OrderedDict
 from functools import wraps
-from flask import session, flash, redirect, url_for, request, g
+from flask import session, flash, redirect, url_for, request, g, has_app_context, abort
+from banco import PoolConexoes
+from metricas import ConexaoMedida
+import permissoes
+from permissoes import TabelaPermissoes
+import senhas
 
 # Configuração do banco
 DATABASE = 'sistema.db'
+POOL_TAMANHO = 8
+POOL_TIMEOUT = 30.0
+SQLITE_PERFIL = 'padrao'  # ver banco.PERFIS_SQLITE
+TABELAS_QUENTES = ['usuarios']
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def obter_pool():
+    """Retorna o pool de conexões, criando-o no primeiro uso"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.database != DATABASE:
+            if _pool is not None:
+                _pool.fechar()
+            _pool = PoolConexoes(DATABASE, POOL_TAMANHO, POOL_TIMEOUT, SQLITE_PERFIL,
+                                 ConexaoMedida)
+        return _pool
+
+def estatisticas_pool():
+    """Retorna estatísticas do pool de conexões"""
+    return obter_pool().estatisticas()
 
 def conectar_db():
-    """Conecta ao banco de dados"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Obtém uma conexão do pool (devolver com devolver_db)"""
+    return obter_pool().obter()
+
+def devolver_db(conn):
+    """Devolve a conexão ao pool"""
+    obter_pool().devolver(conn)
 
 def get_db():
     """Obtém conexão do banco para o contexto da aplicação"""
@@ -20,77 +52,192 @@ def get_db():
         g.db = conectar_db()
     return g.db
 
-def close_db():
-    """Fecha a conexão do banco"""
+def close_db(e=None):
+    """Devolve ao pool a conexão do contexto da aplicação"""
     db = g.pop('db', None)
     if db is not None:
-        db.close()
+        devolver_db(db)
+
+def init_app(app):
+    """Registra o ciclo de vida da conexão do banco e a verificação de CSRF na aplicação"""
+    app.teardown_appcontext(close_db)
+    app.before_request(verificar_csrf)
+    app.jinja_env.globals['csrf_token'] = token_csrf
+    obter_pool().aquecer(TABELAS_QUENTES)
 
 # Funções de autenticação
 def hash_password(password):
-    """Gera hash da senha"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Gera hash da senha (ver senhas.py)"""
+    return senhas.gerar_hash(password)
 
 def verificar_login(username, password):
-    """Verifica login do usuário"""
-    conn = conectar_db()
-    cursor = conn.cursor()
+    """Verifica login do usuário
     
-    password_hash = hash_password(password)
+    O hash é verificado fora da conexão do banco, no pool do serviço de
+    senhas. Hashes legados (SHA-256) ou com custo antigo são regravados
+    com o KDF atual após um login bem-sucedido.
+    """
+    usuario = obter_usuario(username)
+    if usuario is not None and not usuario['ativo']:
+        usuario = None
     
-    cursor.execute('''
-        SELECT id, username, nome, email, ativo 
-        FROM usuarios 
-        WHERE username = ? AND password = ? AND ativo = 1
-    ''', (username, password_hash))
+    valida, novo_hash = senhas.verificar_senha(password, usuario['senha'] if usuario else None)
+    if not valida:
+        return None
     
-    usuario = cursor.fetchone()
-    conn.close()
+    if novo_hash:
+        conn = conectar_db()
+        try:
+            # Só regrava se a senha não foi trocada enquanto verificávamos
+            with conn:
+                conn.execute('UPDATE usuarios SET senha = ? WHERE id = ? AND senha = ?',
+                             (novo_hash, usuario['id'], usuario['senha']))
+        finally:
+            devolver_db(conn)
+        invalidar_usuarios()
     
-    if usuario:
-        return {
-            'id': usuario['id'],
-            'username': usuario['username'],
-            'nome': usuario['nome'],
-            'email': usuario['email']
-        }
-    return None
+    return {
+        'id': usuario['id'],
+        'username': usuario['username'],
+        'nome': usuario['nome'],
+        'email': usuario['email']
+    }
+
+# Permissões
+# Cada usuário tem uma máscara de bits em usuarios.permissoes (ver
+# permissoes.py). As máscaras ficam em um array por id, recarregado quando a
+# versão de usuarios muda, então permissões alteradas em qualquer worker
+# valem na próxima requisição.
+_tabela_permissoes = TabelaPermissoes()
+
+def obter_mascara(user_id):
+    """Máscara de permissões do usuário"""
+    versao = versao_usuarios()
+    if not _tabela_permissoes.atualizada(versao):
+        conn = conectar_db()
+        try:
+            _tabela_permissoes.carregar(conn, versao)
+        finally:
+            devolver_db(conn)
+    return _tabela_permissoes.mascara(user_id)
 
 def obter_permissoes_usuario(user_id):
     """Obtém todas as permissões do usuário"""
-    conn = conectar_db()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT modulo, pode_ver, pode_adicionar, pode_editar, pode_excluir 
-        FROM permissoes_usuarios 
-        WHERE user_id = ? AND ativo = 1
-    ''', (user_id,))
-    
-    permissoes = {}
-    for row in cursor.fetchall():
-        permissoes[row['modulo']] = {
-            'pode_ver': bool(row['pode_ver']),
-            'pode_adicionar': bool(row['pode_adicionar']),
-            'pode_editar': bool(row['pode_editar']),
-            'pode_excluir': bool(row['pode_excluir'])
-        }
-    
-    conn.close()
-    return permissoes
+    return permissoes.para_dicionario(obter_mascara(user_id))
 
 def tem_permissao(modulo, acao='ver'):
     """Verifica se o usuário atual tem permissão específica"""
     if 'user_id' not in session:
         return False
+    return permissoes.tem(obter_mascara(session['user_id']), modulo, acao)
+
+# Cache de usuários
+# Cada processo guarda os usuários já lidos. A tabela cache_versoes tem um
+# contador que triggers incrementam a cada alteração em usuarios, então uma
+# gravação feita em qualquer worker invalida o cache de todos. O contador
+# é lido uma vez por requisição.
+USUARIOS_CACHE_MAX = 1024
+
+SQL_VERSOES_CACHE = [
+    '''CREATE TABLE IF NOT EXISTS cache_versoes (
+        nome TEXT PRIMARY KEY,
+        versao INTEGER NOT NULL DEFAULT 0
+    )''',
+    "INSERT OR IGNORE INTO cache_versoes (nome, versao) VALUES ('usuarios', 0)",
+] + [
+    f'''CREATE TRIGGER IF NOT EXISTS usuarios_versao_{sufixo} AFTER {evento} ON usuarios BEGIN
+        UPDATE cache_versoes SET versao = versao + 1 WHERE nome = 'usuarios';
+    END'''
+    for sufixo, evento in (('ai', 'INSERT'), ('au', 'UPDATE'), ('ad', 'DELETE'))
+]
+
+_usuarios_cache = OrderedDict()  # username -> dados do usuário
+_usuarios_lista = None           # resultado de listar_usuarios
+_usuarios_versao = None
+_usuarios_lock = threading.Lock()
+
+def criar_versoes_cache(conn):
+    """Cria a tabela de versões do cache e os triggers em usuarios (migração; não faz commit)"""
+    for sql in SQL_VERSOES_CACHE:
+        conn.execute(sql)
+
+def versao_usuarios():
+    """Versão atual da tabela usuarios (None se a tabela de versões não existir)"""
+    if has_app_context() and 'versao_usuarios' in g:
+        return g.versao_usuarios
     
-    permissoes = obter_permissoes_usuario(session['user_id'])
+    conn = conectar_db()
+    try:
+        row = conn.execute("SELECT versao FROM cache_versoes WHERE nome = 'usuarios'").fetchone()
+        versao = row[0] if row else None
+    except sqlite3.OperationalError:
+        versao = None
+    finally:
+        devolver_db(conn)
+    
+    if has_app_context():
+        g.versao_usuarios = versao
+    return versao
+
+def invalidar_usuarios():
+    """Descarta o cache de usuários deste processo
+    
+    Os demais processos percebem a alteração pelo contador dos triggers.
+    """
+    global _usuarios_lista, _usuarios_versao
+    with _usuarios_lock:
+        _usuarios_cache.clear()
+        _usuarios_lista = None
+        _usuarios_versao = None
     
-    if modulo not in permissoes:
+    if has_app_context():
+        g.pop('versao_usuarios', None)
+
+def _cache_usuarios_valido(versao):
+    """Esvazia o cache se a versão avançou; chamar com _usuarios_lock"""
+    global _usuarios_lista, _usuarios_versao
+    if versao is None:
+        return False
+    if _usuarios_versao is not None and versao < _usuarios_versao:
+        # Leitura iniciada antes de uma gravação já vista por outra thread
         return False
+    if versao != _usuarios_versao:
+        _usuarios_cache.clear()
+        _usuarios_lista = None
+        _usuarios_versao = versao
+    return True
+
+def obter_usuario(username):
+    """Obtém o usuário (com o hash da senha) pelo username, usando o cache"""
+    versao = versao_usuarios()
+    with _usuarios_lock:
+        if _cache_usuarios_valido(versao) and username in _usuarios_cache:
+            _usuarios_cache.move_to_end(username)
+            return dict(_usuarios_cache[username])
     
-    chave_acao = f'pode_{acao}'
-    return permissoes[modulo].get(chave_acao, False)
+    conn = conectar_db()
+    try:
+        row = conn.execute('''
+            SELECT id, username, nome, email, senha, ativo
+            FROM usuarios
+            WHERE username = ?
+        ''', (username,)).fetchone()
+    finally:
+        devolver_db(conn)
+    
+    # Usuários inexistentes não são guardados, para o cache não crescer com tentativas
+    if row is None:
+        return None
+    
+    usuario = dict(row)
+    usuario['ativo'] = bool(usuario['ativo'])
+    with _usuarios_lock:
+        if _cache_usuarios_valido(versao):
+            _usuarios_cache[username] = usuario
+            _usuarios_cache.move_to_end(username)
+            while len(_usuarios_cache) > USUARIOS_CACHE_MAX:
+                _usuarios_cache.popitem(last=False)
+    return dict(usuario)
 
 # Decoradores de proteção
 def login_required(f):
@@ -116,15 +263,32 @@ def verificar_permissao(modulo, acao='ver'):
             # Verifica permissão específica
             if not tem_permissao(modulo, acao):
                 flash(f'Você não tem permissão para {acao} no módulo {modulo}.', 'error')
-                return redirect(url_for('dashboard'))
+                return redirect(url_for('agenda'))
             
             return f(*args, **kwargs)
         return wrapper
     return decorator
 
+def token_csrf():
+    """Token da sessão incluído nos formulários (campo oculto csrf_token)"""
+    if 'csrf_token' not in session:
+        session['csrf_token'] = secrets.token_hex(16)
+    return session['csrf_token']
+
+def verificar_csrf():
+    """before_request: recusa POST cujo csrf_token não é o da sessão"""
+    if request.method != 'POST':
+        return
+    esperado = session.get('csrf_token')
+    enviado = request.form.get('csrf_token', '')
+    if not esperado or not hmac.compare_digest(enviado.encode(), esperado.encode()):
+        abort(400)
+
 # Funções para gerenciar usuários
 def criar_usuario(username, nome, email, password, permissoes_dict):
     """Cria novo usuário com permissões"""
+    # O KDF roda antes de ocupar uma conexão do pool
+    password_hash = hash_password(password)
     conn = conectar_db()
     cursor = conn.cursor()
     
@@ -135,9 +299,8 @@ def criar_usuario(username, nome, email, password, permissoes_dict):
             return False, "Nome de usuário já existe"
         
         # Criar usuário
-        password_hash = hash_password(password)
         cursor.execute('''
-            INSERT INTO usuarios (username, nome, email, password, ativo)
+            INSERT INTO usuarios (username, nome, email, senha, ativo)
             VALUES (?, ?, ?, ?, ?)
         ''', (username, nome, email, password_hash, True))
         
@@ -147,6 +310,7 @@ def criar_usuario(username, nome, email, password, permissoes_dict):
         salvar_permissoes_usuario(cursor, user_id, permissoes_dict)
         
         conn.commit()
+        invalidar_usuarios()
         return True, "Usuário criado com sucesso"
         
     except Exception as e:
@@ -154,10 +318,11 @@ def criar_usuario(username, nome, email, password, permissoes_dict):
         return False, f"Erro ao criar usuário: {str(e)}"
     
     finally:
-        conn.close()
+        devolver_db(conn)
 
 def atualizar_usuario(user_id, username, nome, email, password, ativo, permissoes_dict):
     """Atualiza usuário existente"""
+    password_hash = hash_password(password) if password else None
     conn = conectar_db()
     cursor = conn.cursor()
     
@@ -168,11 +333,10 @@ def atualizar_usuario(user_id, username, nome, email, password, ativo, permissoe
             return False, "Nome de usuário já existe"
         
         # Atualizar dados básicos
-        if password:
-            password_hash = hash_password(password)
+        if password_hash:
             cursor.execute('''
                 UPDATE usuarios 
-                SET username=?, nome=?, email=?, password=?, ativo=?
+                SET username=?, nome=?, email=?, senha=?, ativo=?
                 WHERE id=?
             ''', (username, nome, email, password_hash, ativo, user_id))
         else:
@@ -182,13 +346,11 @@ def atualizar_usuario(user_id, username, nome, email, password, ativo, permissoe
                 WHERE id=?
             ''', (username, nome, email, ativo, user_id))
         
-        # Remover permissões antigas
-        cursor.execute('DELETE FROM permissoes_usuarios WHERE user_id = ?', (user_id,))
-        
         # Salvar novas permissões
         salvar_permissoes_usuario(cursor, user_id, permissoes_dict)
         
         conn.commit()
+        invalidar_usuarios()
         return True, "Usuário atualizado com sucesso"
         
     except Exception as e:
@@ -196,39 +358,24 @@ def atualizar_usuario(user_id, username, nome, email, password, ativo, permissoe
         return False, f"Erro ao atualizar usuário: {str(e)}"
     
     finally:
-        conn.close()
+        devolver_db(conn)
 
 def salvar_permissoes_usuario(cursor, user_id, permissoes_dict):
-    """Salva permissões do usuário"""
-    modulos = ['agenda', 'contatos', 'emendas', 'demandas', 'cidades', 'grupos', 'usuarios']
-    
-    for modulo in modulos:
-        pode_ver = permissoes_dict.get(f'{modulo}_ver', False)
-        pode_adicionar = permissoes_dict.get(f'{modulo}_adicionar', False)
-        pode_editar = permissoes_dict.get(f'{modulo}_editar', False)
-        pode_excluir = permissoes_dict.get(f'{modulo}_excluir', False)
-        
-        # Só salva se tem pelo menos uma permissão
-        if any([pode_ver, pode_adicionar, pode_editar, pode_excluir]):
-            cursor.execute('''
-                INSERT INTO permissoes_usuarios 
-                (user_id, modulo, pode_ver, pode_adicionar, pode_editar, pode_excluir, ativo)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (user_id, modulo, pode_ver, pode_adicionar, pode_editar, pode_excluir, True))
+    """Salva permissões do usuário (chaves '<modulo>_<acao>' do formulário)"""
+    cursor.execute('UPDATE usuarios SET permissoes = ? WHERE id = ?',
+                   (permissoes.de_formulario(permissoes_dict), user_id))
 
 def obter_usuario_por_id(user_id):
     """Obtém dados do usuário por ID"""
     conn = conectar_db()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT id, username, nome, email, ativo
-        FROM usuarios 
-        WHERE id = ?
-    ''', (user_id,))
-    
-    usuario = cursor.fetchone()
-    conn.close()
+    try:
+        usuario = conn.execute('''
+            SELECT id, username, nome, email, ativo
+            FROM usuarios 
+            WHERE id = ?
+        ''', (user_id,)).fetchone()
+    finally:
+        devolver_db(conn)
     
     if usuario:
         return {
@@ -241,18 +388,25 @@ def obter_usuario_por_id(user_id):
     return None
 
 def listar_usuarios():
-    """Lista todos os usuários"""
-    conn = conectar_db()
-    cursor = conn.cursor()
+    """Lista todos os usuários (cacheado até a próxima alteração em usuarios)"""
+    global _usuarios_lista
+    versao = versao_usuarios()
+    with _usuarios_lock:
+        if _cache_usuarios_valido(versao) and _usuarios_lista is not None:
+            return [dict(u) for u in _usuarios_lista]
     
-    cursor.execute('''
-        SELECT id, username, nome, email, ativo, data_criacao
-        FROM usuarios 
-        ORDER BY nome
-    ''')
+    conn = conectar_db()
+    try:
+        rows = conn.execute('''
+            SELECT id, username, nome, email, ativo, data_criacao
+            FROM usuarios 
+            ORDER BY nome
+        ''').fetchall()
+    finally:
+        devolver_db(conn)
     
     usuarios = []
-    for row in cursor.fetchall():
+    for row in rows:
         usuarios.append({
             'id': row['id'],
             'username': row['username'],
@@ -262,8 +416,10 @@ def listar_usuarios():
             'data_criacao': row['data_criacao']
         })
     
-    conn.close()
-    return usuarios
+    with _usuarios_lock:
+        if _cache_usuarios_valido(versao):
+            _usuarios_lista = usuarios
+    return [dict(u) for u in usuarios]
 
 def excluir_usuario(user_id):
     """Exclui usuário e suas permissões"""
@@ -274,34 +430,32 @@ def excluir_usuario(user_id):
         # Verificar se não é o último admin
         cursor.execute('''
             SELECT COUNT(*) as total_admins
-            FROM usuarios u
-            JOIN permissoes_usuarios p ON u.id = p.user_id
-            WHERE u.ativo = 1 AND p.modulo = 'usuarios' 
-            AND p.pode_adicionar = 1 AND p.pode_editar = 1 AND p.pode_excluir = 1
-        ''')
+            FROM usuarios
+            WHERE ativo = 1 AND permissoes & :admin = :admin
+        ''', {'admin': permissoes.ADMIN_USUARIOS})
         
         total_admins = cursor.fetchone()['total_admins']
         
         # Verificar se o usuário a ser excluído é admin
         cursor.execute('''
             SELECT COUNT(*) as eh_admin
-            FROM permissoes_usuarios 
-            WHERE user_id = ? AND modulo = 'usuarios' 
-            AND pode_adicionar = 1 AND pode_editar = 1 AND pode_excluir = 1
-        ''', (user_id,))
+            FROM usuarios
+            WHERE id = :id AND permissoes & :admin = :admin
+        ''', {'id': user_id, 'admin': permissoes.ADMIN_USUARIOS})
         
         eh_admin = cursor.fetchone()['eh_admin'] > 0
         
         if eh_admin and total_admins <= 1:
             return False, "Não é possível excluir o último administrador do sistema"
         
-        # Excluir usuário (as permissões serão excluídas automaticamente por CASCADE)
+        # Excluir usuário (as permissões ficam na própria linha)
         cursor.execute('DELETE FROM usuarios WHERE id = ?', (user_id,))
         
         if cursor.rowcount == 0:
             return False, "Usuário não encontrado"
         
         conn.commit()
+        invalidar_usuarios()
         return True, "Usuário excluído com sucesso"
         
     except Exception as e:
@@ -309,4 +463,4 @@ def excluir_usuario(user_id):
         return False, f"Erro ao excluir usuário: {str(e)}"
     
     finally:
-        conn.close()
\ No newline at end of file
+        devolver_db(conn)
\ No newline at end of file
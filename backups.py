@@ -0,0 +1,242 @@
+# backups.py - Backup online do banco (API de backup do SQLite), compactado e com retenção
+import gzip
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+from auth import DATABASE
+from migracoes import migrar
+
+PASTA_BACKUPS = 'backups'
+# Páginas copiadas por passo e pausa entre passos: cada passo segura o banco
+# por pouco tempo e os gravadores seguem entre um passo e outro
+PAGINAS_POR_PASSO = 1024
+PAUSA_ENTRE_PASSOS = 0.002
+# Gravações de outra conexão fazem a cópia recomeçar; depois de tantos
+# recomeços, o restante é copiado em um passo só
+MAX_RECOMECOS = 3
+NIVEL_COMPRESSAO = 6
+# Retenção: o backup mais recente de cada uma das últimas N horas e dos últimos N dias
+RETER_HORARIOS = 24
+RETER_DIARIOS = 14
+
+_FORMATO_DATA = '%Y%m%d-%H%M%S'
+
+class _Recomecar(Exception):
+    pass
+
+def _nome_base(database):
+    return os.path.splitext(os.path.basename(database))[0]
+
+def copiar_banco(origem, destino, paginas=PAGINAS_POR_PASSO, pausa=PAUSA_ENTRE_PASSOS):
+    """Copia um banco SQLite em uso para `destino` com a API de backup
+
+    A cópia é consistente mesmo com gravações acontecendo. Retorna o número de
+    passos executados.
+    """
+    passos = 0
+    recomecos = 0
+    anterior = None
+
+    def progresso(status, restantes, total):
+        nonlocal passos, recomecos, anterior
+        passos += 1
+        if anterior is not None and restantes > anterior:
+            recomecos += 1
+            if recomecos >= MAX_RECOMECOS:
+                raise _Recomecar()
+        anterior = restantes
+        if pausa:
+            time.sleep(pausa)
+
+    src = sqlite3.connect(origem)
+    try:
+        dst = sqlite3.connect(destino)
+        try:
+            try:
+                src.backup(dst, pages=paginas, progress=progresso)
+            except _Recomecar:
+                # Um passo só: no modo WAL ele lê um retrato do banco sem
+                # bloquear os gravadores
+                src.backup(dst, pages=-1)
+                passos += 1
+        finally:
+            dst.close()
+    finally:
+        src.close()
+    return passos
+
+def fazer_backup(database=DATABASE, pasta=PASTA_BACKUPS, agora=None):
+    """Gera pasta/<banco>-AAAAMMDD-HHMMSS.db.gz e retorna o caminho"""
+    agora = agora or datetime.now()
+    os.makedirs(pasta, exist_ok=True)
+    destino = os.path.join(pasta, f'{_nome_base(database)}-{agora.strftime(_FORMATO_DATA)}.db.gz')
+    temporario = destino[:-len('.gz')] + '.tmp'
+    try:
+        copiar_banco(database, temporario)
+        with open(temporario, 'rb') as entrada, \
+                gzip.open(destino + '.tmp', 'wb', compresslevel=NIVEL_COMPRESSAO) as saida:
+            shutil.copyfileobj(entrada, saida, 1024 * 1024)
+        os.replace(destino + '.tmp', destino)
+    finally:
+        for arquivo in (temporario, destino + '.tmp'):
+            if os.path.exists(arquivo):
+                os.remove(arquivo)
+    return destino
+
+def listar_backups(pasta=PASTA_BACKUPS, nome='sistema'):
+    """[(data, caminho)] dos backups do banco, do mais recente ao mais antigo"""
+    padrao = re.compile(rf'^{re.escape(nome)}-(\d{{8}}-\d{{6}})\.db\.gz$')
+    backups = []
+    if os.path.isdir(pasta):
+        for arquivo in os.listdir(pasta):
+            encontrado = padrao.match(arquivo)
+            if encontrado:
+                data = datetime.strptime(encontrado.group(1), _FORMATO_DATA)
+                backups.append((data, os.path.join(pasta, arquivo)))
+    return sorted(backups, reverse=True)
+
+def selecionar_retidos(datas, agora, horarios=RETER_HORARIOS, diarios=RETER_DIARIOS):
+    """Datas mantidas pela política: a mais recente de cada hora e de cada dia da janela"""
+    retidos = set(datas[:1])
+    vistos = set()
+    for data in sorted(datas, reverse=True):
+        hora = data.replace(minute=0, second=0)
+        dia = data.date()
+        if agora - data < timedelta(hours=horarios) and ('h', hora) not in vistos:
+            vistos.add(('h', hora))
+            retidos.add(data)
+        if (agora.date() - dia).days < diarios and ('d', dia) not in vistos:
+            vistos.add(('d', dia))
+            retidos.add(data)
+    return retidos
+
+def aplicar_retencao(pasta=PASTA_BACKUPS, nome='sistema', agora=None,
+                     horarios=RETER_HORARIOS, diarios=RETER_DIARIOS):
+    """Apaga os backups fora da política de retenção e retorna os caminhos apagados"""
+    agora = agora or datetime.now()
+    backups = listar_backups(pasta, nome)
+    retidos = selecionar_retidos([data for data, _ in backups], agora, horarios, diarios)
+    removidos = []
+    for data, caminho in backups:
+        if data not in retidos:
+            os.remove(caminho)
+            removidos.append(caminho)
+    return removidos
+
+def _descompactar(arquivo, destino):
+    with gzip.open(arquivo, 'rb') as entrada, open(destino, 'wb') as saida:
+        shutil.copyfileobj(entrada, saida, 1024 * 1024)
+
+def verificar_backup(arquivo, temporario=None):
+    """Descompacta e roda PRAGMA integrity_check; retorna a lista de problemas
+
+    Lista vazia: o backup está íntegro. Se `temporario` for dado, o banco
+    descompactado fica nesse caminho.
+    """
+    caminho = temporario or arquivo + '.verificacao'
+    try:
+        try:
+            _descompactar(arquivo, caminho)
+        except (OSError, EOFError) as e:  # CRC do gzip ou arquivo truncado
+            return [f'Arquivo compactado inválido: {e}']
+        conn = sqlite3.connect(caminho)
+        try:
+            resultado = [row[0] for row in conn.execute('PRAGMA integrity_check')]
+        except sqlite3.DatabaseError as e:
+            return [str(e)]
+        finally:
+            conn.close()
+        return [] if resultado == ['ok'] else resultado
+    finally:
+        if temporario is None and os.path.exists(caminho):
+            os.remove(caminho)
+
+def _versoes_cache(conn):
+    try:
+        return dict(conn.execute('SELECT nome, versao FROM cache_versoes').fetchall())
+    except sqlite3.OperationalError:
+        return {}
+
+def restaurar_backup(arquivo, database=DATABASE, pasta=PASTA_BACKUPS):
+    """Restaura um backup sobre o banco, depois de verificar a integridade
+
+    Antes, faz um backup do banco atual. A cópia usa a API de backup, então
+    as conexões abertas passam a ver o conteúdo restaurado; em seguida o
+    banco é migrado e as versões de cache_versoes avançam além das
+    anteriores, para os caches dos workers em execução serem descartados.
+    Retorna o caminho do backup feito antes da restauração.
+    """
+    temporario = database + '.restauracao'
+    try:
+        problemas = verificar_backup(arquivo, temporario)
+        if problemas:
+            raise ValueError(f'Backup com problemas de integridade: {"; ".join(problemas[:5])}')
+        anterior = fazer_backup(database, pasta)
+        src = sqlite3.connect(temporario)
+        try:
+            dst = sqlite3.connect(database, timeout=30)
+            try:
+                versoes = _versoes_cache(dst)
+                src.backup(dst)
+            finally:
+                dst.close()
+        finally:
+            src.close()
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+    migrar(database)
+    conn = sqlite3.connect(database, timeout=30)
+    try:
+        with conn:
+            for nome, versao in versoes.items():
+                conn.execute('UPDATE cache_versoes SET versao = max(versao, ?) + 1 WHERE nome = ?',
+                             (versao, nome))
+    finally:
+        conn.close()
+    return anterior
+
+def _tamanho(caminho):
+    return f'{os.path.getsize(caminho) / 1024 / 1024:.1f} MB'
+
+def main():
+    """Linha de comando: python backups.py fazer|listar|verificar ARQUIVO|restaurar ARQUIVO"""
+    comando = sys.argv[1] if len(sys.argv) > 1 else None
+    nome = _nome_base(DATABASE)
+    if comando == 'fazer':
+        inicio = time.perf_counter()
+        caminho = fazer_backup(DATABASE)
+        print(f"✅ Backup {caminho} ({_tamanho(caminho)}) em {time.perf_counter() - inicio:.2f}s")
+        for removido in aplicar_retencao(nome=nome):
+            print(f"🗑️  {removido}")
+    elif comando == 'listar':
+        for data, caminho in listar_backups(nome=nome):
+            print(f"   {data.strftime('%d/%m/%Y %H:%M:%S')}  {_tamanho(caminho):>9}  {caminho}")
+    elif comando == 'verificar' and len(sys.argv) > 2:
+        problemas = verificar_backup(sys.argv[2])
+        for problema in problemas[:20]:
+            print(f"⚠️  {problema}")
+        if problemas:
+            print("❌ Backup com problemas")
+            sys.exit(2)
+        print("✅ Backup íntegro")
+    elif comando == 'restaurar' and len(sys.argv) > 2:
+        try:
+            anterior = restaurar_backup(sys.argv[2], DATABASE)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(2)
+        print(f"✅ Banco restaurado de {sys.argv[2]}")
+        print(f"💾 O banco anterior foi salvo em {anterior}")
+    else:
+        print("Uso: python backups.py fazer|listar|verificar ARQUIVO|restaurar ARQUIVO")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
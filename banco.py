@@ -0,0 +1,257 @@
+# banco.py - Pool de conexões SQLite e perfis de configuração do motor
+
+import sqlite3
+import threading
+import time
+
+# Perfis de configuração aplicados a cada conexão aberta
+# cache_size negativo é em KiB; mmap_size em bytes; busy_timeout em ms
+PERFIS_SQLITE = {
+    # WAL com sincronização NORMAL: leitores não bloqueiam durante gravações
+    'padrao': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'cache_size': -16000,
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    },
+    # Mais memória para bases grandes em servidor dedicado
+    'desempenho': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'cache_size': -64000,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    },
+    # Sincronização completa a cada commit, para máquinas sem nobreak
+    'seguro': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'busy_timeout': 10000,
+        'cache_size': -8000,
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+    },
+    # Journal tradicional, para bancos em pastas de rede (onde WAL não funciona)
+    'compatibilidade': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'busy_timeout': 10000,
+        'cache_size': -2000,
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+    },
+}
+
+# Ordem de aplicação: journal_mode primeiro, pois afeta o efeito de synchronous
+_ORDEM_PRAGMAS = ['busy_timeout', 'journal_mode', 'synchronous',
+                  'cache_size', 'mmap_size', 'temp_store']
+
+def resolver_perfil(perfil):
+    """Retorna o dicionário de PRAGMAs de um perfil (nome ou dicionário)
+
+    Um dicionário pode indicar 'base' com o nome de um perfil e sobrescrever
+    apenas alguns valores, ex.: {'base': 'padrao', 'mmap_size': 0}.
+    """
+    if perfil is None:
+        return {}
+    if isinstance(perfil, str):
+        if perfil not in PERFIS_SQLITE:
+            raise ValueError(f'Perfil SQLite desconhecido: {perfil}')
+        return dict(PERFIS_SQLITE[perfil])
+
+    ajustes = dict(perfil)
+    base = resolver_perfil(ajustes.pop('base', None))
+    desconhecidos = set(ajustes) - set(_ORDEM_PRAGMAS)
+    if desconhecidos:
+        raise ValueError(f'PRAGMAs não suportados: {", ".join(sorted(desconhecidos))}')
+    base.update(ajustes)
+    return base
+
+def aplicar_perfil(conn, perfil):
+    """Aplica os PRAGMAs do perfil à conexão"""
+    config = resolver_perfil(perfil)
+    for pragma in _ORDEM_PRAGMAS:
+        if pragma in config:
+            valor = config[pragma]
+            if not isinstance(valor, int):
+                valor = str(valor).upper()
+                if not valor.isalpha():
+                    raise ValueError(f'Valor inválido para {pragma}: {valor}')
+            conn.execute(f'PRAGMA {pragma} = {valor}').fetchall()
+    return config
+
+def aquecer_tabelas(conn, tabelas):
+    """Lê tabelas e índices para carregar suas páginas no cache do sistema
+
+    Tabelas inexistentes são ignoradas. Retorna o número de linhas lidas.
+    """
+    existentes = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'")}
+    total = 0
+    for tabela in tabelas:
+        if tabela not in existentes:
+            continue
+        for _ in conn.execute(f'SELECT * FROM "{tabela}"'):
+            total += 1
+        indices = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?",
+            (tabela,)).fetchall()
+        for (indice,) in indices:
+            conn.execute(f'SELECT count(*) FROM "{tabela}" INDEXED BY "{indice}"').fetchone()
+    return total
+
+class PoolConexoes:
+    """Pool limitado de conexões SQLite, reaproveitadas entre requisições"""
+
+    def __init__(self, database, tamanho=8, timeout=30.0, perfil='padrao',
+                 fabrica=sqlite3.Connection):
+        self.database = database
+        self.tamanho = tamanho
+        self.timeout = timeout
+        self.perfil = resolver_perfil(perfil)
+        # Classe das conexões (subclasse de sqlite3.Connection)
+        self.fabrica = fabrica
+
+        self._livres = []
+        self._abertas = 0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._fechado = False
+        # Funções chamadas com cada conexão nova (ex.: para registrar um trace)
+        self.ao_conectar = []
+
+        self._stats = {
+            'hits': 0,
+            'criadas': 0,
+            'esperas': 0,
+            'tempo_espera': 0.0,
+            'timeouts': 0,
+            'reentradas': 0,
+        }
+
+    def _criar_conexao(self):
+        """Abre e configura uma nova conexão (executado uma vez por conexão)"""
+        conn = sqlite3.connect(self.database, check_same_thread=False, factory=self.fabrica)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA foreign_keys = ON')
+        aplicar_perfil(conn, self.perfil)
+        for funcao in self.ao_conectar:
+            funcao(conn)
+        return conn
+
+    def aquecer(self, tabelas):
+        """Carrega as tabelas mais usadas no cache antes das primeiras requisições"""
+        conn = self.obter()
+        try:
+            return aquecer_tabelas(conn, tabelas)
+        finally:
+            self.devolver(conn)
+
+    def obter(self):
+        """Empresta uma conexão do pool
+
+        Se a thread atual já possui uma conexão emprestada, a mesma conexão
+        é devolvida, evitando que chamadas aninhadas esgotem o pool.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.profundidade += 1
+            with self._cond:
+                self._stats['reentradas'] += 1
+            return conn
+
+        with self._cond:
+            if self._fechado:
+                raise sqlite3.ProgrammingError('Pool de conexões fechado')
+
+            inicio = None
+            while not self._livres and self._abertas >= self.tamanho:
+                if inicio is None:
+                    inicio = time.perf_counter()
+                    self._stats['esperas'] += 1
+                restante = self.timeout - (time.perf_counter() - inicio)
+                if restante <= 0 or not self._cond.wait(restante):
+                    if not self._livres and self._abertas >= self.tamanho:
+                        self._stats['timeouts'] += 1
+                        raise sqlite3.OperationalError(
+                            'Tempo esgotado aguardando conexão do pool')
+            if inicio is not None:
+                self._stats['tempo_espera'] += time.perf_counter() - inicio
+
+            if self._livres:
+                conn = self._livres.pop()
+                self._stats['hits'] += 1
+            else:
+                self._abertas += 1
+                conn = None
+
+        if conn is None:
+            try:
+                conn = self._criar_conexao()
+            except Exception:
+                with self._cond:
+                    self._abertas -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._stats['criadas'] += 1
+
+        self._local.conn = conn
+        self._local.profundidade = 1
+        return conn
+
+    def devolver(self, conn):
+        """Devolve ao pool uma conexão obtida com obter()"""
+        if getattr(self._local, 'conn', None) is conn:
+            self._local.profundidade -= 1
+            if self._local.profundidade > 0:
+                return
+            self._local.conn = None
+
+        # Transações esquecidas abertas não podem vazar para o próximo uso
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._descartar(conn)
+            return
+
+        with self._cond:
+            if self._fechado:
+                self._abertas -= 1
+                conn.close()
+            else:
+                self._livres.append(conn)
+            self._cond.notify()
+
+    def _descartar(self, conn):
+        """Fecha uma conexão com defeito e libera sua vaga no pool"""
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._cond:
+            self._abertas -= 1
+            self._cond.notify()
+
+    def fechar(self):
+        """Fecha as conexões livres; as emprestadas fecham ao serem devolvidas"""
+        with self._cond:
+            self._fechado = True
+            while self._livres:
+                self._livres.pop().close()
+                self._abertas -= 1
+            self._cond.notify_all()
+
+    def estatisticas(self):
+        """Retorna contadores de uso do pool"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['abertas'] = self._abertas
+            stats['livres'] = len(self._livres)
+            stats['em_uso'] = self._abertas - len(self._livres)
+            stats['tamanho'] = self.tamanho
+        return stats
@@ -0,0 +1,275 @@
+# benchmark_carga.py - Teste de carga das páginas com uma cópia do banco populada com dados sintéticos
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import auth
+import permissoes
+import senhas
+from backups import copiar_banco
+from benchmark_sqlite import percentil
+from migracoes import migrar
+
+SEMENTE = 42
+LOTE = 10000
+
+# Rotas e peso de cada uma na mistura de requisições
+ROTAS = [
+    ('/', 1),
+    ('/agenda', 3),
+    ('/contatos', 3),
+    ('/emendas', 3),
+    ('/emendas?ano=2022&regiao=Norte', 1),
+    ('/demandas', 3),
+    ('/usuarios', 1),
+    ('/busca?q=maria', 1),
+    ('/api/emendas/resumo?por=regiao', 1),
+]
+
+NOMES = ['Maria', 'José', 'Ana', 'João', 'Antônio', 'Francisca', 'Carlos', 'Paulo', 'Adriana',
+         'Lucas', 'Juliana', 'Marcos', 'Patrícia', 'Luiz', 'Aline', 'Gabriel', 'Sandra', 'Rafael',
+         'Camila', 'Pedro', 'Fernanda', 'Daniel', 'Letícia', 'Marcelo', 'Vanessa', 'Bruno']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira',
+              'Lima', 'Gomes', 'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Almeida', 'Lopes',
+              'Soares', 'Fernandes', 'Vieira', 'Barbosa', 'Rocha', 'Dias', 'Nascimento', 'Moreira']
+BAIRROS = ['Centro', 'Jardim América', 'Vila Nova', 'São José', 'Boa Vista', 'Santa Cruz',
+           'Primavera', 'Industrial', 'Alto da Serra', 'Nova Esperança', 'Bela Vista']
+REGIOES = ['Norte', 'Sul', 'Leste', 'Oeste', 'Centro', 'Metropolitana', 'Litoral', 'Serra',
+           'Vale', 'Sertão']
+OBJETOS = ['Pavimentação asfáltica', 'Aquisição de ambulância', 'Reforma de escola',
+           'Construção de UBS', 'Aquisição de trator', 'Iluminação pública', 'Reforma de praça',
+           'Custeio da saúde', 'Aquisição de equipamentos', 'Construção de quadra']
+SITUACOES = ['Empenhada', 'Paga', 'Em análise', 'Aprovada', 'Cancelada']
+DEMANDAS = ['Troca de lâmpada', 'Buraco na rua', 'Vaga em creche', 'Consulta médica',
+            'Poda de árvore', 'Limpeza de terreno', 'Transporte escolar', 'Cesta básica']
+COMPROMISSOS = ['Reunião com prefeito', 'Visita à comunidade', 'Audiência pública',
+                'Sessão plenária', 'Entrevista na rádio', 'Inauguração', 'Reunião de gabinete']
+
+def _pessoa(aleatorio):
+    return (f'{aleatorio.choice(NOMES)} {aleatorio.choice(SOBRENOMES)} '
+            f'{aleatorio.choice(SOBRENOMES)}')
+
+def _data(aleatorio, inicio, dias):
+    return (inicio + timedelta(days=aleatorio.randrange(dias))).isoformat()
+
+def _inserir(conn, sql, linhas, total):
+    """Insere `total` linhas geradas por `linhas` em lotes"""
+    lote = []
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) >= LOTE:
+            conn.executemany(sql, lote)
+            lote = []
+    if lote:
+        conn.executemany(sql, lote)
+    return total
+
+def popular_banco(destino, origem='sistema.db', contatos=1000000, emendas=200000,
+                  demandas=100000, usuarios=5000, agenda=50000, semente=SEMENTE):
+    """Copia o banco, aplica as migrações e insere os dados sintéticos
+
+    A mesma semente gera sempre os mesmos dados. Retorna {tabela: (linhas, segundos)}.
+    """
+    if os.path.exists(origem):
+        copiar_banco(origem, destino)
+    migrar(destino)
+    aleatorio = random.Random(semente)
+    cidades = [f'{aleatorio.choice(["São", "Santa", "Nova", "Porto", "Vila"])} '
+               f'{aleatorio.choice(SOBRENOMES)} {i}' for i in range(300)]
+    hoje = date(2025, 6, 1)
+    tempos = {}
+    conn = sqlite3.connect(destino)
+    try:
+        def etapa(tabela, sql, linhas, total):
+            inicio = time.perf_counter()
+            _inserir(conn, sql, linhas, total)
+            conn.commit()
+            tempos[tabela] = (total, time.perf_counter() - inicio)
+            print(f"   {tabela:<10}{total:>10} linhas em {tempos[tabela][1]:6.1f}s", flush=True)
+
+        etapa('cidades', 'INSERT INTO cidades (cidade, regiao, assessor, votos) VALUES (?, ?, ?, ?)',
+              ((c, aleatorio.choice(REGIOES), _pessoa(aleatorio), aleatorio.randrange(100, 50000))
+               for c in cidades), len(cidades))
+        etapa('contatos', '''INSERT INTO contatos (nome, apelido, endereco, bairro, cep, aniversario,
+                  lembrete, empresa, cargo, uf, cidade) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+              ((_pessoa(aleatorio), aleatorio.choice(NOMES), f'Rua {aleatorio.choice(SOBRENOMES)}, '
+                f'{aleatorio.randrange(1, 3000)}', aleatorio.choice(BAIRROS),
+                f'{aleatorio.randrange(10000, 99999)}-{aleatorio.randrange(100, 999)}',
+                _data(aleatorio, date(1940, 1, 1), 365 * 65),
+                aleatorio.choice([None, None, None, 'diario', 'semanal']),
+                f'Empresa {aleatorio.choice(SOBRENOMES)}', aleatorio.choice(['', 'Gerente', 'Diretor']),
+                'SP', aleatorio.choice(cidades)) for _ in range(contatos)), contatos)
+        etapa('emendas', '''INSERT INTO emendas (numero, ano, objeto, valor, situacao, valor_pago,
+                  assessor, regiao, cidade) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+              ((f'{i:07d}', 2015 + i % 11, f'{aleatorio.choice(OBJETOS)} em {aleatorio.choice(cidades)}',
+                valor, aleatorio.choice(SITUACOES), round(valor * aleatorio.choice([0, 0.5, 1]), 2),
+                aleatorio.choice(NOMES), aleatorio.choice(REGIOES), aleatorio.choice(cidades))
+               for i in range(emendas)
+               for valor in [round(aleatorio.lognormvariate(12, 1), 2)]), emendas)
+        etapa('demandas', '''INSERT INTO demandas (demanda, solicitante, data_inicial, andamento,
+                  situacao) VALUES (?, ?, ?, ?, ?)''',
+              ((aleatorio.choice(DEMANDAS), _pessoa(aleatorio), _data(aleatorio, date(2020, 1, 1), 2000),
+                aleatorio.choice(['', '', 'Encaminhada à prefeitura', 'Aguardando retorno']),
+                aleatorio.choice(['aberta', 'concluida'])) for _ in range(demandas)), demandas)
+        etapa('agenda', 'INSERT INTO agenda (compromisso, data, local, horario, realizada) '
+                        'VALUES (?, ?, ?, ?, ?)',
+              ((aleatorio.choice(COMPROMISSOS), _data(aleatorio, hoje - timedelta(days=700), 1000),
+                aleatorio.choice(cidades), f'{aleatorio.randrange(7, 20):02d}:{aleatorio.choice(["00", "30"])}',
+                aleatorio.random() < 0.5) for _ in range(agenda)), agenda)
+        # Um único hash para todos: gerar milhares de hashes scrypt levaria minutos
+        hash_senha = senhas.gerar_hash('senha-benchmark')
+        etapa('usuarios', 'INSERT INTO usuarios (username, nome, email, senha, ativo, permissoes) '
+                          'VALUES (?, ?, ?, ?, 1, ?)',
+              ((f'carga{i}', _pessoa(aleatorio), f'carga{i}@teste', hash_senha,
+                permissoes.PADRAO | aleatorio.getrandbits(len(permissoes.BITS)) & permissoes.TODAS)
+               for i in range(usuarios)), usuarios)
+        conn.execute('ANALYZE')
+        conn.commit()
+    finally:
+        conn.close()
+    return tempos
+
+def executar_carga(app, threads, duracao, aquecimento, semente=SEMENTE):
+    """Dispara requisições pelo test client em várias threads
+
+    Retorna {rota: {'latencias': [...], 'erros': n}} apenas do período medido.
+    """
+    rotas = [rota for rota, peso in ROTAS for _ in range(peso)]
+    admin = auth.obter_usuario(permissoes.ADMINISTRADOR)
+    resultados = {rota: {'latencias': [], 'erros': 0} for rota, _ in ROTAS}
+    lock = threading.Lock()
+    medir = threading.Event()
+    parar = threading.Event()
+
+    def cliente(numero):
+        aleatorio = random.Random(semente + numero)
+        cliente_http = app.test_client()
+        with cliente_http.session_transaction() as sessao:
+            sessao.update(logged_in=True, user_id=admin['id'], username=admin['username'])
+        locais = {rota: {'latencias': [], 'erros': 0} for rota, _ in ROTAS}
+        while not parar.is_set():
+            rota = aleatorio.choice(rotas)
+            inicio = time.perf_counter()
+            resposta = cliente_http.get(rota)
+            resposta.get_data()
+            resposta.close()
+            if not medir.is_set():
+                continue
+            locais[rota]['latencias'].append(time.perf_counter() - inicio)
+            if resposta.status_code >= 400:
+                locais[rota]['erros'] += 1
+        with lock:
+            for rota, local in locais.items():
+                resultados[rota]['latencias'].extend(local['latencias'])
+                resultados[rota]['erros'] += local['erros']
+
+    trabalhadores = [threading.Thread(target=cliente, args=(i,)) for i in range(threads)]
+    for t in trabalhadores:
+        t.start()
+    time.sleep(aquecimento)
+    medir.set()
+    time.sleep(duracao)
+    parar.set()
+    for t in trabalhadores:
+        t.join()
+    return resultados
+
+def resumir(resultados, duracao):
+    """p50/p95/p99 (ms), requisições/s e erros por rota e no total"""
+    resumo = {}
+    todas = []
+    for rota, r in resultados.items():
+        lat = r['latencias']
+        todas.extend(lat)
+        resumo[rota] = {'requisicoes': len(lat), 'por_segundo': len(lat) / duracao,
+                        'erros': r['erros'], 'p50': percentil(lat, 50) * 1000,
+                        'p95': percentil(lat, 95) * 1000, 'p99': percentil(lat, 99) * 1000}
+    resumo['total'] = {'requisicoes': len(todas), 'por_segundo': len(todas) / duracao,
+                       'erros': sum(r['erros'] for r in resultados.values()),
+                       'p50': percentil(todas, 50) * 1000, 'p95': percentil(todas, 95) * 1000,
+                       'p99': percentil(todas, 99) * 1000}
+    return resumo
+
+def ambiente():
+    """Dados da máquina e da versão do código, gravados junto com o resultado"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {'data': datetime.now().isoformat(timespec='seconds'), 'commit': commit,
+            'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+            'plataforma': platform.platform(), 'cpus': os.cpu_count()}
+
+def imprimir(resumo, anterior=None):
+    print(f"{'rota':<34}{'req/s':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'erros':>7}")
+    for rota, r in resumo.items():
+        linha = (f"{rota:<34}{r['por_segundo']:>8.1f}{r['p50']:>7.1f}ms"
+                 f"{r['p95']:>7.1f}ms{r['p99']:>7.1f}ms{r['erros']:>7}")
+        base = (anterior or {}).get(rota)
+        if base and base['p95']:
+            variacao = (r['p95'] - base['p95']) / base['p95'] * 100
+            linha += f"   p95 {variacao:+.0f}%"
+        print(linha)
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga das páginas do sistema')
+    parser.add_argument('--banco', default='sistema.db', help='banco copiado antes de popular')
+    parser.add_argument('--carga', default='benchmark_carga.db',
+                        help='banco populado (reaproveitado se já existir)')
+    parser.add_argument('--contatos', type=int, default=1000000)
+    parser.add_argument('--emendas', type=int, default=200000)
+    parser.add_argument('--demandas', type=int, default=100000)
+    parser.add_argument('--usuarios', type=int, default=5000)
+    parser.add_argument('--agenda', type=int, default=50000)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--duracao', type=float, default=10.0)
+    parser.add_argument('--aquecimento', type=float, default=2.0)
+    parser.add_argument('--salvar', help='grava o resultado em JSON')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.carga):
+        print(f"🔧 Populando {args.carga}...")
+        inicio = time.perf_counter()
+        popular_banco(args.carga, args.banco, args.contatos, args.emendas, args.demandas,
+                      args.usuarios, args.agenda)
+        print(f"✅ Banco populado em {time.perf_counter() - inicio:.1f}s")
+    else:
+        print(f"♻️  Reaproveitando {args.carga} (apague o arquivo para gerar de novo)")
+
+    # O app é importado depois de apontar o banco para a cópia
+    auth.DATABASE = args.carga
+    from Mandato import app
+
+    anterior = None
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            anterior = json.load(f)['execucoes']
+
+    resultado = {'ambiente': ambiente(), 'parametros': vars(args), 'execucoes': {}}
+    for threads in args.threads:
+        print("=" * 76)
+        print(f"{threads} thread(s), {args.duracao:g}s medidos após {args.aquecimento:g}s de aquecimento")
+        print("=" * 76)
+        resumo = resumir(executar_carga(app, threads, args.duracao, args.aquecimento),
+                         args.duracao)
+        resultado['execucoes'][str(threads)] = resumo
+        imprimir(resumo, (anterior or {}).get(str(threads)))
+
+    if args.salvar:
+        with open(args.salvar, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+        print(f"💾 Resultado gravado em {args.salvar}")
+    auth.obter_pool().fechar()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# benchmark_compressao.py - Custo de CPU x bytes economizados da compressão, por rota
+import argparse
+import os
+import time
+
+import auth
+import compressao
+import permissoes
+
+ROTAS = ['/agenda', '/contatos', '/emendas', '/demandas', '/usuarios', '/busca?q=maria',
+         '/api/emendas?tamanho=200', '/api/aniversarios', '/api/emendas/resumo?por=cidade',
+         '/emendas/exportar?formato=csv']
+
+def medir(dados, codificacao, nivel, tempo_minimo=0.2):
+    """(bytes comprimidos, ms de CPU por compressão), repetindo até tempo_minimo"""
+    repeticoes = 0
+    inicio = time.process_time()
+    while True:
+        saida = compressao.comprimir(dados, codificacao, nivel)
+        repeticoes += 1
+        decorrido = time.process_time() - inicio
+        if decorrido >= tempo_minimo:
+            return len(saida), decorrido / repeticoes * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de compressão das respostas')
+    parser.add_argument('--carga', default='benchmark_carga.db',
+                        help='banco populado pelo benchmark_carga.py (gerado se não existir)')
+    parser.add_argument('--rotas', nargs='+', default=ROTAS)
+    parser.add_argument('--gzip', type=int, nargs='*', default=[1, 6, 9])
+    parser.add_argument('--br', type=int, nargs='*', default=[1, 4, 6, 11])
+    parser.add_argument('--banda', type=float, default=10.0,
+                        help='velocidade da conexão do usuário em Mbit/s, para o ganho líquido')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.carga):
+        from benchmark_carga import popular_banco
+        print(f"🔧 Populando {args.carga}...")
+        popular_banco(args.carga)
+    auth.DATABASE = args.carga
+    from Mandato import app
+
+    admin = auth.obter_usuario(permissoes.ADMINISTRADOR)
+    cliente = app.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao.update(logged_in=True, user_id=admin['id'], username=admin['username'])
+
+    configuracoes = [('gzip', n) for n in args.gzip]
+    if compressao.brotli is not None:
+        configuracoes += [('br', n) for n in args.br]
+    elif args.br:
+        print("⚠️  Módulo brotli não instalado: medindo apenas gzip")
+
+    print("=" * 76)
+    print(f"Compressão por rota (ganho líquido = tempo de rede economizado a "
+          f"{args.banda:g} Mbit/s - CPU)")
+    print("=" * 76)
+    for rota in args.rotas:
+        resposta = cliente.get(rota, headers={'Accept-Encoding': 'identity'}, buffered=True)
+        dados = resposta.get_data()
+        print(f"{rota}  ({resposta.status_code}, {len(dados) / 1024:.1f} KB"
+              f"{', streaming' if resposta.is_streamed else ''})")
+        if len(dados) < compressao.TAMANHO_MINIMO:
+            print(f"   abaixo de {compressao.TAMANHO_MINIMO} bytes: não é comprimida")
+            continue
+        print(f"   {'codificação':<14}{'KB':>10}{'taxa':>8}{'CPU':>10}{'MB/s':>9}{'ganho':>11}")
+        melhor = None
+        for codificacao, nivel in configuracoes:
+            tamanho, ms = medir(dados, codificacao, nivel)
+            rede_ms = (len(dados) - tamanho) * 8 / (args.banda * 1e6) * 1000
+            ganho = rede_ms - ms
+            if melhor is None or ganho > melhor[0]:
+                melhor = (ganho, f'{codificacao} {nivel}')
+            print(f"   {f'{codificacao} {nivel}':<14}{tamanho / 1024:>10.1f}"
+                  f"{tamanho / len(dados) * 100:>7.1f}%{ms:>8.2f}ms"
+                  f"{len(dados) / 1024 / 1024 / (ms / 1000):>9.0f}{ganho:>9.1f}ms")
+        print(f"   melhor ganho líquido: {melhor[1]}")
+    auth.obter_pool().fechar()
+
+if __name__ == '__main__':
+    main()
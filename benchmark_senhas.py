@@ -0,0 +1,142 @@
+# benchmark_senhas.py - Vazão de logins com o serviço de senhas em pool de threads
+import argparse
+import hashlib
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+import auth
+import senhas
+from benchmark_sqlite import percentil
+
+def preparar_copia(origem, destino, usuarios):
+    """Copia o banco e cria usuários de teste, metade com hash SHA-256 legado"""
+    if os.path.exists(origem):
+        src = sqlite3.connect(origem)
+        dst = sqlite3.connect(destino)
+        src.backup(dst)
+        src.close()
+    else:
+        dst = sqlite3.connect(destino)
+        dst.execute('''
+            CREATE TABLE usuarios (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nome TEXT NOT NULL,
+                email TEXT UNIQUE NOT NULL,
+                username TEXT UNIQUE,
+                senha TEXT NOT NULL,
+                ativo INTEGER DEFAULT 1
+            )
+        ''')
+
+    registros = []
+    for i in range(usuarios):
+        senha = f'senha-{i}'
+        if i % 2:
+            hash_senha = senhas.gerar_hash(senha)
+        else:
+            hash_senha = hashlib.sha256(senha.encode()).hexdigest()
+        registros.append((f'Benchmark {i}', f'benchmark{i}@teste', f'benchmark{i}', hash_senha))
+    dst.executemany('INSERT INTO usuarios (nome, email, username, senha, ativo) '
+                    'VALUES (?, ?, ?, ?, 1)', registros)
+    dst.commit()
+    dst.close()
+
+def executar(clientes, usuarios, duracao):
+    """Dispara logins concorrentes e mede, em paralelo, uma requisição comum"""
+    parar = threading.Event()
+    resultados = {'logins': 0, 'falhas': 0, 'recusados': 0,
+                  'latencias_login': [], 'latencias_outras': []}
+    lock = threading.Lock()
+
+    def cliente(semente):
+        aleatorio = random.Random(semente)
+        latencias = []
+        logins = falhas = recusados = 0
+        while not parar.is_set():
+            i = aleatorio.randrange(usuarios)
+            # 10% das tentativas com senha errada
+            senha = f'senha-{i}' if aleatorio.random() >= 0.1 else 'errada'
+            inicio = time.perf_counter()
+            try:
+                if auth.verificar_login(f'benchmark{i}', senha):
+                    logins += 1
+                else:
+                    falhas += 1
+                latencias.append(time.perf_counter() - inicio)
+            except senhas.ServicoSenhasOcupado:
+                recusados += 1
+        with lock:
+            resultados['logins'] += logins
+            resultados['falhas'] += falhas
+            resultados['recusados'] += recusados
+            resultados['latencias_login'].extend(latencias)
+
+    def outra_requisicao():
+        # Simula uma página comum atendida durante a rajada de logins
+        latencias = []
+        while not parar.is_set():
+            inicio = time.perf_counter()
+            conn = auth.conectar_db()
+            try:
+                conn.execute('SELECT id, username, nome FROM usuarios ORDER BY nome LIMIT 50').fetchall()
+            finally:
+                auth.devolver_db(conn)
+            latencias.append(time.perf_counter() - inicio)
+            time.sleep(0.005)
+        with lock:
+            resultados['latencias_outras'].extend(latencias)
+
+    threads = [threading.Thread(target=cliente, args=(i,)) for i in range(clientes)]
+    threads.append(threading.Thread(target=outra_requisicao))
+    for t in threads:
+        t.start()
+    time.sleep(duracao)
+    parar.set()
+    for t in threads:
+        t.join()
+    return resultados
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de vazão de logins')
+    parser.add_argument('--banco', default='sistema.db')
+    parser.add_argument('--trabalhadores', type=int, nargs='+', default=[1, 2, 4, os.cpu_count()])
+    parser.add_argument('--clientes', type=int, default=32)
+    parser.add_argument('--usuarios', type=int, default=40)
+    parser.add_argument('--n', type=int, default=senhas.SCRYPT_N, help='custo N do scrypt')
+    parser.add_argument('--duracao', type=float, default=5.0)
+    args = parser.parse_args()
+
+    senhas.configurar(n=args.n)
+    print("=" * 78)
+    print(f"Benchmark de login: {args.clientes} clientes, {senhas.metodo_atual()}, "
+          f"{args.duracao:g}s por configuração")
+    print("=" * 78)
+    print(f"{'trabalhadores':<15}{'logins/s':>10}{'recusados':>11}{'atualizados':>13}"
+          f"{'p50 login':>11}{'p99 login':>11}{'p99 outras':>12}")
+
+    pasta = tempfile.mkdtemp(prefix='benchmark_senhas_')
+    try:
+        for trabalhadores in dict.fromkeys(args.trabalhadores):
+            senhas.configurar(trabalhadores=trabalhadores)
+            auth.DATABASE = os.path.join(pasta, f'{trabalhadores}.db')
+            preparar_copia(args.banco, auth.DATABASE, args.usuarios)
+            atualizados = senhas.estatisticas()['atualizados']
+
+            r = executar(args.clientes, args.usuarios, args.duracao)
+            atualizados = senhas.estatisticas()['atualizados'] - atualizados
+            lat = r['latencias_login']
+            print(f"{trabalhadores:<15}{(r['logins'] + r['falhas']) / args.duracao:>10.1f}"
+                  f"{r['recusados']:>11}{atualizados:>13}"
+                  f"{percentil(lat, 50) * 1000:>9.0f}ms{percentil(lat, 99) * 1000:>9.0f}ms"
+                  f"{percentil(r['latencias_outras'], 99) * 1000:>10.1f}ms")
+        auth.obter_pool().fechar()
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# benchmark_sqlite.py - Compara perfis do SQLite com leituras e gravações concorrentes
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from banco import PERFIS_SQLITE, aplicar_perfil
+
+def preparar_copia(origem, destino):
+    """Copia o banco para um arquivo temporário com uma tabela de teste"""
+    if os.path.exists(origem):
+        src = sqlite3.connect(origem)
+        dst = sqlite3.connect(destino)
+        src.backup(dst)
+        src.close()
+    else:
+        dst = sqlite3.connect(destino)
+
+    dst.execute('''
+        CREATE TABLE IF NOT EXISTS benchmark_registros (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            thread INTEGER NOT NULL,
+            texto TEXT NOT NULL
+        )
+    ''')
+    dst.executemany('INSERT INTO benchmark_registros (thread, texto) VALUES (?, ?)',
+                    [(0, 'registro inicial %d' % i) for i in range(5000)])
+    dst.commit()
+    dst.close()
+
+def executar_perfil(arquivo, perfil, leitores, escritores, duracao):
+    """Executa leitores e escritores em paralelo e retorna os contadores"""
+    parar = threading.Event()
+    resultados = {'leituras': 0, 'gravacoes': 0, 'bloqueios': 0, 'latencias_gravacao': []}
+    lock = threading.Lock()
+
+    def abrir():
+        # timeout=0: o tempo de espera vem apenas do busy_timeout do perfil
+        conn = sqlite3.connect(arquivo, timeout=0)
+        aplicar_perfil(conn, perfil)
+        return conn
+
+    def leitor():
+        conn = abrir()
+        leituras = bloqueios = 0
+        while not parar.is_set():
+            try:
+                conn.execute('SELECT count(*), max(id) FROM benchmark_registros').fetchone()
+                conn.execute('SELECT texto FROM benchmark_registros ORDER BY id DESC LIMIT 20').fetchall()
+                leituras += 1
+            except sqlite3.OperationalError:
+                bloqueios += 1
+        conn.close()
+        with lock:
+            resultados['leituras'] += leituras
+            resultados['bloqueios'] += bloqueios
+
+    def escritor(numero):
+        conn = abrir()
+        gravacoes = bloqueios = 0
+        latencias = []
+        while not parar.is_set():
+            inicio = time.perf_counter()
+            try:
+                with conn:
+                    conn.execute('INSERT INTO benchmark_registros (thread, texto) VALUES (?, ?)',
+                                 (numero, 'gravação concorrente'))
+                    conn.execute('UPDATE benchmark_registros SET texto = texto WHERE id = ?',
+                                 (gravacoes % 5000 + 1,))
+                gravacoes += 1
+                latencias.append(time.perf_counter() - inicio)
+            except sqlite3.OperationalError:
+                bloqueios += 1
+        conn.close()
+        with lock:
+            resultados['gravacoes'] += gravacoes
+            resultados['bloqueios'] += bloqueios
+            resultados['latencias_gravacao'].extend(latencias)
+
+    threads = [threading.Thread(target=leitor) for _ in range(leitores)]
+    threads += [threading.Thread(target=escritor, args=(i + 1,)) for i in range(escritores)]
+    for t in threads:
+        t.start()
+    time.sleep(duracao)
+    parar.set()
+    for t in threads:
+        t.join()
+    return resultados
+
+def percentil(valores, p):
+    """Percentil simples (vizinho mais próximo)"""
+    if not valores:
+        return 0.0
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de perfis SQLite')
+    parser.add_argument('--banco', default='sistema.db')
+    parser.add_argument('--perfis', nargs='+', default=list(PERFIS_SQLITE))
+    parser.add_argument('--leitores', type=int, default=8)
+    parser.add_argument('--escritores', type=int, default=2)
+    parser.add_argument('--duracao', type=float, default=5.0)
+    args = parser.parse_args()
+
+    print("=" * 72)
+    print(f"Benchmark SQLite: {args.leitores} leitores, {args.escritores} escritores, "
+          f"{args.duracao:g}s por perfil")
+    print("=" * 72)
+    print(f"{'perfil':<16}{'leituras/s':>12}{'gravações/s':>13}{'bloqueios':>11}"
+          f"{'p50 grav.':>10}{'p99 grav.':>10}")
+
+    pasta = tempfile.mkdtemp(prefix='benchmark_sqlite_')
+    try:
+        for perfil in args.perfis:
+            arquivo = os.path.join(pasta, f'{perfil}.db')
+            preparar_copia(args.banco, arquivo)
+            r = executar_perfil(arquivo, perfil, args.leitores, args.escritores, args.duracao)
+            lat = r['latencias_gravacao']
+            print(f"{perfil:<16}{r['leituras'] / args.duracao:>12.0f}"
+                  f"{r['gravacoes'] / args.duracao:>13.0f}{r['bloqueios']:>11}"
+                  f"{percentil(lat, 50) * 1000:>8.1f}ms{percentil(lat, 99) * 1000:>8.1f}ms")
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
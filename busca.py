@@ -0,0 +1,169 @@
+# busca.py - Pesquisa em texto completo (FTS5) nos módulos
+import re
+import sys
+
+from markupsafe import Markup, escape
+
+LIMITE_POR_MODULO = 20
+MAX_TERMOS = 8
+
+# Colunas indexadas por módulo, com o peso de cada uma na ordenação (bm25)
+INDICES_BUSCA = {
+    'contatos': {
+        'colunas': [('nome', 10.0), ('apelido', 8.0), ('empresa', 4.0),
+                    ('bairro', 3.0), ('endereco', 2.0)],
+        'titulo': 'm.nome',
+        'detalhe': "coalesce(m.cidade, '')",
+    },
+    'emendas': {
+        'colunas': [('numero', 10.0), ('objeto', 5.0), ('proposta', 3.0),
+                    ('convenio', 3.0), ('cidade', 2.0)],
+        'titulo': "m.numero || '/' || m.ano",
+        'detalhe': "coalesce(m.objeto, '')",
+    },
+    'demandas': {
+        'colunas': [('demanda', 6.0), ('solicitante', 5.0), ('andamento', 2.0)],
+        'titulo': 'm.demanda',
+        'detalhe': 'm.solicitante',
+    },
+}
+
+# Tokenização sem acentos e sem diferenciar maiúsculas: "João" encontra "joao"
+TOKENIZADOR = 'unicode61 remove_diacritics 2'
+# Índices de prefixo tornam "jo*" tão barato quanto um termo completo
+PREFIXOS = '2 3 4'
+
+# Marcadores usados no snippet; trocados por <mark> depois de escapar o texto
+_INICIO_DESTAQUE = '\x02'
+_FIM_DESTAQUE = '\x03'
+
+def _sql_indice(modulo):
+    """Comandos de criação da tabela FTS e dos triggers de sincronização"""
+    colunas = [c for c, _ in INDICES_BUSCA[modulo]['colunas']]
+    fts = f'{modulo}_fts'
+    lista = ', '.join(colunas)
+    novos = ', '.join(f'new.{c}' for c in colunas)
+    antigos = ', '.join(f'old.{c}' for c in colunas)
+    return [
+        f'''CREATE VIRTUAL TABLE {fts} USING fts5(
+            {lista}, content='{modulo}', content_rowid='id',
+            tokenize='{TOKENIZADOR}', prefix='{PREFIXOS}')''',
+        f'''CREATE TRIGGER {fts}_ai AFTER INSERT ON {modulo} BEGIN
+            INSERT INTO {fts}(rowid, {lista}) VALUES (new.id, {novos});
+        END''',
+        f'''CREATE TRIGGER {fts}_ad AFTER DELETE ON {modulo} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {lista}) VALUES ('delete', old.id, {antigos});
+        END''',
+        # Só reindexa quando uma coluna indexada muda
+        f'''CREATE TRIGGER {fts}_au AFTER UPDATE OF {lista} ON {modulo} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {lista}) VALUES ('delete', old.id, {antigos});
+            INSERT INTO {fts}(rowid, {lista}) VALUES (new.id, {novos});
+        END''',
+    ]
+
+def _configurar_ordem(conn, modulo):
+    """Grava os pesos das colunas como ordenação padrão (rank) da tabela FTS"""
+    fts = f'{modulo}_fts'
+    pesos = ', '.join(str(p) for _, p in INDICES_BUSCA[modulo]['colunas'])
+    conn.execute(f"INSERT INTO {fts}({fts}, rank) VALUES ('rank', 'bm25({pesos})')")
+
+def criar_indices_busca(conn):
+    """Cria as tabelas FTS e triggers que ainda não existem e indexa os dados atuais
+
+    Usada pelas migrações; não faz commit.
+    """
+    existentes = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")}
+    criados = []
+    for modulo in INDICES_BUSCA:
+        if modulo not in existentes or f'{modulo}_fts' in existentes:
+            continue
+        for sql in _sql_indice(modulo):
+            conn.execute(sql)
+        _configurar_ordem(conn, modulo)
+        conn.execute(f"INSERT INTO {modulo}_fts({modulo}_fts) VALUES ('rebuild')")
+        criados.append(modulo)
+    return criados
+
+def reconstruir_indices_busca(conn, modulos=None):
+    """Recria os índices de busca a partir das tabelas dos módulos
+
+    Útil após importações feitas com os triggers desativados ou se o índice
+    ficar inconsistente. Retorna o número de registros indexados por módulo.
+    """
+    resultado = {}
+    for modulo in modulos or INDICES_BUSCA:
+        fts = f'{modulo}_fts'
+        conn.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+        _configurar_ordem(conn, modulo)
+        conn.execute(f"INSERT INTO {fts}({fts}) VALUES ('optimize')")
+        resultado[modulo] = conn.execute(f'SELECT count(*) FROM {modulo}').fetchone()[0]
+    conn.commit()
+    return resultado
+
+def montar_consulta(texto):
+    """Converte o texto digitado em uma consulta FTS5 por prefixo
+
+    Cada palavra vira um termo entre aspas com '*' (ex.: 'joão sil' ->
+    '"joão"* "sil"*'), então operadores e aspas digitados pelo usuário não
+    são interpretados pelo FTS5.
+    """
+    termos = re.findall(r'\w+', texto or '')[:MAX_TERMOS]
+    return ' '.join(f'"{termo}"*' for termo in termos)
+
+def buscar(conn, texto, modulos=None, limite=LIMITE_POR_MODULO):
+    """Pesquisa nos módulos e retorna os resultados ordenados por relevância em cada um"""
+    consulta = montar_consulta(texto)
+    resultados = {}
+    if not consulta:
+        return resultados
+
+    for modulo in modulos or INDICES_BUSCA:
+        config = INDICES_BUSCA[modulo]
+        fts = f'{modulo}_fts'
+        rows = conn.execute(f'''
+            SELECT m.id, {config['titulo']} AS titulo, {config['detalhe']} AS detalhe,
+                   snippet({fts}, -1, ?, ?, '…', 12) AS trecho, {fts}.rank AS relevancia
+            FROM {fts}
+            JOIN {modulo} m ON m.id = {fts}.rowid
+            WHERE {fts} MATCH ?
+            ORDER BY {fts}.rank
+            LIMIT ?
+        ''', (_INICIO_DESTAQUE, _FIM_DESTAQUE, consulta, limite)).fetchall()
+        resultados[modulo] = [dict(row) for row in rows]
+    return resultados
+
+def destacar(trecho):
+    """Escapa o trecho e converte os marcadores de destaque em <mark>"""
+    texto = str(escape(trecho or ''))
+    texto = texto.replace(_INICIO_DESTAQUE, '<mark>').replace(_FIM_DESTAQUE, '</mark>')
+    return Markup(texto)
+
+def main():
+    """Linha de comando: python busca.py reconstruir [modulo ...]"""
+    import auth
+    from migracoes import migrar
+
+    if len(sys.argv) < 2 or sys.argv[1] != 'reconstruir':
+        print("Uso: python busca.py reconstruir [contatos|emendas|demandas ...]")
+        sys.exit(1)
+
+    modulos = sys.argv[2:] or None
+    for modulo in modulos or []:
+        if modulo not in INDICES_BUSCA:
+            print(f"❌ Módulo sem índice de busca: {modulo}")
+            sys.exit(1)
+
+    migrar(auth.DATABASE)
+    # Conexão do pool: mesmo perfil de PRAGMAs do servidor (busy_timeout, WAL),
+    # então a reconstrução espera em vez de falhar com o sistema no ar
+    conn = auth.conectar_db()
+    try:
+        print("🔧 Reconstruindo índices de busca...")
+        for modulo, total in reconstruir_indices_busca(conn, modulos).items():
+            print(f"✅ {modulo}: {total} registros indexados")
+    finally:
+        auth.devolver_db(conn)
+
+if __name__ == '__main__':
+    main()
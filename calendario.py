@@ -0,0 +1,173 @@
+# calendario.py - Consultas da agenda por período e feed iCalendar (.ics)
+from calendar import monthrange
+from datetime import date, datetime, timedelta, timezone
+
+from itsdangerous import BadSignature, URLSafeSerializer
+
+VISOES = ('dia', 'semana', 'mes')
+# Janela de compromissos publicada no feed
+FEED_DIAS_ANTES = 90
+FEED_DIAS_DEPOIS = 365
+DURACAO_PADRAO = timedelta(hours=1)
+FUSO_HORARIO = 'America/Sao_Paulo'
+TAMANHO_BLOCO = 16 * 1024
+
+# (data, horario) atende a consulta por período já na ordem de exibição
+SQL_INDICE_AGENDA = 'CREATE INDEX IF NOT EXISTS idx_agenda_data_horario ON agenda(data, horario)'
+
+# Versão da agenda na tabela cache_versoes (criada em auth.py): o ETag do feed
+# é calculado sem ler os compromissos
+SQL_VERSAO_AGENDA = [
+    "INSERT OR IGNORE INTO cache_versoes (nome, versao) VALUES ('agenda', 0)",
+] + [
+    f'''CREATE TRIGGER IF NOT EXISTS agenda_versao_{sufixo} AFTER {evento} ON agenda BEGIN
+        UPDATE cache_versoes SET versao = versao + 1 WHERE nome = 'agenda';
+    END'''
+    for sufixo, evento in (('ai', 'INSERT'), ('au', 'UPDATE'), ('ad', 'DELETE'))
+]
+
+def criar_indices_calendario(conn):
+    """Cria o índice (data, horario) e o contador de versão da agenda (migração; não faz commit)"""
+    conn.execute(SQL_INDICE_AGENDA)
+    for sql in SQL_VERSAO_AGENDA:
+        conn.execute(sql)
+
+def _deslocar(dia, dias):
+    """dia + dias, limitado às datas representáveis (date.min a date.max)"""
+    try:
+        return dia + timedelta(days=dias)
+    except OverflowError:
+        return date.max if dias > 0 else date.min
+
+def intervalo(visao, referencia):
+    """Retorna (inicio, fim, anterior, proximo) do período que contém `referencia`
+
+    A semana vai de segunda a domingo; `anterior`/`proximo` são datas de
+    referência para navegar entre períodos. Nos extremos (anos 1 e 9999) a
+    navegação para no próprio período em vez de sair da faixa de datas.
+    """
+    if visao == 'dia':
+        return referencia, referencia, _deslocar(referencia, -1), _deslocar(referencia, 1)
+    if visao == 'semana':
+        inicio = _deslocar(referencia, -referencia.weekday())
+        return inicio, _deslocar(inicio, 6), _deslocar(inicio, -7), _deslocar(inicio, 7)
+    if visao == 'mes':
+        inicio = referencia.replace(day=1)
+        fim = referencia.replace(day=monthrange(referencia.year, referencia.month)[1])
+        anterior = _deslocar(inicio, -1).replace(day=1)
+        return inicio, fim, anterior, _deslocar(fim, 1)
+    raise ValueError(f'Visão inválida: {visao}')
+
+def _compromissos(conn, inicio, fim):
+    """Percorre os compromissos entre duas datas (inclusive) pelo índice (data, horario)"""
+    cursor = conn.execute('''
+        SELECT id, compromisso, data, local, horario, realizada
+        FROM agenda
+        WHERE data BETWEEN ? AND ?
+        ORDER BY data, horario
+    ''', (inicio.isoformat(), fim.isoformat()))
+    nomes = [d[0] for d in cursor.description]
+    try:
+        for row in cursor:
+            yield dict(zip(nomes, row))
+    finally:
+        cursor.close()
+
+def listar_intervalo(conn, inicio, fim):
+    """Compromissos entre duas datas (inclusive), em ordem de data e horário"""
+    return list(_compromissos(conn, inicio, fim))
+
+def versao_agenda(conn):
+    """Contador incrementado a cada alteração na agenda"""
+    row = conn.execute("SELECT versao FROM cache_versoes WHERE nome = 'agenda'").fetchone()
+    return row[0] if row else 0
+
+def etag_feed(conn, hoje=None):
+    """ETag do feed: muda quando a agenda muda ou quando a janela do feed avança"""
+    hoje = hoje or date.today()
+    return f'agenda-{versao_agenda(conn)}-{hoje.strftime("%Y%m%d")}'
+
+# Tokens do feed: o aplicativo de calendário não tem a sessão do navegador,
+# então cada usuário recebe uma URL assinada com o seu id
+
+def gerar_token(segredo, user_id):
+    return URLSafeSerializer(segredo, salt='agenda-ics').dumps(user_id)
+
+def ler_token(segredo, token):
+    """Retorna o id do usuário do token, ou None se a assinatura for inválida"""
+    try:
+        return URLSafeSerializer(segredo, salt='agenda-ics').loads(token)
+    except BadSignature:
+        return None
+
+def _escapar(texto):
+    """Escapa texto conforme o RFC 5545"""
+    return (str(texto).replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n'))
+
+def _dobrar(linha):
+    """Quebra linhas com mais de 75 octetos (continuação começa com espaço)"""
+    dados = linha.encode('utf-8')
+    if len(dados) <= 75:
+        return linha + '\r\n'
+    partes = []
+    while dados:
+        limite = 75 if not partes else 74
+        corte = min(limite, len(dados))
+        # Não corta no meio de um caractere UTF-8
+        while corte < len(dados) and (dados[corte] & 0xC0) == 0x80:
+            corte -= 1
+        partes.append(dados[:corte].decode('utf-8'))
+        dados = dados[corte:]
+    return '\r\n '.join(partes) + '\r\n'
+
+def _horario(valor):
+    """'14:00' ou '14:00:00' -> time; None se vazio ou inválido"""
+    try:
+        return datetime.strptime(str(valor)[:5], '%H:%M').time() if valor else None
+    except ValueError:
+        return None
+
+def _evento(row, carimbo):
+    """Linhas VEVENT de um compromisso"""
+    dia = date.fromisoformat(row['data'][:10])
+    linhas = ['BEGIN:VEVENT', f'UID:agenda-{row["id"]}@mandato', f'DTSTAMP:{carimbo}']
+    horario = _horario(row['horario'])
+    if horario is None:
+        linhas.append(f'DTSTART;VALUE=DATE:{dia.strftime("%Y%m%d")}')
+        linhas.append(f'DTEND;VALUE=DATE:{(dia + timedelta(days=1)).strftime("%Y%m%d")}')
+    else:
+        inicio = datetime.combine(dia, horario)
+        linhas.append(f'DTSTART:{inicio.strftime("%Y%m%dT%H%M%S")}')
+        linhas.append(f'DTEND:{(inicio + DURACAO_PADRAO).strftime("%Y%m%dT%H%M%S")}')
+    linhas.append(f'SUMMARY:{_escapar(row["compromisso"])}')
+    if row['local']:
+        linhas.append(f'LOCATION:{_escapar(row["local"])}')
+    if row['realizada']:
+        linhas.append('STATUS:CONFIRMED')
+    linhas.append('END:VEVENT')
+    return ''.join(_dobrar(l) for l in linhas)
+
+def gerar_ics(conn, hoje=None, nome='Agenda do Mandato'):
+    """Gera o feed .ics em blocos, à medida que os compromissos são lidos"""
+    hoje = hoje or date.today()
+    inicio = hoje - timedelta(days=FEED_DIAS_ANTES)
+    fim = hoje + timedelta(days=FEED_DIAS_DEPOIS)
+    carimbo = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+    cabecalho = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//Mandato//Agenda//PT-BR',
+                 'CALSCALE:GREGORIAN', 'METHOD:PUBLISH', f'X-WR-CALNAME:{_escapar(nome)}',
+                 f'X-WR-TIMEZONE:{FUSO_HORARIO}', 'REFRESH-INTERVAL;VALUE=DURATION:PT15M']
+    buffer = [''.join(_dobrar(l) for l in cabecalho)]
+    tamanho = 0
+
+    for row in _compromissos(conn, inicio, fim):
+        evento = _evento(row, carimbo)
+        buffer.append(evento)
+        tamanho += len(evento)
+        if tamanho >= TAMANHO_BLOCO:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            tamanho = 0
+    buffer.append('END:VCALENDAR\r\n')
+    yield ''.join(buffer).encode('utf-8')
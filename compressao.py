@@ -0,0 +1,124 @@
+# compressao.py - Compressão gzip/brotli das respostas dinâmicas, inclusive em streaming
+
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional; sem ele comprimimos apenas com gzip
+    brotli = None
+
+# Respostas menores que isto (em bytes) vão sem compressão: o ganho não paga o custo
+TAMANHO_MINIMO = 1024
+# Níveis padrão. Para HTML gerado a cada requisição, níveis médios comprimem quase
+# tanto quanto os máximos com uma fração da CPU (ver benchmark_compressao.py)
+NIVEL_GZIP = 6
+QUALIDADE_BROTLI = 4
+# Ajustes por endpoint: {'gzip': nível, 'br': qualidade} ou None para não comprimir
+POR_ENDPOINT = {
+    # Exportação grande em streaming: no nível 1 o CSV fica ~20% maior, mas com
+    # um terço da CPU (não segura uma thread do servidor a cada exportação)
+    'exportar_emendas': {'gzip': 1, 'br': 1},
+}
+TIPOS_COMPRIMIVEIS = {
+    'text/html', 'text/plain', 'text/css', 'text/csv', 'text/calendar',
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+}
+
+def codificacoes_disponiveis():
+    """Codificações suportadas, da preferida para a menos preferida"""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+def escolher_codificacao(aceitas):
+    """Codificação com maior qualidade (q) no Accept-Encoding; em empate, a preferida
+
+    Retorna None se o cliente não aceita nenhuma das disponíveis.
+    """
+    melhor, melhor_q = None, 0
+    for codificacao in codificacoes_disponiveis():
+        q = aceitas[codificacao]
+        if q > melhor_q:
+            melhor, melhor_q = codificacao, q
+    return melhor
+
+def nivel_padrao(codificacao):
+    return QUALIDADE_BROTLI if codificacao == 'br' else NIVEL_GZIP
+
+def comprimir(dados, codificacao, nivel=None):
+    """Comprime o conteúdo inteiro de uma vez"""
+    nivel = nivel_padrao(codificacao) if nivel is None else nivel
+    if codificacao == 'br':
+        return brotli.compress(dados, quality=nivel)
+    # wbits 31: formato gzip (cabeçalho e CRC), sem data no cabeçalho
+    compressor = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+    return compressor.compress(dados) + compressor.flush()
+
+def comprimir_fluxo(partes, codificacao, nivel=None):
+    """Comprime um iterável de partes (bytes ou str) à medida que é lido
+
+    Só um bloco comprimido fica em memória. Ao fechar o gerador, o iterável
+    original também é fechado (libera o contexto do stream_with_context).
+    """
+    nivel = nivel_padrao(codificacao) if nivel is None else nivel
+    if codificacao == 'br':
+        compressor = brotli.Compressor(quality=nivel)
+        processar, finalizar = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+        processar, finalizar = compressor.compress, compressor.flush
+    try:
+        for parte in partes:
+            if isinstance(parte, str):
+                parte = parte.encode('utf-8')
+            saida = processar(parte)
+            if saida:
+                yield saida
+        yield finalizar()
+    finally:
+        fechar = getattr(partes, 'close', None)
+        if fechar is not None:
+            fechar()
+
+def comprimir_resposta(resposta):
+    """after_request: comprime a resposta conforme o Accept-Encoding do cliente"""
+    if (request.method == 'HEAD' or resposta.status_code < 200
+            or resposta.status_code in (204, 206, 304)
+            or resposta.direct_passthrough  # send_file: arquivo enviado pelo servidor
+            or 'Content-Encoding' in resposta.headers
+            or resposta.mimetype not in TIPOS_COMPRIMIVEIS
+            or 'no-transform' in resposta.headers.get('Cache-Control', '')):
+        return resposta
+
+    resposta.vary.add('Accept-Encoding')
+    niveis = POR_ENDPOINT.get(request.endpoint, {})
+    codificacao = escolher_codificacao(request.accept_encodings) if niveis is not None else None
+    if codificacao is None:
+        return resposta
+    nivel = niveis.get(codificacao)
+
+    if resposta.is_streamed:
+        # Tamanho desconhecido: vai em chunked, comprimido parte a parte
+        resposta.response = comprimir_fluxo(resposta.response, codificacao, nivel)
+        resposta.headers.pop('Content-Length', None)
+    else:
+        dados = resposta.get_data()
+        if len(dados) < TAMANHO_MINIMO:
+            return resposta
+        resposta.set_data(comprimir(dados, codificacao, nivel))
+    resposta.headers['Content-Encoding'] = codificacao
+
+    # O conteúdo comprimido não é idêntico byte a byte: o ETag passa a ser fraco
+    etag, fraco = resposta.get_etag()
+    if etag and not fraco:
+        resposta.set_etag(etag, weak=True)
+    return resposta
+
+def registrar_compressao(app):
+    """Registra a compressão das respostas dinâmicas na aplicação
+
+    Roda depois das demais funções de after_request, já com a resposta final.
+    Os arquivos de /assets já saem pré-comprimidos (estaticos.py) e não passam
+    por aqui.
+    """
+    app.after_request_funcs.setdefault(None, []).insert(0, comprimir_resposta)
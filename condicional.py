@@ -0,0 +1,81 @@
+# condicional.py - GET condicional (ETag/304) das páginas, a partir das versões dos dados
+
+import hashlib
+import json
+from datetime import date
+from functools import wraps
+
+from flask import Response, current_app, make_response, request, session
+
+import auth
+
+# Contadores em cache_versoes (tabela criada em auth.py; a agenda já tem o seu,
+# criado em calendario.py). Nos contatos, só as colunas usadas nos lembretes
+# de aniversário da agenda mudam a versão
+VERSOES_PAGINAS = {
+    'emendas': None,
+    'demandas': None,
+    'contatos': ['nome', 'apelido', 'cidade', 'aniversario', 'lembrete'],
+}
+
+def _sql_versao(tabela, colunas):
+    atualizacao = f'UPDATE OF {", ".join(colunas)}' if colunas else 'UPDATE'
+    return [f"INSERT OR IGNORE INTO cache_versoes (nome, versao) VALUES ('{tabela}', 0)"] + [
+        f'''CREATE TRIGGER IF NOT EXISTS {tabela}_versao_{sufixo} AFTER {evento} ON {tabela} BEGIN
+            UPDATE cache_versoes SET versao = versao + 1 WHERE nome = '{tabela}';
+        END'''
+        for sufixo, evento in (('ai', 'INSERT'), ('au', atualizacao), ('ad', 'DELETE'))
+    ]
+
+def criar_versoes_paginas(conn):
+    """Cria os contadores de versão usados nos ETags (migração; não faz commit)"""
+    for tabela, colunas in VERSOES_PAGINAS.items():
+        for sql in _sql_versao(tabela, colunas):
+            conn.execute(sql)
+
+def versao_conteudo(*partes):
+    """Resumo dos templates e arquivos estáticos: uma nova versão do sistema muda os ETags"""
+    dados = json.dumps(partes, sort_keys=True, default=str).encode()
+    return hashlib.sha256(dados).hexdigest()[:12]
+
+def etag_pagina(conn, tabelas):
+    """ETag da página atual para o usuário da sessão
+
+    Muda quando alguma das tabelas muda, quando usuarios muda (permissões,
+    nome), quando o dia vira, quando o sistema é atualizado e a cada nova
+    sessão (os formulários levam o token CSRF da sessão).
+    """
+    marcadores = ', '.join('?' * len(tabelas))
+    versoes = dict(conn.execute(
+        f'SELECT nome, versao FROM cache_versoes WHERE nome IN ({marcadores})', tabelas).fetchall())
+    partes = [current_app.config.get('VERSAO_PAGINAS'), request.full_path,
+              session.get('user_id'), auth.token_csrf(), auth.versao_usuarios(),
+              date.today().isoformat(),
+              [versoes.get(tabela) for tabela in tabelas]]
+    return hashlib.sha256(json.dumps(partes).encode()).hexdigest()[:24]
+
+def pagina_condicional(*tabelas):
+    """Decorador: responde 304 sem executar a view se a página não mudou
+
+    `tabelas` são os nomes em cache_versoes dos dados mostrados na página.
+    Com mensagens flash pendentes a página é sempre gerada (e sem ETag),
+    para a mensagem não ficar guardada no cache do navegador.
+    """
+    def decorador(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET' or '_flashes' in session:
+                return view(*args, **kwargs)
+            etag = etag_pagina(auth.get_db(), tabelas)
+            # ETag fraco: a mesma página vai comprimida ou não conforme o cliente
+            if request.if_none_match.contains_weak(etag):
+                resposta = Response(status=304)
+            else:
+                resposta = make_response(view(*args, **kwargs))
+                if resposta.status_code != 200:
+                    return resposta
+            resposta.set_etag(etag, weak=True)
+            resposta.headers['Cache-Control'] = 'private, no-cache'
+            return resposta
+        return wrapper
+    return decorador
@@ -0,0 +1,118 @@
+# consultas_lentas.py - Registro das consultas SQL lentas, com plano de execução e rota
+
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from flask import has_request_context, request
+
+# Consultas que levam pelo menos este tempo (execute + fetch) são registradas
+LIMIAR_SEGUNDOS = 0.1
+# A mesma consulta (SQL normalizado) é registrada no máximo uma vez por intervalo;
+# as repetições no meio são só contadas
+INTERVALO_AMOSTRA = 60.0
+# None: só o logger 'consultas_lentas' (saída padrão do servidor)
+ARQUIVO_LOG = 'consultas_lentas.log'
+TAMANHO_LOG = 5 * 1024 * 1024
+ARQUIVOS_LOG = 3
+MAX_CONSULTAS_ACOMPANHADAS = 1000
+
+logger = logging.getLogger('consultas_lentas')
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMERO = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+
+_ultimos = {}  # SQL normalizado -> [momento do último registro, repetições omitidas]
+_lock = threading.Lock()
+_configurado = False
+
+def normalizar(sql):
+    """SQL em uma linha, com textos e números trocados por ? (agrupa as variações da consulta)"""
+    sql = _NUMERO.sub('?', _LITERAL.sub('?', sql))
+    return ' '.join(sql.split())
+
+def parametros_nulos(sql):
+    """Parâmetros nulos para preparar a consulta (o plano não depende dos valores)"""
+    sem_literais = _LITERAL.sub("''", sql)
+    nomes = re.findall(r'(?<![:\w]):(\w+)', sem_literais)
+    if nomes:
+        return dict.fromkeys(nomes)
+    return [None] * sem_literais.count('?')
+
+def formato_parametros(parametros):
+    """Tipos dos parâmetros, sem os valores (que podem ter dados pessoais)"""
+    if isinstance(parametros, dict):
+        return {nome: type(valor).__name__ for nome, valor in parametros.items()}
+    if isinstance(parametros, (list, tuple)):
+        return [type(valor).__name__ for valor in parametros]
+    return type(parametros).__name__
+
+def _configurar():
+    """Adiciona o handler do arquivo uma única vez, mesmo com várias threads chegando juntas"""
+    global _configurado
+    with _lock:
+        if _configurado:
+            return
+        if ARQUIVO_LOG:
+            arquivo = RotatingFileHandler(ARQUIVO_LOG, maxBytes=TAMANHO_LOG,
+                                          backupCount=ARQUIVOS_LOG, encoding='utf-8')
+            arquivo.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(arquivo)
+        _configurado = True
+
+def _amostrar(chave):
+    """Se a consulta deve ser registrada agora; retorna as repetições omitidas (ou None)"""
+    agora = time.monotonic()
+    with _lock:
+        ultimo = _ultimos.get(chave)
+        if ultimo is not None and agora - ultimo[0] < INTERVALO_AMOSTRA:
+            ultimo[1] += 1
+            return None
+        if ultimo is None and len(_ultimos) >= MAX_CONSULTAS_ACOMPANHADAS:
+            _ultimos.clear()
+        omitidas = ultimo[1] if ultimo else 0
+        _ultimos[chave] = [agora, 0]
+        return omitidas
+
+def _plano(conn, sql, parametros):
+    # Chama sqlite3.Connection.execute direto: o EXPLAIN não entra nas métricas
+    try:
+        return [row[3] for row in sqlite3.Connection.execute(
+            conn, f'EXPLAIN QUERY PLAN {sql}', parametros)]
+    except (sqlite3.Error, ValueError) as e:
+        return [f'(plano indisponível: {e})']
+
+def registrar(conn, sql, parametros, segundos, lote=False):
+    """Registra a consulta lenta, se não foi registrada há pouco tempo
+
+    `lote` indica executemany: o plano é obtido com parâmetros nulos.
+    """
+    chave = normalizar(sql)
+    omitidas = _amostrar(chave)
+    if omitidas is None:
+        return
+    if not _configurado:
+        _configurar()
+
+    if lote or not isinstance(parametros, (dict, list, tuple)):
+        formato = 'lote' if lote else formato_parametros(parametros)
+        parametros = parametros_nulos(sql)
+    else:
+        formato = formato_parametros(parametros)
+    registro = {
+        'data': datetime.now().isoformat(timespec='milliseconds'),
+        'duracao_ms': round(segundos * 1000, 1),
+        'sql': chave,
+        'parametros': formato,
+        'plano': _plano(conn, sql, parametros),
+        'omitidas': omitidas,
+    }
+    if has_request_context():
+        registro['rota'] = f'{request.method} {request.path}'
+        registro['endpoint'] = request.endpoint
+    logger.warning(json.dumps(registro, ensure_ascii=False))
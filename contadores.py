@@ -0,0 +1,108 @@
+# contadores.py - Contadores do painel de demandas mantidos por triggers
+import sys
+
+# Categorias exibidas no painel; o total é a soma delas
+CATEGORIAS_DEMANDAS = [
+    ('resolvidas', 'Resolvidas', '#27ae60'),
+    ('em_andamento', 'Em Andamento', '#f39c12'),
+    ('pendentes', 'Pendentes', '#e74c3c'),
+]
+
+def _categoria(linha):
+    """Expressão SQL da categoria de uma demanda (linha = 'new', 'old' ou tabela)"""
+    return (f"CASE WHEN {linha}.situacao = 'concluida' THEN 'resolvidas' "
+            f"WHEN trim(coalesce({linha}.andamento, '')) <> '' THEN 'em_andamento' "
+            f"ELSE 'pendentes' END")
+
+SQL_CONTADORES = [
+    '''CREATE TABLE IF NOT EXISTS demandas_contadores (
+        categoria TEXT PRIMARY KEY,
+        total INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID''',
+    f'''CREATE TRIGGER IF NOT EXISTS demandas_contadores_ai AFTER INSERT ON demandas BEGIN
+        UPDATE demandas_contadores SET total = total + 1 WHERE categoria = {_categoria('new')};
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS demandas_contadores_ad AFTER DELETE ON demandas BEGIN
+        UPDATE demandas_contadores SET total = total - 1 WHERE categoria = {_categoria('old')};
+    END''',
+    # Só mexe nos contadores quando a demanda muda de categoria
+    f'''CREATE TRIGGER IF NOT EXISTS demandas_contadores_au AFTER UPDATE OF situacao, andamento ON demandas
+    WHEN {_categoria('old')} <> {_categoria('new')} BEGIN
+        UPDATE demandas_contadores SET total = total - 1 WHERE categoria = {_categoria('old')};
+        UPDATE demandas_contadores SET total = total + 1 WHERE categoria = {_categoria('new')};
+    END''',
+]
+
+def criar_contadores(conn):
+    """Cria a tabela de contadores e os triggers e faz a contagem inicial
+
+    Usada pelas migrações; não faz commit.
+    """
+    for sql in SQL_CONTADORES:
+        conn.execute(sql)
+    _recontar(conn)
+
+def ler_contadores(conn):
+    """Lê os contadores do painel (uma linha por categoria, sem varrer demandas)"""
+    valores = dict(conn.execute('SELECT categoria, total FROM demandas_contadores').fetchall())
+    contadores = {chave: valores.get(chave, 0) for chave, _, _ in CATEGORIAS_DEMANDAS}
+    contadores['total'] = sum(contadores.values())
+    return contadores
+
+def _recontar(conn):
+    """Conta as demandas por categoria e grava os contadores que divergirem"""
+    reais = dict(conn.execute(
+        f'SELECT {_categoria("demandas")}, count(*) FROM demandas GROUP BY 1').fetchall())
+    gravados = dict(conn.execute('SELECT categoria, total FROM demandas_contadores').fetchall())
+    divergencias = {}
+    for chave, _, _ in CATEGORIAS_DEMANDAS:
+        real = reais.get(chave, 0)
+        if gravados.get(chave) != real:
+            divergencias[chave] = (gravados.get(chave), real)
+            conn.execute('INSERT INTO demandas_contadores (categoria, total) VALUES (?, ?) '
+                         'ON CONFLICT(categoria) DO UPDATE SET total = excluded.total',
+                         (chave, real))
+    return divergencias
+
+def reconciliar_contadores(conn):
+    """Recalcula os contadores a partir da tabela demandas e corrige divergências
+
+    Roda em uma transação IMMEDIATE, então nenhuma gravação acontece entre a
+    contagem e a correção. Retorna {categoria: (gravado, real)} das que divergiam.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        divergencias = _recontar(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return divergencias
+
+def main():
+    """Linha de comando: python contadores.py reconciliar"""
+    import auth
+    from migracoes import migrar
+
+    if len(sys.argv) < 2 or sys.argv[1] != 'reconciliar':
+        print("Uso: python contadores.py reconciliar")
+        sys.exit(1)
+
+    migrar(auth.DATABASE)
+    conn = auth.conectar_db()
+    try:
+        print("🔧 Reconciliando contadores de demandas...")
+        divergencias = reconciliar_contadores(conn)
+        for chave, (gravado, real) in divergencias.items():
+            print(f"⚠️  {chave}: {gravado} -> {real}")
+        if not divergencias:
+            print("✅ Contadores corretos")
+        else:
+            print(f"✅ {len(divergencias)} contador(es) corrigido(s)")
+        for chave, total in ler_contadores(conn).items():
+            print(f"   {chave}: {total}")
+    finally:
+        auth.devolver_db(conn)
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,8 @@ import sqlite3
 import shutil
 from datetime import datetime
 
+from backups import copiar_banco
+
 def verificar_sistema():
     """Verifica o estado atual do sistema"""
     print("=" * 60)
@@ -60,10 +62,10 @@ def fazer_backup():
         shutil.copy2('Mandato.py', f'{backup_dir}/Mandato_old.py')
         print(f"✅ Backup de Mandato.py salvo em {backup_dir}/")
     
-    # Backup dos bancos
+    # Backup dos bancos (API de backup do SQLite: cópia consistente mesmo em uso)
     for arquivo in os.listdir('.'):
         if arquivo.endswith('.db'):
-            shutil.copy2(arquivo, f'{backup_dir}/{arquivo}')
+            copiar_banco(arquivo, f'{backup_dir}/{arquivo}')
             print(f"✅ Backup de {arquivo} salvo em {backup_dir}/")
     
     return backup_dir
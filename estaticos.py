@@ -0,0 +1,97 @@
+# estaticos.py - Arquivos estáticos com hash no nome e pré-comprimidos
+
+import gzip
+import hashlib
+import mimetypes
+import os
+
+from flask import abort, request, send_file, url_for
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional; sem ele servimos apenas gzip
+    brotli = None
+
+# Um ano: o hash no nome muda sempre que o conteúdo muda
+CACHE_MAX_AGE = 365 * 24 * 3600
+PASTA_SAIDA = 'dist'
+
+def _gravar(caminho, dados):
+    """Grava o arquivo de forma atômica (vários workers podem iniciar juntos)"""
+    temporario = f'{caminho}.{os.getpid()}.tmp'
+    with open(temporario, 'wb') as f:
+        f.write(dados)
+    os.replace(temporario, caminho)
+
+def compilar_asset(origem, pasta_saida, relativo):
+    """Gera a cópia com hash no nome e suas versões gzip e brotli
+
+    Retorna (nome com hash, {codificação: caminho}).
+    """
+    with open(origem, 'rb') as f:
+        dados = f.read()
+
+    digest = hashlib.sha256(dados).hexdigest()[:12]
+    base, ext = os.path.splitext(relativo)
+    nome = f'{base}.{digest}{ext}'
+    destino = os.path.join(pasta_saida, nome)
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+
+    variantes = {'identity': destino, 'gzip': destino + '.gz'}
+    if not os.path.exists(destino):
+        _gravar(destino, dados)
+    if not os.path.exists(variantes['gzip']):
+        _gravar(variantes['gzip'], gzip.compress(dados, compresslevel=9, mtime=0))
+    if brotli is not None:
+        variantes['br'] = destino + '.br'
+        if not os.path.exists(variantes['br']):
+            _gravar(variantes['br'], brotli.compress(dados, quality=11))
+
+    return nome, variantes
+
+def registrar_estaticos(app, arquivos):
+    """Compila os arquivos estáticos e registra a rota /assets na aplicação
+
+    `arquivos` são caminhos relativos à pasta static/. Nos templates, use
+    asset_url('css/sistema.css') para obter a URL com hash.
+    """
+    pasta_saida = os.path.join(app.static_folder, PASTA_SAIDA)
+    manifesto = {}
+    variantes = {}
+    for relativo in arquivos:
+        origem = os.path.join(app.static_folder, relativo)
+        nome, caminhos = compilar_asset(origem, pasta_saida, relativo)
+        manifesto[relativo] = nome
+        variantes[nome] = caminhos
+
+    def asset_url(relativo):
+        """URL com hash do arquivo estático"""
+        return url_for('assets', nome=manifesto[relativo])
+
+    def assets(nome):
+        """Serve o arquivo na melhor codificação aceita pelo navegador"""
+        caminhos = variantes.get(nome)
+        if caminhos is None:
+            abort(404)
+
+        codificacao = 'identity'
+        aceitas = request.accept_encodings
+        if 'br' in caminhos and aceitas['br']:
+            codificacao = 'br'
+        elif aceitas['gzip']:
+            codificacao = 'gzip'
+
+        # send_file usa o wsgi.file_wrapper do servidor (sendfile), sem cópia em Python
+        mimetype = mimetypes.guess_type(nome)[0] or 'application/octet-stream'
+        resposta = send_file(caminhos[codificacao], mimetype=mimetype,
+                             max_age=CACHE_MAX_AGE, conditional=True, etag=True)
+        if codificacao != 'identity':
+            resposta.headers['Content-Encoding'] = codificacao
+        resposta.headers['Vary'] = 'Accept-Encoding'
+        resposta.cache_control.public = True
+        resposta.cache_control.immutable = True
+        return resposta
+
+    app.add_url_rule('/assets/<path:nome>', 'assets', assets)
+    app.jinja_env.globals['asset_url'] = asset_url
+    return manifesto
@@ -0,0 +1,135 @@
+# exportacao.py - Exportação de emendas em Excel/CSV com memória constante
+import csv
+import io
+import os
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # openpyxl é opcional; sem ele apenas CSV está disponível
+    Workbook = None
+
+from listagens import montar_filtros, ordem_sql
+
+# Linhas lidas do banco por vez e tamanho dos blocos enviados na resposta
+TAMANHO_LOTE = 1000
+TAMANHO_BLOCO = 64 * 1024
+
+COLUNAS_EMENDAS = [
+    ('numero', 'Número'),
+    ('ano', 'Ano'),
+    ('objeto', 'Objeto'),
+    ('proposta', 'Proposta'),
+    ('convenio', 'Convênio'),
+    ('valor', 'Valor'),
+    ('situacao', 'Situação'),
+    ('valor_pago', 'Valor Pago'),
+    ('data_pagamento', 'Data Pagamento'),
+    ('ordem_bancaria', 'Ordem Bancária'),
+    ('cnpj', 'CNPJ'),
+    ('cidade', 'Cidade'),
+    ('quem_vai_executar', 'Quem vai executar'),
+    ('assessor', 'Assessor'),
+    ('regiao', 'Região'),
+    ('votos', 'Votos'),
+]
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+def formatos_disponiveis():
+    """Formatos de exportação suportados com as bibliotecas instaladas"""
+    return [f for f in FORMATOS if f != 'xlsx' or Workbook is not None]
+
+def nome_arquivo(modulo, formato):
+    """Nome do arquivo baixado, com a data do dia"""
+    return f'{modulo}_{datetime.now().strftime("%Y%m%d")}.{formato}'
+
+def ler_lotes(conn, modulo, colunas, filtros=None, tamanho_lote=TAMANHO_LOTE):
+    """Percorre o resultado com fetchmany, mantendo apenas um lote em memória"""
+    condicoes, params = montar_filtros(modulo, filtros)
+    sql = f'SELECT {", ".join(c for c, _ in colunas)} FROM {modulo}'
+    if condicoes:
+        sql += f' WHERE {" AND ".join(condicoes)}'
+    sql += f' ORDER BY {ordem_sql(modulo)}'
+
+    cursor = conn.execute(sql, params)
+    try:
+        while True:
+            lote = cursor.fetchmany(tamanho_lote)
+            if not lote:
+                break
+            yield lote
+    finally:
+        cursor.close()
+
+def _valor_csv(valor):
+    """Formata números com vírgula decimal, como o Excel em português espera"""
+    if isinstance(valor, (float, Decimal)):
+        return f'{valor:.2f}'.replace('.', ',')
+    return '' if valor is None else valor
+
+def gerar_csv(lotes, colunas):
+    """Gera o CSV em blocos de texto (separador ';' e BOM para o Excel)"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=';', lineterminator='\r\n')
+    buffer.write('\ufeff')
+    escritor.writerow([titulo for _, titulo in colunas])
+    for lote in lotes:
+        for row in lote:
+            escritor.writerow([_valor_csv(v) for v in row])
+        if buffer.tell() >= TAMANHO_BLOCO:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+def _valor_xlsx(valor):
+    """Converte datas ISO em date para que o Excel as reconheça"""
+    if isinstance(valor, str) and len(valor) == 10 and valor[4] == '-' and valor[7] == '-':
+        try:
+            return date.fromisoformat(valor)
+        except ValueError:
+            pass
+    return valor
+
+def gerar_xlsx(lotes, colunas, titulo='Planilha'):
+    """Gera o XLSX com o modo write-only do openpyxl e envia o arquivo em blocos
+
+    No modo write-only cada linha vai direto para um arquivo temporário, então
+    a memória não cresce com o número de linhas; o arquivo final também é lido
+    em blocos e apagado ao terminar.
+    """
+    if Workbook is None:
+        raise RuntimeError('Exportação Excel requer o pacote openpyxl')
+
+    workbook = Workbook(write_only=True)
+    planilha = workbook.create_sheet(titulo)
+    planilha.append([t for _, t in colunas])
+    for lote in lotes:
+        for row in lote:
+            planilha.append([_valor_xlsx(v) for v in row])
+
+    descritor, caminho = tempfile.mkstemp(suffix='.xlsx')
+    os.close(descritor)
+    try:
+        workbook.save(caminho)
+        with open(caminho, 'rb') as f:
+            while True:
+                bloco = f.read(TAMANHO_BLOCO)
+                if not bloco:
+                    break
+                yield bloco
+    finally:
+        os.remove(caminho)
+
+def exportar(conn, modulo, colunas, formato, filtros=None):
+    """Retorna um gerador com o conteúdo do arquivo exportado"""
+    lotes = ler_lotes(conn, modulo, colunas, filtros)
+    if formato == 'xlsx':
+        return gerar_xlsx(lotes, colunas, titulo=modulo.capitalize())
+    return gerar_csv(lotes, colunas)
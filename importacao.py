@@ -0,0 +1,431 @@
+# importacao.py - Importação de emendas a partir de planilhas Excel/CSV
+import argparse
+import csv
+import logging
+import os
+import re
+import sys
+import time
+import unicodedata
+import zipfile
+from datetime import date, datetime, timedelta
+from xml.etree import ElementTree
+
+from exportacao import COLUNAS_EMENDAS
+from resumos import atualizar_resumos
+
+# Linhas validadas e gravadas por transação
+TAMANHO_LOTE = 2000
+
+COLUNAS_OBRIGATORIAS = ['numero', 'ano']
+
+logger = logging.getLogger('importacao')
+
+def normalizar_cabecalho(texto):
+    """'Valor Pago' -> 'valor_pago', 'Número' -> 'numero'"""
+    texto = unicodedata.normalize('NFKD', str(texto or '')).encode('ascii', 'ignore').decode()
+    return re.sub(r'[^a-z0-9]+', '_', texto.strip().lower()).strip('_')
+
+# Aceita tanto o nome da coluna quanto o título usado na exportação
+ALIASES = {}
+for _coluna, _titulo in COLUNAS_EMENDAS:
+    ALIASES[_coluna] = _coluna
+    ALIASES[normalizar_cabecalho(_titulo)] = _coluna
+
+# Conversores por coluna; levantam ValueError com a mensagem do erro
+
+def _texto(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    texto = str(valor).strip()
+    return texto or None
+
+def _inteiro(valor):
+    if valor is None or valor == '':
+        return None
+    if isinstance(valor, (int, float)) and float(valor).is_integer():
+        return int(valor)
+    texto = str(valor).strip().replace('.', '')
+    if not re.fullmatch(r'-?\d+', texto):
+        raise ValueError(f'número inteiro inválido: {valor}')
+    return int(texto)
+
+def _dinheiro(valor):
+    if valor is None or valor == '':
+        return None
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    texto = str(valor).strip().replace('R$', '').replace(' ', '')
+    if re.fullmatch(r'-?(\d{1,3}(\.\d{3})+|\d+),\d+', texto):
+        # Formato brasileiro: 1.234.567,89
+        texto = texto.replace('.', '').replace(',', '.')
+    elif re.fullmatch(r'-?\d{1,3}(\.\d{3})+', texto):
+        # Ponto seguido de três dígitos é separador de milhar: 1.500 = 1500
+        texto = texto.replace('.', '')
+    elif not re.fullmatch(r'-?\d+(\.\d{1,2})?', texto):
+        # Qualquer outra combinação (1.2345, 1,234.56...) é ambígua
+        raise ValueError(f'valor inválido: {valor}')
+    return float(texto)
+
+def _data(valor):
+    if valor is None or valor == '':
+        return None
+    if isinstance(valor, datetime):
+        return valor.date().isoformat()
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if isinstance(valor, (int, float)):
+        # Datas no XLSX são números de série (dias desde 30/12/1899)
+        return (date(1899, 12, 30) + timedelta(days=int(valor))).isoformat()
+    texto = str(valor).strip()
+    for formato in ('%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y'):
+        try:
+            return datetime.strptime(texto, formato).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f'data inválida: {valor}')
+
+def cnpj_valido(digitos):
+    """Valida os dígitos verificadores de um CNPJ (14 dígitos)"""
+    if len(digitos) != 14 or digitos == digitos[0] * 14:
+        return False
+    numeros = [int(d) for d in digitos]
+    for posicao in (12, 13):
+        pesos = list(range(posicao - 7, 1, -1)) + list(range(9, 1, -1))
+        soma = sum(n * p for n, p in zip(numeros[:posicao], pesos))
+        digito = 11 - soma % 11
+        if (0 if digito >= 10 else digito) != numeros[posicao]:
+            return False
+    return True
+
+def _cnpj(valor):
+    texto = _texto(valor)
+    if texto is None:
+        return None
+    digitos = re.sub(r'\D', '', texto)
+    if texto.isdigit():
+        # O Excel remove zeros à esquerda de CNPJs digitados como número
+        digitos = digitos.zfill(14)
+    if not cnpj_valido(digitos):
+        raise ValueError(f'CNPJ inválido: {texto}')
+    return f'{digitos[:2]}.{digitos[2:5]}.{digitos[5:8]}/{digitos[8:12]}-{digitos[12:]}'
+
+def _ano(valor):
+    ano = _inteiro(valor)
+    if ano is None:
+        return None
+    if not 1900 <= ano <= 2100:
+        raise ValueError(f'ano fora do intervalo: {ano}')
+    return ano
+
+CONVERSORES = {
+    'ano': _ano,
+    'valor': _dinheiro,
+    'valor_pago': _dinheiro,
+    'data_pagamento': _data,
+    'cnpj': _cnpj,
+    'votos': _inteiro,
+}
+
+_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_NS_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+
+def _caminho_primeira_planilha(arquivo):
+    """Caminho, dentro do XLSX, da primeira planilha do workbook"""
+    workbook = ElementTree.fromstring(arquivo.read('xl/workbook.xml'))
+    rid = workbook.find(f'{_NS}sheets/{_NS}sheet').get(f'{_NS_REL}id')
+    rels = ElementTree.fromstring(arquivo.read('xl/_rels/workbook.xml.rels'))
+    for rel in rels:
+        if rel.get('Id') == rid:
+            alvo = rel.get('Target')
+            return alvo.lstrip('/') if alvo.startswith('/') else f'xl/{alvo}'
+    raise ValueError('Planilha não encontrada no arquivo')
+
+def _coluna_indice(referencia):
+    """'C12' -> 2"""
+    indice = 0
+    for letra in referencia:
+        if letra.isdigit():
+            break
+        indice = indice * 26 + ord(letra) - 64
+    return indice - 1
+
+def _ler_xlsx(caminho):
+    """Lê a primeira planilha do XLSX em streaming (iterparse), linha a linha
+
+    Lê o XML direto do zip: é bem mais rápido que o modo read-only do
+    openpyxl e a memória fica limitada às strings compartilhadas.
+    """
+    with zipfile.ZipFile(caminho) as arquivo:
+        compartilhadas = []
+        if 'xl/sharedStrings.xml' in arquivo.namelist():
+            with arquivo.open('xl/sharedStrings.xml') as f:
+                for _, el in ElementTree.iterparse(f):
+                    if el.tag == f'{_NS}si':
+                        compartilhadas.append(''.join(t.text or '' for t in el.iter(f'{_NS}t')))
+                        el.clear()
+
+        with arquivo.open(_caminho_primeira_planilha(arquivo)) as f:
+            for _, el in ElementTree.iterparse(f):
+                if el.tag != f'{_NS}row':
+                    continue
+                row = []
+                for celula in el.iter(f'{_NS}c'):
+                    referencia = celula.get('r')
+                    if referencia:
+                        # Células vazias não aparecem no XML
+                        row.extend([None] * (_coluna_indice(referencia) - len(row)))
+                    tipo = celula.get('t')
+                    valor = celula.find(f'{_NS}v')
+                    if tipo == 'inlineStr':
+                        row.append(''.join(t.text or '' for t in celula.iter(f'{_NS}t')))
+                    elif valor is None or valor.text is None:
+                        row.append(None)
+                    elif tipo == 's':
+                        row.append(compartilhadas[int(valor.text)])
+                    elif tipo in ('str', 'e'):
+                        row.append(valor.text)
+                    elif tipo == 'b':
+                        row.append(valor.text == '1')
+                    else:
+                        try:
+                            row.append(int(valor.text))
+                        except ValueError:
+                            row.append(float(valor.text))
+                yield row
+                el.clear()
+
+def ler_planilha(caminho, nome=None):
+    """Lê a planilha linha a linha (XLSX ou CSV)
+
+    Gera listas de valores; a primeira é o cabeçalho.
+    """
+    nome = (nome or caminho).lower()
+    if nome.endswith('.xlsx'):
+        try:
+            yield from _ler_xlsx(caminho)
+        except (zipfile.BadZipFile, KeyError, ElementTree.ParseError):
+            raise ValueError('Arquivo XLSX inválido')
+        return
+
+    with open(caminho, newline='', encoding='utf-8-sig') as f:
+        amostra = f.read(4096)
+        f.seek(0)
+        delimitador = ';' if amostra.count(';') >= amostra.count(',') else ','
+        for row in csv.reader(f, delimiter=delimitador):
+            yield row
+
+def validar_lote(linhas, colunas):
+    """Converte e valida um lote coluna a coluna
+
+    `linhas` é uma lista de (número da linha, valores). Retorna as tuplas
+    válidas (na ordem de `colunas`) e a lista de erros (linha, mensagem, valores).
+    """
+    # Transpõe o lote: cada coluna é convertida de uma vez
+    convertidas = []
+    erros_por_linha = {}
+    for indice, coluna in enumerate(colunas):
+        conversor = CONVERSORES.get(coluna, _texto)
+        valores = []
+        for numero, row in linhas:
+            bruto = row[indice] if indice < len(row) else None
+            try:
+                valores.append(conversor(bruto))
+            except ValueError as e:
+                erros_por_linha.setdefault(numero, []).append(f'{coluna}: {e}')
+                valores.append(None)
+        convertidas.append(valores)
+
+    validas = []
+    erros = []
+    for posicao, (numero, row) in enumerate(linhas):
+        valores = tuple(col[posicao] for col in convertidas)
+        mensagens = erros_por_linha.get(numero, [])
+        for coluna in COLUNAS_OBRIGATORIAS:
+            if valores[colunas.index(coluna)] is None and not any(m.startswith(coluna) for m in mensagens):
+                mensagens.append(f'{coluna}: obrigatório')
+        if mensagens:
+            erros.append((numero, '; '.join(mensagens), row))
+        else:
+            validas.append(valores)
+    return validas, erros
+
+def emendas_duplicadas(conn, limite=5):
+    """Até `limite` chaves (numero, ano) repetidas em emendas, como 'numero/ano'"""
+    return [f'{numero}/{ano}' for numero, ano in conn.execute('''
+        SELECT numero, ano FROM emendas
+        GROUP BY numero, ano HAVING count(*) > 1 LIMIT ?
+    ''', (limite,))]
+
+def criar_chave_unica(conn):
+    """Cria o índice único (numero, ano) usado pelo upsert (migração; não faz commit)
+
+    Com emendas duplicadas o índice não é criado (a atualização do banco não
+    pode parar por isso): as chaves vão para o log e a importação fica
+    bloqueada até as duplicadas serem resolvidas e o índice criado com
+    `python importacao.py --criar-chave`. Retorna se o índice foi criado.
+    """
+    duplicadas = emendas_duplicadas(conn)
+    if duplicadas:
+        logger.warning('Índice único de emendas não criado; duplicadas (número/ano): %s',
+                       ', '.join(duplicadas))
+        return False
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_emendas_numero_ano ON emendas(numero, ano)')
+    return True
+
+def _exigir_chave_unica(conn):
+    """Sem o índice único o upsert falharia ou gravaria emendas repetidas"""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' "
+                    "AND name = 'idx_emendas_numero_ano'").fetchone():
+        return
+    duplicadas = emendas_duplicadas(conn)
+    motivo = (f'Existem emendas duplicadas (número/ano): {", ".join(duplicadas)}. Resolva-as e '
+              if duplicadas else 'O índice único de emendas ainda não foi criado: ')
+    raise RuntimeError(f'{motivo}rode python importacao.py --criar-chave')
+
+def _gravar_lote(conn, colunas, validas):
+    """Grava o lote com upsert em (numero, ano); retorna (inseridas, atualizadas)"""
+    chaves = {(v[colunas.index('numero')], v[colunas.index('ano')]) for v in validas}
+    # "numero IN (...)" usa busca no índice (numero, ano); com valores de
+    # linha (numero, ano) IN (VALUES ...) o SQLite percorreria o índice inteiro
+    numeros = sorted({numero for numero, _ in chaves})
+    existentes = set()
+    for inicio in range(0, len(numeros), 500):
+        parte = numeros[inicio:inicio + 500]
+        existentes.update(tuple(row) for row in conn.execute(
+            f'SELECT numero, ano FROM emendas WHERE numero IN ({", ".join("?" * len(parte))})',
+            parte))
+
+    atualizaveis = [c for c in colunas if c not in ('numero', 'ano')]
+    sql = f'''
+        INSERT INTO emendas ({", ".join(colunas)})
+        VALUES ({", ".join("?" * len(colunas))})
+        ON CONFLICT(numero, ano) DO UPDATE SET
+        {", ".join(f"{c} = excluded.{c}" for c in atualizaveis) or "numero = excluded.numero"}
+    '''
+    with conn:
+        conn.executemany(sql, validas)
+
+    novas = len(chaves - existentes)
+    return novas, len(validas) - novas
+
+def importar_emendas(conn, linhas, arquivo_erros=None, progresso=None,
+                     tamanho_lote=TAMANHO_LOTE):
+    """Importa emendas de um iterável de linhas (a primeira é o cabeçalho)
+
+    Cada lote é validado e gravado em uma transação. Linhas inválidas vão
+    para `arquivo_erros` (CSV com número da linha, erro e valores originais).
+    `progresso(resumo)` é chamado após cada lote.
+    """
+    linhas = iter(linhas)
+    cabecalho = next(linhas, None)
+    if not cabecalho:
+        raise ValueError('Planilha vazia')
+
+    colunas = []
+    for titulo in cabecalho:
+        coluna = ALIASES.get(normalizar_cabecalho(titulo))
+        if coluna in colunas:
+            raise ValueError(f'Coluna repetida na planilha: {titulo}')
+        colunas.append(coluna)
+    faltando = [c for c in COLUNAS_OBRIGATORIAS if c not in colunas]
+    if faltando:
+        raise ValueError(f'Colunas obrigatórias ausentes: {", ".join(faltando)}')
+
+    # Colunas desconhecidas são ignoradas
+    indices = [i for i, c in enumerate(colunas) if c is not None]
+    colunas = [colunas[i] for i in indices]
+
+    _exigir_chave_unica(conn)
+
+    escritor_erros = None
+    if arquivo_erros is not None:
+        escritor_erros = csv.writer(arquivo_erros, delimiter=';', lineterminator='\r\n')
+        escritor_erros.writerow(['linha', 'erro'] + [str(t) for t in cabecalho])
+
+    resumo = {'linhas': 0, 'inseridas': 0, 'atualizadas': 0, 'erros': 0, 'segundos': 0.0}
+    inicio = time.perf_counter()
+
+    def processar(lote):
+        validas, erros = validar_lote(lote, colunas)
+        if validas:
+            inseridas, atualizadas = _gravar_lote(conn, colunas, validas)
+            resumo['inseridas'] += inseridas
+            resumo['atualizadas'] += atualizadas
+        resumo['erros'] += len(erros)
+        if escritor_erros is not None:
+            for numero, mensagem, row in erros:
+                escritor_erros.writerow([numero, mensagem] + ['' if v is None else v for v in row])
+        resumo['linhas'] += len(lote)
+        resumo['segundos'] = time.perf_counter() - inicio
+        if progresso:
+            progresso(dict(resumo))
+
+    lote = []
+    for numero, row in enumerate(linhas, start=2):
+        if not any(v not in (None, '') for v in row):
+            continue
+        lote.append((numero, [row[i] if i < len(row) else None for i in indices]))
+        if len(lote) >= tamanho_lote:
+            processar(lote)
+            lote = []
+    if lote:
+        processar(lote)
+    # Aplica aos resumos financeiros o log gerado pelas linhas gravadas
+    atualizar_resumos(conn)
+
+    resumo['segundos'] = time.perf_counter() - inicio
+    return resumo
+
+def main():
+    import auth
+    from migracoes import migrar
+
+    parser = argparse.ArgumentParser(description='Importa emendas de uma planilha')
+    parser.add_argument('planilha', nargs='?', help='arquivo .xlsx ou .csv')
+    parser.add_argument('--erros', default='erros_importacao.csv',
+                        help='arquivo CSV com as linhas rejeitadas')
+    parser.add_argument('--criar-chave', action='store_true',
+                        help='cria o índice único (numero, ano) depois de resolver as duplicadas')
+    args = parser.parse_args()
+    if not args.planilha and not args.criar_chave:
+        parser.error('informe a planilha ou --criar-chave')
+
+    def mostrar(resumo):
+        print(f"   {resumo['linhas']} linhas | {resumo['inseridas']} inseridas | "
+              f"{resumo['atualizadas']} atualizadas | {resumo['erros']} erros | "
+              f"{resumo['segundos']:.1f}s", end='\r')
+
+    migrar(auth.DATABASE)
+    conn = auth.conectar_db()
+    try:
+        if args.criar_chave:
+            with conn:
+                criada = criar_chave_unica(conn)
+            if not criada:
+                print(f"❌ Emendas duplicadas (número/ano): {', '.join(emendas_duplicadas(conn))}")
+                sys.exit(1)
+            print("✅ Índice único (numero, ano) criado")
+            return
+        print(f"📥 Importando {args.planilha}...")
+        with open(args.erros, 'w', newline='', encoding='utf-8-sig') as erros:
+            resumo = importar_emendas(conn, ler_planilha(args.planilha), erros, mostrar)
+    except RuntimeError as e:
+        if os.path.exists(args.erros):
+            os.remove(args.erros)
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        auth.devolver_db(conn)
+
+    print()
+    print(f"✅ Importação concluída em {resumo['segundos']:.1f}s")
+    if resumo['erros']:
+        print(f"⚠️  {resumo['erros']} linha(s) rejeitada(s); veja {args.erros}")
+    else:
+        os.remove(args.erros)
+
+if __name__ == '__main__':
+    main()
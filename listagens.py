@@ -0,0 +1,246 @@
+# listagens.py - Listagens dos módulos com paginação por chave (keyset)
+
+import base64
+import json
+
+TAMANHO_PAGINA = 50
+TAMANHO_PAGINA_MAX = 200
+# Até este número de linhas a contagem é exata; acima dele, estimada
+LIMITE_CONTAGEM_EXATA = 10000
+# Faixa dos inteiros do SQLite (64 bits com sinal); fora dela o execute falha
+INTEIRO_MIN = -2 ** 63
+INTEIRO_MAX = 2 ** 63 - 1
+
+# Ordem de cada listagem: colunas NOT NULL indexadas, desempatadas pelo id
+LISTAGENS = {
+    'agenda': {
+        'colunas': ['id', 'compromisso', 'data', 'local', 'horario', 'realizada'],
+        'ordem': ['data'],
+        'descendente': True,
+    },
+    'contatos': {
+        'colunas': ['id', 'nome', 'apelido', 'bairro', 'cidade', 'uf', 'empresa',
+                    'cargo', 'grupo', 'aniversario'],
+        'ordem': ['nome'],
+        'descendente': False,
+    },
+    'emendas': {
+        'colunas': ['id', 'numero', 'ano', 'objeto', 'valor', 'situacao', 'valor_pago',
+                    'cidade', 'assessor', 'regiao'],
+        'ordem': ['ano'],
+        'descendente': True,
+        'filtros': {'ano': int, 'situacao': str, 'cidade': str, 'assessor': str,
+                    'regiao': str},
+    },
+    'demandas': {
+        'colunas': ['id', 'demanda', 'solicitante', 'data_inicial', 'data_final',
+                    'andamento', 'situacao'],
+        'ordem': ['data_inicial'],
+        'descendente': True,
+    },
+    'cidades': {
+        'colunas': ['id', 'cidade', 'regiao', 'assessor', 'prefeito', 'votos'],
+        'ordem': ['cidade'],
+        'descendente': False,
+    },
+    'grupos': {
+        'colunas': ['id', 'grupo', 'subgrupo'],
+        'ordem': ['grupo'],
+        'descendente': False,
+    },
+}
+
+# O id (rowid) já faz parte de todo índice, então (coluna) cobre (coluna, id)
+INDICES_LISTAGENS = [
+    'CREATE INDEX IF NOT EXISTS idx_agenda_data ON agenda(data)',
+    'CREATE INDEX IF NOT EXISTS idx_contatos_nome ON contatos(nome)',
+    'CREATE INDEX IF NOT EXISTS idx_emendas_ano ON emendas(ano)',
+    'CREATE INDEX IF NOT EXISTS idx_demandas_data_inicial ON demandas(data_inicial)',
+    'CREATE INDEX IF NOT EXISTS idx_cidades_cidade ON cidades(cidade)',
+    'CREATE INDEX IF NOT EXISTS idx_grupos_grupo ON grupos(grupo)',
+]
+
+# Coluna do filtro seguida da ordem da listagem: a página e a contagem leem
+# só as linhas do filtro, já na ordem (sem eles o SQLite percorre idx_emendas_ano
+# inteiro quando o valor filtrado é raro)
+INDICES_FILTROS = [
+    'CREATE INDEX IF NOT EXISTS idx_emendas_situacao_ano ON emendas(situacao, ano)',
+    'CREATE INDEX IF NOT EXISTS idx_emendas_cidade_ano ON emendas(cidade, ano)',
+    'CREATE INDEX IF NOT EXISTS idx_emendas_assessor_ano ON emendas(assessor, ano)',
+    'CREATE INDEX IF NOT EXISTS idx_emendas_regiao_ano ON emendas(regiao, ano)',
+]
+
+def criar_indices_listagens(conn):
+    """Cria os índices usados pelas listagens (migração; não faz commit)"""
+    for sql in INDICES_LISTAGENS:
+        conn.execute(sql)
+
+def criar_indices_filtros(conn):
+    """Cria os índices dos filtros das listagens (migração; não faz commit)"""
+    for sql in INDICES_FILTROS:
+        conn.execute(sql)
+
+def codificar_cursor(valores):
+    """Codifica a chave da última linha da página como token para a URL"""
+    dados = json.dumps(valores, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(dados).decode().rstrip('=')
+
+def inteiro_sqlite(valor):
+    """int(valor) dentro da faixa do SQLite; ValueError se não couber"""
+    numero = int(valor)
+    if not INTEIRO_MIN <= numero <= INTEIRO_MAX:
+        raise ValueError(f'inteiro fora da faixa do SQLite: {valor}')
+    return numero
+
+def _valor_cursor(valor):
+    """Valor do token que pode ir ao execute como parâmetro; ValueError se não puder"""
+    if isinstance(valor, int):
+        return inteiro_sqlite(valor)
+    if isinstance(valor, str):
+        valor.encode('utf-8')  # surrogates soltos (\ud800) não vão para o SQLite
+        return valor
+    if valor is None or isinstance(valor, float):
+        return valor
+    # Listas e objetos chegariam ao execute como parâmetros inválidos
+    raise ValueError(f'valor inválido no cursor: {valor!r}')
+
+def decodificar_cursor(token, tamanho_chave):
+    """Decodifica o token de cursor; retorna None se for inválido"""
+    if not token:
+        return None
+    try:
+        dados = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        valores = json.loads(dados)
+        if not isinstance(valores, list) or len(valores) != tamanho_chave:
+            return None
+        return [_valor_cursor(valor) for valor in valores]
+    except (ValueError, TypeError):
+        return None
+
+def tamanho_pagina(valor):
+    """Converte o parâmetro de tamanho de página, limitado a TAMANHO_PAGINA_MAX"""
+    try:
+        tamanho = int(valor)
+    except (TypeError, ValueError):
+        return TAMANHO_PAGINA
+    return max(1, min(tamanho, TAMANHO_PAGINA_MAX))
+
+def ler_filtros(modulo, args):
+    """Extrai dos parâmetros da requisição os filtros aceitos pelo módulo
+
+    Valores vazios, que não convertem para o tipo da coluna ou inteiros fora
+    da faixa do SQLite são ignorados.
+    """
+    filtros = {}
+    for coluna, tipo in LISTAGENS[modulo].get('filtros', {}).items():
+        valor = (args.get(coluna) or '').strip()
+        if not valor:
+            continue
+        try:
+            filtros[coluna] = inteiro_sqlite(valor) if tipo is int else tipo(valor)
+        except ValueError:
+            continue
+    return filtros
+
+def montar_filtros(modulo, filtros):
+    """Monta as condições SQL (lista) e parâmetros dos filtros do módulo"""
+    permitidos = LISTAGENS[modulo].get('filtros', {})
+    condicoes = []
+    params = []
+    for coluna, valor in (filtros or {}).items():
+        if coluna not in permitidos:
+            raise ValueError(f'Filtro não suportado em {modulo}: {coluna}')
+        condicoes.append(f'{coluna} = ?')
+        params.append(valor)
+    return condicoes, params
+
+def contar_registros(conn, tabela, condicoes=None, params=()):
+    """Conta os registros da tabela; em tabelas grandes retorna uma estimativa
+
+    Retorna (total, estimado). A contagem exata é limitada a
+    LIMITE_CONTAGEM_EXATA linhas; acima disso usa as estatísticas do ANALYZE
+    (sqlite_stat1) ou, na falta delas, o intervalo de ids. Com filtros, o
+    total acima do limite é informado como o próprio limite, estimado.
+    """
+    where = f' WHERE {" AND ".join(condicoes)}' if condicoes else ''
+    total = conn.execute(
+        f'SELECT count(*) FROM (SELECT 1 FROM "{tabela}"{where} LIMIT ?)',
+        (*params, LIMITE_CONTAGEM_EXATA + 1)).fetchone()[0]
+    if total <= LIMITE_CONTAGEM_EXATA:
+        return total, False
+    if condicoes:
+        return LIMITE_CONTAGEM_EXATA, True
+
+    tem_stat = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'").fetchone()
+    if tem_stat:
+        row = conn.execute(
+            'SELECT stat FROM sqlite_stat1 WHERE tbl = ? ORDER BY idx IS NULL LIMIT 1',
+            (tabela,)).fetchone()
+        if row and row[0]:
+            return int(row[0].split()[0]), True
+
+    row = conn.execute(f'SELECT min(id), max(id) FROM "{tabela}"').fetchone()
+    return row[1] - row[0] + 1, True
+
+def ordem_sql(modulo):
+    """Cláusula ORDER BY da listagem do módulo"""
+    config = LISTAGENS[modulo]
+    direcao = 'DESC' if config['descendente'] else 'ASC'
+    return ', '.join(f'{c} {direcao}' for c in config['ordem'] + ['id'])
+
+def listar(conn, modulo, cursor=None, tamanho=None, filtros=None):
+    """Retorna uma página da listagem do módulo
+
+    `cursor` é o token devolvido em 'proximo' pela página anterior. A busca
+    parte diretamente da última chave vista (sem OFFSET), então o custo de
+    uma página não depende de quantas páginas vêm antes dela.
+    """
+    config = LISTAGENS[modulo]
+    chave = config['ordem'] + ['id']
+    comparacao = '<' if config['descendente'] else '>'
+    tamanho = tamanho_pagina(tamanho)
+
+    colunas = list(config['colunas'])
+    for coluna in chave:
+        if coluna not in colunas:
+            colunas.append(coluna)
+
+    condicoes_filtro, params_filtro = montar_filtros(modulo, filtros)
+    condicoes = list(condicoes_filtro)
+    params = list(params_filtro)
+    valores = decodificar_cursor(cursor, len(chave))
+    if valores is not None:
+        # Colunas fixadas por um filtro são iguais em todas as linhas; deixá-las
+        # na comparação faria o SQLite buscar por faixa e reordenar o restante
+        livres = [(c, v) for c, v in zip(chave, valores) if c not in (filtros or {})]
+        condicoes.append(f'({", ".join(c for c, _ in livres)}) {comparacao} '
+                         f'({", ".join("?" * len(livres))})')
+        params.extend(v for _, v in livres)
+
+    sql = f'SELECT {", ".join(colunas)} FROM {modulo}'
+    if condicoes:
+        sql += f' WHERE {" AND ".join(condicoes)}'
+    sql += f' ORDER BY {ordem_sql(modulo)} LIMIT ?'
+    # Uma linha a mais indica se existe próxima página
+    params.append(tamanho + 1)
+
+    rows = conn.execute(sql, params).fetchall()
+    itens = [dict(row) for row in rows[:tamanho]]
+
+    proximo = None
+    if len(rows) > tamanho:
+        ultimo = itens[-1]
+        proximo = codificar_cursor([ultimo[c] for c in chave])
+
+    total, estimado = contar_registros(conn, modulo, condicoes_filtro, params_filtro)
+    return {
+        'modulo': modulo,
+        'itens': itens,
+        'filtros': dict(filtros or {}),
+        'tamanho': tamanho,
+        'proximo': proximo,
+        'primeira': valores is None,
+        'total': total,
+        'total_estimado': estimado,
+    }
@@ -0,0 +1,374 @@
+# metricas.py - Latência por rota e consultas SQL por requisição, no formato texto do Prometheus
+
+import glob
+import hmac
+import json
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, abort, request
+from werkzeug.wsgi import ClosingIterator
+
+import consultas_lentas
+
+# Faixas dos histogramas (segundos e número de consultas por requisição)
+FAIXAS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAIXAS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 500)
+# Endereços que podem ler /metrics sem token (None: qualquer um). Atrás de um
+# proxy reverso todas as requisições vêm de 127.0.0.1: nesse caso use TOKEN
+ENDERECOS_PERMITIDOS = tuple(os.environ.get('METRICAS_ENDERECOS', '127.0.0.1,::1').split(','))
+# Se definido, /metrics exige o cabeçalho "Authorization: Bearer <token>"
+TOKEN = os.environ.get('METRICAS_TOKEN')
+# Com vários processos (gunicorn -w N), cada um grava seus totais nesta pasta a
+# cada INTERVALO_GRAVACAO segundos e /metrics soma todos. A pasta deve ser
+# esvaziada antes de iniciar o servidor. None: só o processo que atende a coleta
+PASTA_PROCESSOS = os.environ.get('METRICAS_PASTA')
+INTERVALO_GRAVACAO = 5.0
+
+class _Acumulador:
+    """Contadores de uma thread: só ela grava; a coleta apenas lê e soma"""
+
+    def __init__(self):
+        self.thread = threading.current_thread()
+        self.latencia = {}         # endpoint -> [contagem por faixa..., +Inf]
+        self.latencia_soma = {}    # endpoint -> segundos
+        self.status = {}           # (endpoint, status) -> requisições
+        self.em_andamento = {}     # endpoint -> requisições em execução
+        self.consultas = {}        # endpoint -> [contagem por faixa..., +Inf]
+        self.consultas_soma = {}   # endpoint -> consultas
+        self.sql_soma = {}         # endpoint -> segundos em SQL
+        # Requisição em andamento na thread
+        self.sql_requisicao = 0
+        self.sql_tempo_requisicao = 0.0
+
+    def somar(self, outro):
+        for nome in ('latencia', 'consultas'):
+            destino = getattr(self, nome)
+            for chave, faixas in list(getattr(outro, nome).items()):
+                atual = destino.setdefault(chave, [0] * len(faixas))
+                for i, n in enumerate(faixas):
+                    atual[i] += n
+        for nome in ('latencia_soma', 'status', 'em_andamento', 'consultas_soma', 'sql_soma'):
+            destino = getattr(self, nome)
+            for chave, valor in list(getattr(outro, nome).items()):
+                destino[chave] = destino.get(chave, 0) + valor
+
+_local = threading.local()
+_acumuladores = []
+# Totais das threads que já terminaram (servidores que criam uma thread por requisição)
+_encerradas = _Acumulador()
+_lock = threading.Lock()
+
+def _acumulador():
+    acumulador = getattr(_local, 'acumulador', None)
+    if acumulador is None:
+        acumulador = _local.acumulador = _Acumulador()
+        with _lock:
+            _acumuladores.append(acumulador)
+    return acumulador
+
+def _observar(histograma, chave, faixas, valor):
+    contagens = histograma.get(chave)
+    if contagens is None:
+        contagens = histograma[chave] = [0] * (len(faixas) + 1)
+    contagens[bisect_left(faixas, valor)] += 1
+
+def _registrar_sql(segundos, consultas=1):
+    acumulador = _acumulador()
+    acumulador.sql_requisicao += consultas
+    acumulador.sql_tempo_requisicao += segundos
+
+class CursorMedido(sqlite3.Cursor):
+    """Cursor que conta as consultas e soma o tempo gasto nelas
+
+    Mede execute, fetchmany e fetchall. fetchone e a iteração pelo cursor não
+    entram no tempo: em consultas de uma linha o trabalho todo já acontece no
+    execute, e medir cada linha custaria mais que a própria leitura. A consulta
+    que passa de consultas_lentas.LIMIAR_SEGUNDOS vai para o registro de lentas.
+    """
+
+    # (sql, parâmetros, executemany) até ser registrada como lenta. Lida em lotes
+    # (fetchmany), a consulta é registrada no lote em que passa do limiar
+    _consulta = None
+    _tempo = 0.0
+
+    def _medir(self, inicio, consultas):
+        segundos = time.perf_counter() - inicio
+        _registrar_sql(segundos, consultas)
+        self._tempo += segundos
+        if self._tempo >= consultas_lentas.LIMIAR_SEGUNDOS and self._consulta is not None:
+            sql, parametros, lote = self._consulta
+            self._consulta = None
+            consultas_lentas.registrar(self.connection, sql, parametros, self._tempo, lote)
+
+    def execute(self, sql, parametros=()):
+        self._consulta, self._tempo = (sql, parametros, False), 0.0
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parametros)
+        finally:
+            self._medir(inicio, 1)
+
+    def executemany(self, sql, parametros):
+        self._consulta, self._tempo = (sql, None, True), 0.0
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, parametros)
+        finally:
+            self._medir(inicio, 1)
+
+    def executescript(self, script):
+        self._consulta, self._tempo = (script, None, True), 0.0
+        inicio = time.perf_counter()
+        try:
+            return super().executescript(script)
+        finally:
+            self._medir(inicio, 1)
+
+    def fetchmany(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return super().fetchmany(*args, **kwargs)
+        finally:
+            self._medir(inicio, 0)
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            self._medir(inicio, 0)
+
+class ConexaoMedida(sqlite3.Connection):
+    """Conexão cujos cursores (inclusive os de conn.execute) são CursorMedido
+
+    Usada como fábrica pelo pool, então vale para conectar_db e get_db.
+    """
+
+    def cursor(self, factory=CursorMedido):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self.cursor().executemany(sql, parametros)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+_CHAVE_ENDPOINT = 'mandato.metricas.endpoint'
+
+def _registrar_endpoint():
+    """before_request: anota o endpoint da requisição e a conta como em andamento"""
+    if PASTA_PROCESSOS and _gravador_pid != os.getpid():
+        _iniciar_gravador()
+    endpoint = request.endpoint or 'nao_encontrado'
+    request.environ[_CHAVE_ENDPOINT] = endpoint
+    acumulador = _acumulador()
+    acumulador.em_andamento[endpoint] = acumulador.em_andamento.get(endpoint, 0) + 1
+
+class MedirRequisicoes:
+    """Middleware WSGI: mede cada requisição até o servidor fechar a resposta
+
+    Respostas em streaming (exportação, feed da agenda) continuam gerando o
+    corpo depois das funções de teardown do Flask; medindo aqui, a duração e
+    as consultas feitas durante o streaming entram na conta da requisição.
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        inicio = time.perf_counter()
+        acumulador = _acumulador()
+        acumulador.sql_requisicao = 0
+        acumulador.sql_tempo_requisicao = 0.0
+        status = []
+
+        def iniciar_resposta(situacao, cabecalhos, exc_info=None):
+            status.append(situacao)
+            return start_response(situacao, cabecalhos, exc_info)
+
+        try:
+            resposta = self.wsgi_app(environ, iniciar_resposta)
+        except Exception:
+            _finalizar(environ, inicio, 500)
+            raise
+        return ClosingIterator(resposta, lambda: _finalizar(
+            environ, inicio, int(status[-1].split(None, 1)[0]) if status else 500))
+
+def _finalizar(environ, inicio, status):
+    endpoint = environ.get(_CHAVE_ENDPOINT)
+    if endpoint is None:  # falhou antes do before_request
+        return
+    duracao = time.perf_counter() - inicio
+    acumulador = _acumulador()
+    acumulador.em_andamento[endpoint] = acumulador.em_andamento.get(endpoint, 0) - 1
+    _observar(acumulador.latencia, endpoint, FAIXAS_LATENCIA, duracao)
+    acumulador.latencia_soma[endpoint] = acumulador.latencia_soma.get(endpoint, 0.0) + duracao
+    acumulador.status[(endpoint, status)] = acumulador.status.get((endpoint, status), 0) + 1
+    _observar(acumulador.consultas, endpoint, FAIXAS_CONSULTAS, acumulador.sql_requisicao)
+    acumulador.consultas_soma[endpoint] = (acumulador.consultas_soma.get(endpoint, 0)
+                                           + acumulador.sql_requisicao)
+    acumulador.sql_soma[endpoint] = (acumulador.sql_soma.get(endpoint, 0.0)
+                                     + acumulador.sql_tempo_requisicao)
+
+def coletar():
+    """Soma os acumuladores de todas as threads
+
+    As threads encerradas são incorporadas aos totais e saem da lista, para a
+    coleta não crescer em servidores que criam uma thread por requisição.
+    """
+    total = _Acumulador()
+    with _lock:
+        for acumulador in [a for a in _acumuladores if not a.thread.is_alive()]:
+            _encerradas.somar(acumulador)
+            _acumuladores.remove(acumulador)
+        total.somar(_encerradas)
+        for acumulador in _acumuladores:
+            total.somar(acumulador)
+    return total
+
+# Totais por processo em PASTA_PROCESSOS
+
+_estatisticas_pool = None
+_gravador_pid = None
+_gravador_lock = threading.Lock()
+
+def _para_json(total, pool):
+    dados = {nome: getattr(total, nome) for nome in
+             ('latencia', 'latencia_soma', 'em_andamento', 'consultas', 'consultas_soma', 'sql_soma')}
+    dados['status'] = [[endpoint, status, n] for (endpoint, status), n in total.status.items()]
+    dados['pool'] = pool or {}
+    return dados
+
+def _de_json(dados):
+    total = _Acumulador()
+    for nome in ('latencia', 'latencia_soma', 'em_andamento', 'consultas', 'consultas_soma', 'sql_soma'):
+        setattr(total, nome, dados[nome])
+    total.status = {(endpoint, status): n for endpoint, status, n in dados['status']}
+    return total, dados['pool']
+
+def gravar_processo():
+    """Grava os totais deste processo em PASTA_PROCESSOS/<pid>.json"""
+    pool = _estatisticas_pool() if _estatisticas_pool else None
+    caminho = os.path.join(PASTA_PROCESSOS, f'{os.getpid()}.json')
+    temporario = f'{caminho}.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(_para_json(coletar(), pool), arquivo)
+    os.replace(temporario, caminho)  # quem lê nunca vê o arquivo pela metade
+
+def _iniciar_gravador():
+    """Thread que grava os totais periodicamente; uma por processo (inclusive
+    nos workers criados por fork depois da importação)"""
+    global _gravador_pid
+    with _gravador_lock:
+        if _gravador_pid == os.getpid():
+            return
+        _gravador_pid = os.getpid()
+        os.makedirs(PASTA_PROCESSOS, exist_ok=True)
+
+    def gravar():
+        while True:
+            time.sleep(INTERVALO_GRAVACAO)
+            try:
+                gravar_processo()
+            except OSError:
+                pass
+
+    threading.Thread(target=gravar, name='metricas-gravador', daemon=True).start()
+
+def coletar_processos():
+    """Soma os totais gravados por todos os processos (o deste, atualizado agora)
+
+    Processos encerrados continuam somados, para os contadores não voltarem.
+    """
+    gravar_processo()
+    total, pool = _Acumulador(), {}
+    for caminho in glob.glob(os.path.join(PASTA_PROCESSOS, '*.json')):
+        try:
+            with open(caminho, encoding='utf-8') as arquivo:
+                processo, pool_processo = _de_json(json.load(arquivo))
+        except (OSError, ValueError, KeyError):
+            continue
+        total.somar(processo)
+        for nome, valor in pool_processo.items():
+            pool[nome] = pool.get(nome, 0) + valor
+    return total, pool
+
+def _acesso_permitido():
+    if TOKEN:
+        enviado = request.headers.get('Authorization', '').encode()
+        return hmac.compare_digest(enviado, f'Bearer {TOKEN}'.encode())
+    if ENDERECOS_PERMITIDOS is None:
+        return True
+    # Requisição repassada por um proxy: remote_addr é o do proxy, não o do cliente
+    if 'X-Forwarded-For' in request.headers or 'Forwarded' in request.headers:
+        return False
+    return request.remote_addr in ENDERECOS_PERMITIDOS
+
+def _rotulos(**rotulos):
+    return ','.join(f'{nome}="{str(valor)}"' for nome, valor in rotulos.items())
+
+def _histograma(linhas, nome, faixas, contagens, somas):
+    for endpoint in sorted(contagens):
+        acumulado = 0
+        for limite, n in zip(list(faixas) + ['+Inf'], contagens[endpoint]):
+            acumulado += n
+            linhas.append(f'{nome}_bucket{{{_rotulos(endpoint=endpoint, le=limite)}}} {acumulado}')
+        linhas.append(f'{nome}_sum{{{_rotulos(endpoint=endpoint)}}} {somas.get(endpoint, 0)}')
+        linhas.append(f'{nome}_count{{{_rotulos(endpoint=endpoint)}}} {acumulado}')
+
+def formatar(total, pool=None):
+    """Texto no formato de exposição do Prometheus"""
+    linhas = [
+        '# HELP mandato_requisicao_segundos Duração das requisições por endpoint',
+        '# TYPE mandato_requisicao_segundos histogram',
+    ]
+    _histograma(linhas, 'mandato_requisicao_segundos', FAIXAS_LATENCIA,
+                total.latencia, total.latencia_soma)
+    linhas += ['# HELP mandato_requisicoes_total Requisições concluídas por endpoint e status',
+               '# TYPE mandato_requisicoes_total counter']
+    for (endpoint, status), n in sorted(total.status.items()):
+        linhas.append(f'mandato_requisicoes_total{{{_rotulos(endpoint=endpoint, status=status)}}} {n}')
+    linhas += ['# HELP mandato_requisicoes_em_andamento Requisições em execução por endpoint',
+               '# TYPE mandato_requisicoes_em_andamento gauge']
+    for endpoint, n in sorted(total.em_andamento.items()):
+        linhas.append(f'mandato_requisicoes_em_andamento{{{_rotulos(endpoint=endpoint)}}} {n}')
+    linhas += ['# HELP mandato_sql_consultas_por_requisicao Consultas SQL feitas em cada requisição',
+               '# TYPE mandato_sql_consultas_por_requisicao histogram']
+    _histograma(linhas, 'mandato_sql_consultas_por_requisicao', FAIXAS_CONSULTAS,
+                total.consultas, total.consultas_soma)
+    linhas += ['# HELP mandato_sql_segundos_total Tempo gasto em SQL por endpoint',
+               '# TYPE mandato_sql_segundos_total counter']
+    for endpoint, segundos in sorted(total.sql_soma.items()):
+        linhas.append(f'mandato_sql_segundos_total{{{_rotulos(endpoint=endpoint)}}} {segundos}')
+    for nome, valor in sorted((pool or {}).items()):
+        linhas += [f'# TYPE mandato_pool_{nome} gauge', f'mandato_pool_{nome} {valor}']
+    return '\n'.join(linhas) + '\n'
+
+def registrar_metricas(app, estatisticas_pool=None):
+    """Registra a medição das requisições e a rota /metrics na aplicação
+
+    `estatisticas_pool`, se dada, é chamada na coleta e seus valores saem
+    como mandato_pool_* (somados entre os processos, com PASTA_PROCESSOS).
+    """
+    global _estatisticas_pool
+    _estatisticas_pool = estatisticas_pool
+    app.before_request_funcs.setdefault(None, []).insert(0, _registrar_endpoint)
+    app.wsgi_app = MedirRequisicoes(app.wsgi_app)
+
+    @app.route('/metrics')
+    def metricas():
+        if not _acesso_permitido():
+            abort(404)
+        if PASTA_PROCESSOS:
+            total, pool = coletar_processos()
+        else:
+            total, pool = coletar(), estatisticas_pool() if estatisticas_pool else None
+        return Response(formatar(total, pool),
+                        mimetype='text/plain; version=0.0.4; charset=utf-8')
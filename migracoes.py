@@ -0,0 +1,377 @@
+# migracoes.py - Migrações versionadas do banco (PRAGMA user_version)
+import argparse
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import senhas
+from aniversarios import criar_indice_aniversarios
+from auth import DATABASE, criar_versoes_cache
+from busca import criar_indices_busca
+from calendario import criar_indices_calendario
+from condicional import criar_versoes_paginas
+from contadores import criar_contadores
+from importacao import criar_chave_unica
+from listagens import criar_indices_filtros, criar_indices_listagens
+from permissoes import MODULOS, converter_permissoes_legadas
+from resumos import criar_resumos
+
+# Esquema dos módulos; CREATE IF NOT EXISTS para bancos criados pelo init_db antigo
+SQL_ESQUEMA_BASE = [
+    '''CREATE TABLE IF NOT EXISTS agenda (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        compromisso TEXT NOT NULL,
+        data DATE NOT NULL,
+        local TEXT,
+        horario TIME,
+        realizada BOOLEAN DEFAULT FALSE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''',
+    '''CREATE TABLE IF NOT EXISTS contatos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nome TEXT NOT NULL,
+        apelido TEXT,
+        endereco TEXT,
+        comp_endereco TEXT,
+        bairro TEXT,
+        cep TEXT,
+        grupo TEXT,
+        aniversario DATE,
+        lembrete TEXT CHECK(lembrete IN ('diario', 'semanal')),
+        empresa TEXT,
+        cargo TEXT,
+        nome_pai TEXT,
+        nome_mae TEXT,
+        uf TEXT,
+        cidade TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''',
+    '''CREATE TABLE IF NOT EXISTS emendas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        numero TEXT NOT NULL,
+        ano INTEGER NOT NULL,
+        objeto TEXT,
+        proposta TEXT,
+        convenio TEXT,
+        valor DECIMAL(15,2),
+        situacao TEXT,
+        valor_pago DECIMAL(15,2),
+        data_pagamento DATE,
+        ordem_bancaria TEXT,
+        cnpj TEXT,
+        assessor TEXT,
+        regiao TEXT,
+        votos INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        cidade TEXT,
+        quem_vai_executar TEXT
+    )''',
+    '''CREATE TABLE IF NOT EXISTS demandas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        demanda TEXT NOT NULL,
+        solicitante TEXT NOT NULL,
+        data_inicial DATE NOT NULL,
+        data_final DATE,
+        andamento TEXT,
+        situacao TEXT CHECK(situacao IN ('aberta', 'concluida')) DEFAULT 'aberta',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''',
+    '''CREATE TABLE IF NOT EXISTS cidades (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        cidade TEXT NOT NULL,
+        regiao TEXT,
+        assessor TEXT,
+        apoiador TEXT,
+        prefeito TEXT,
+        vice_prefeito TEXT,
+        vereador TEXT,
+        presidente_partido TEXT,
+        votos INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''',
+    '''CREATE TABLE IF NOT EXISTS grupos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        grupo TEXT NOT NULL,
+        subgrupo TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''',
+    '''CREATE TABLE IF NOT EXISTS usuarios (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nome TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        username TEXT UNIQUE,
+        codigo TEXT UNIQUE,
+        senha TEXT NOT NULL,
+        cargo TEXT DEFAULT 'funcionario',
+        ativo INTEGER DEFAULT 1,
+        data_criacao TEXT DEFAULT CURRENT_TIMESTAMP
+    )''',
+    '''CREATE TABLE IF NOT EXISTS permissoes_usuarios (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        modulo VARCHAR(50) NOT NULL,
+        pode_ver BOOLEAN DEFAULT 0,
+        pode_adicionar BOOLEAN DEFAULT 0,
+        pode_editar BOOLEAN DEFAULT 0,
+        pode_excluir BOOLEAN DEFAULT 0,
+        ativo BOOLEAN DEFAULT 1,
+        data_criacao DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES usuarios(id) ON DELETE CASCADE,
+        UNIQUE(user_id, modulo)
+    )''',
+    'CREATE INDEX IF NOT EXISTS idx_permissoes_user_id ON permissoes_usuarios(user_id)',
+    'CREATE INDEX IF NOT EXISTS idx_permissoes_modulo ON permissoes_usuarios(modulo)',
+    'CREATE INDEX IF NOT EXISTS idx_permissoes_ativo ON permissoes_usuarios(ativo)',
+    '''CREATE TABLE IF NOT EXISTS transacoes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tipo TEXT NOT NULL,
+        descricao TEXT NOT NULL,
+        valor REAL NOT NULL,
+        data TEXT DEFAULT CURRENT_DATE,
+        usuario_id INTEGER,
+        FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS notas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        numero_nota TEXT NOT NULL,
+        nome TEXT NOT NULL,
+        assessor TEXT,
+        valor REAL NOT NULL,
+        data_emissao TEXT NOT NULL,
+        data_vencimento TEXT NOT NULL,
+        forma_pagamento TEXT,
+        valor_pago REAL DEFAULT 0,
+        pagamento_confirmado INTEGER DEFAULT 0
+    )''',
+]
+
+# Colunas que bancos antigos podem não ter
+COLUNAS_ADICIONAIS = [
+    ('usuarios', 'ativo', 'INTEGER DEFAULT 1'),
+    ('emendas', 'cidade', 'TEXT'),
+    ('emendas', 'quem_vai_executar', 'TEXT'),
+]
+
+SQL_HISTORICO = '''CREATE TABLE IF NOT EXISTS migracoes_historico (
+    versao INTEGER PRIMARY KEY,
+    descricao TEXT NOT NULL,
+    aplicada_em TEXT NOT NULL,
+    segundos REAL NOT NULL
+)'''
+
+def _colunas(conn, tabela):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({tabela})')}
+
+def _existe_tabela(conn, tabela):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                        (tabela,)).fetchone() is not None
+
+def _esquema_base(conn):
+    """Tabelas dos módulos e colunas que faltam em bancos antigos"""
+    for sql in SQL_ESQUEMA_BASE:
+        conn.execute(sql)
+    for tabela, coluna, tipo in COLUNAS_ADICIONAIS:
+        if coluna not in _colunas(conn, tabela):
+            conn.execute(f'ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo}')
+            if coluna == 'ativo':
+                conn.execute('UPDATE usuarios SET ativo = 1')
+
+def _coluna_senha(conn):
+    """Bancos antigos guardam o hash na coluna password"""
+    colunas = _colunas(conn, 'usuarios')
+    if 'password' not in colunas:
+        return
+    if 'senha' not in colunas:
+        conn.execute('ALTER TABLE usuarios RENAME COLUMN password TO senha')
+        return
+    conn.execute("UPDATE usuarios SET senha = password WHERE coalesce(senha, '') = ''")
+    conn.execute('ALTER TABLE usuarios DROP COLUMN password')
+
+def _unificar_permissoes(conn):
+    """Copia usuario_permissoes (scripts antigos) para permissoes_usuarios e a remove"""
+    if not _existe_tabela(conn, 'usuario_permissoes'):
+        return
+    # Onde as duas tabelas têm o mesmo usuário e módulo, vale permissoes_usuarios,
+    # que é a tabela lida pelo sistema
+    conn.execute('''
+        INSERT INTO permissoes_usuarios
+            (user_id, modulo, pode_ver, pode_adicionar, pode_editar, pode_excluir, ativo)
+        SELECT p.usuario_id, p.modulo, coalesce(p.pode_ver, 0), coalesce(p.pode_adicionar, 0),
+               coalesce(p.pode_editar, 0), coalesce(p.pode_excluir, 0), 1
+        FROM usuario_permissoes p
+        JOIN usuarios u ON u.id = p.usuario_id
+        WHERE true
+        ON CONFLICT (user_id, modulo) DO NOTHING
+    ''')
+    conn.execute('DROP TABLE usuario_permissoes')
+
+def _administrador_inicial(conn):
+    """Em um banco sem usuários, cria o admin padrão com acesso a todos os módulos"""
+    if conn.execute('SELECT 1 FROM usuarios LIMIT 1').fetchone():
+        return
+    cursor = conn.execute(
+        'INSERT INTO usuarios (username, nome, email, senha, ativo) VALUES (?, ?, ?, ?, 1)',
+        ('admin', 'Administrador', 'admin@sistema.com', senhas.gerar_hash('admin123')))
+    conn.executemany('''
+        INSERT INTO permissoes_usuarios
+            (user_id, modulo, pode_ver, pode_adicionar, pode_editar, pode_excluir, ativo)
+        VALUES (?, ?, 1, 1, 1, 1, 1)
+    ''', [(cursor.lastrowid, modulo) for modulo in MODULOS])
+
+def _indices_permissoes(conn):
+    """Remove índices de permissoes_usuarios cobertos por UNIQUE(user_id, modulo)
+
+    idx_permissoes_modulo e idx_permissoes_ativo têm poucos valores distintos e
+    nenhuma consulta os usa; os três só encareciam inserções em lote.
+    """
+    for indice in ('idx_permissoes_user_id', 'idx_permissoes_modulo', 'idx_permissoes_ativo'):
+        conn.execute(f'DROP INDEX IF EXISTS {indice}')
+
+def _indices_consultas(conn):
+    """Índices apontados pelo verificar_planos.py: filtros das listagens e
+    a lista de usuários (ORDER BY nome ordenava em B-tree temporária)"""
+    criar_indices_filtros(conn)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_usuarios_nome ON usuarios(nome)')
+
+# (versão, descrição, função). Só acrescente no final: a versão gravada no
+# banco diz quais já foram aplicadas
+MIGRACOES = [
+    (1, 'Esquema base dos módulos', _esquema_base),
+    (2, 'Coluna senha em usuarios', _coluna_senha),
+    (3, 'Permissões unificadas em permissoes_usuarios', _unificar_permissoes),
+    (4, 'Usuário administrador inicial', _administrador_inicial),
+    (5, 'Índices das listagens', criar_indices_listagens),
+    (6, 'Índices de busca (FTS5)', criar_indices_busca),
+    (7, 'Versões do cache de usuários', criar_versoes_cache),
+    (8, 'Contadores do painel de demandas', criar_contadores),
+    (9, 'Resumos financeiros de emendas', criar_resumos),
+    (10, 'Índice de aniversários', criar_indice_aniversarios),
+    (11, 'Índice e versão da agenda', criar_indices_calendario),
+    (12, 'Índices redundantes de permissões removidos', _indices_permissoes),
+    (13, 'Permissões em máscara de bits (usuarios.permissoes)', converter_permissoes_legadas),
+    (14, 'Índices dos filtros de emendas e da lista de usuários', _indices_consultas),
+    (15, 'Versões de emendas, demandas e contatos (ETag das páginas)', criar_versoes_paginas),
+    (16, 'Chave única (numero, ano) das emendas para a importação', criar_chave_unica),
+]
+VERSAO_ATUAL = MIGRACOES[-1][0]
+
+def versao_banco(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+@contextmanager
+def _trava(caminho):
+    """Trava exclusiva entre processos (vários workers iniciando juntos)"""
+    with open(caminho, 'a+b') as arquivo:
+        if fcntl:
+            fcntl.flock(arquivo, fcntl.LOCK_EX)
+        else:
+            arquivo.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(arquivo.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK desiste após ~10 s
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(arquivo, fcntl.LOCK_UN)
+            else:
+                arquivo.seek(0)
+                msvcrt.locking(arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+def pendentes(conn):
+    """Migrações ainda não aplicadas ao banco"""
+    versao = versao_banco(conn)
+    if versao > VERSAO_ATUAL:
+        raise RuntimeError(f'Banco na versão {versao}, mais nova que a desta '
+                           f'aplicação ({VERSAO_ATUAL})')
+    return [m for m in MIGRACOES if m[0] > versao]
+
+def migrar(database=DATABASE, ao_iniciar=None):
+    """Aplica as migrações pendentes e retorna [(versao, descricao, segundos)]
+
+    Com o banco em dia, custa uma leitura de PRAGMA user_version. Senão, os
+    passos rodam sob uma trava de arquivo e em uma única transação: se um
+    falhar, nada é gravado. `ao_iniciar(versao, descricao)` é chamada antes
+    de cada passo.
+    """
+    conn = sqlite3.connect(database, isolation_level=None, timeout=30)
+    try:
+        if versao_banco(conn) == VERSAO_ATUAL:
+            return []
+        with _trava(os.path.abspath(database) + '.migracao.lock'):
+            # Outro processo pode ter migrado enquanto esperávamos a trava
+            passos = pendentes(conn)
+            if not passos:
+                return []
+            aplicadas = []
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute(SQL_HISTORICO)
+                for versao, descricao, funcao in passos:
+                    if ao_iniciar:
+                        ao_iniciar(versao, descricao)
+                    inicio = time.perf_counter()
+                    funcao(conn)
+                    segundos = time.perf_counter() - inicio
+                    conn.execute('INSERT OR REPLACE INTO migracoes_historico '
+                                 '(versao, descricao, aplicada_em, segundos) VALUES (?, ?, ?, ?)',
+                                 (versao, descricao, datetime.now().isoformat(timespec='seconds'),
+                                  round(segundos, 3)))
+                    aplicadas.append((versao, descricao, segundos))
+                conn.execute(f'PRAGMA user_version = {passos[-1][0]}')
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            return aplicadas
+    finally:
+        conn.close()
+
+def main():
+    """Linha de comando: python migracoes.py [--banco sistema.db] [--status]"""
+    parser = argparse.ArgumentParser(description='Migrações do banco de dados')
+    parser.add_argument('--banco', default=DATABASE)
+    parser.add_argument('--status', action='store_true',
+                        help='mostra a versão e o histórico sem migrar')
+    args = parser.parse_args()
+
+    if args.status:
+        conn = sqlite3.connect(args.banco)
+        try:
+            print(f"📋 Banco na versão {versao_banco(conn)} (aplicação: {VERSAO_ATUAL})")
+            if _existe_tabela(conn, 'migracoes_historico'):
+                for versao, descricao, quando, segundos in conn.execute(
+                        'SELECT versao, descricao, aplicada_em, segundos '
+                        'FROM migracoes_historico ORDER BY versao'):
+                    print(f"   ✅ {versao:>3} {descricao} ({quando}, {segundos:.3f}s)")
+            for versao, descricao, _ in pendentes(conn):
+                print(f"   ⏳ {versao:>3} {descricao}")
+        finally:
+            conn.close()
+        return
+
+    inicio = time.perf_counter()
+    aplicadas = migrar(args.banco, lambda versao, descricao:
+                       print(f"🔧 {versao:>3} {descricao}...", flush=True))
+    if not aplicadas:
+        print(f"✅ Banco já está na versão {VERSAO_ATUAL}")
+        return
+    print("\n⏱️  Tempo por migração:")
+    for versao, descricao, segundos in aplicadas:
+        print(f"   {versao:>3} {descricao:<45} {segundos:8.3f}s")
+    print(f"✅ Banco migrado para a versão {VERSAO_ATUAL} "
+          f"em {time.perf_counter() - inicio:.2f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+# permissoes.py - Permissões dos usuários em uma máscara de bits por usuário
+import sys
+import threading
+from array import array
+
+# A posição de cada módulo e ação define o bit: só acrescente no final
+MODULOS = ['agenda', 'contatos', 'emendas', 'demandas', 'cidades', 'grupos', 'usuarios']
+ACOES = ['ver', 'adicionar', 'editar', 'excluir']
+ADMINISTRADOR = 'admin'
+
+# bit = indice_do_modulo * 4 + indice_da_acao (7 módulos x 4 ações = 28 bits)
+BITS = {(modulo, acao): 1 << (i * len(ACOES) + j)
+        for i, modulo in enumerate(MODULOS) for j, acao in enumerate(ACOES)}
+TODAS = (1 << len(MODULOS) * len(ACOES)) - 1
+
+def mascara_modulo(modulo):
+    """Bits de todas as ações de um módulo"""
+    return sum(BITS[(modulo, acao)] for acao in ACOES)
+
+# Permissão padrão: só visualização, exceto no módulo de usuários
+PADRAO = sum(BITS[(modulo, 'ver')] for modulo in MODULOS if modulo != 'usuarios')
+# Quem tem estas ações no módulo de usuários é administrador
+ADMIN_USUARIOS = sum(BITS[('usuarios', acao)] for acao in ('adicionar', 'editar', 'excluir'))
+
+def tem(mascara, modulo, acao='ver'):
+    """Testa o bit da ação no módulo (módulo ou ação desconhecidos: False)"""
+    return bool(mascara & BITS.get((modulo, acao), 0))
+
+def de_formulario(dados):
+    """Máscara a partir de chaves '<modulo>_<acao>' (ex.: 'agenda_ver') verdadeiras"""
+    return sum(bit for (modulo, acao), bit in BITS.items() if dados.get(f'{modulo}_{acao}'))
+
+def para_dicionario(mascara):
+    """{modulo: {'pode_ver': bool, ...}} dos módulos com alguma permissão"""
+    return {
+        modulo: {f'pode_{acao}': tem(mascara, modulo, acao) for acao in ACOES}
+        for modulo in MODULOS if mascara & mascara_modulo(modulo)
+    }
+
+class TabelaPermissoes:
+    """Máscaras de todos os usuários em um array indexado pelo id
+
+    É recarregada inteira quando a versão de usuarios (cache_versoes) muda;
+    consultar uma permissão é um acesso ao array e um teste de bit.
+    """
+
+    def __init__(self):
+        self._mascaras = array('L')
+        self._versao = None
+        self._lock = threading.Lock()
+
+    def atualizada(self, versao):
+        """Se a tabela já reflete a versão `versao` (None: versão desconhecida)"""
+        return versao is not None and self._versao is not None and self._versao >= versao
+
+    def carregar(self, conn, versao):
+        maximo = conn.execute('SELECT coalesce(max(id), 0) FROM usuarios').fetchone()[0]
+        mascaras = array('L', bytes(array('L').itemsize * (maximo + 1)))
+        # Usuários inativos ficam sem permissões, mesmo com a sessão aberta
+        for user_id, mascara in conn.execute(
+                'SELECT id, permissoes FROM usuarios WHERE ativo = 1 AND permissoes <> 0'):
+            mascaras[user_id] = mascara & TODAS
+        with self._lock:
+            # Uma carga mais antiga não substitui uma mais nova
+            if versao is None or self._versao is None or versao >= self._versao:
+                self._mascaras = mascaras
+                self._versao = versao
+
+    def mascara(self, user_id):
+        mascaras = self._mascaras
+        return mascaras[user_id] if 0 <= user_id < len(mascaras) else 0
+
+def converter_permissoes_legadas(conn):
+    """Grava usuarios.permissoes a partir das tabelas de uma linha por módulo
+
+    Lê permissoes_usuarios (linhas ativas) e usuario_permissoes, as que
+    existirem, e as remove. Usada pelas migrações; não faz commit.
+    """
+    colunas = {row[1] for row in conn.execute('PRAGMA table_info(usuarios)')}
+    if 'permissoes' not in colunas:
+        conn.execute('ALTER TABLE usuarios ADD COLUMN permissoes INTEGER NOT NULL DEFAULT 0')
+
+    tabelas = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    origens = [(tabela, coluna, filtro) for tabela, coluna, filtro in (
+        ('permissoes_usuarios', 'user_id', 'AND ativo = 1'),
+        ('usuario_permissoes', 'usuario_id', ''),
+    ) if tabela in tabelas]
+    if origens:
+        # UNION descarta o mesmo (usuário, módulo, ação) vindo das duas tabelas
+        pares = ' UNION '.join(
+            f'SELECT {coluna}, modulo, {j} FROM {tabela} WHERE pode_{acao} {filtro}'
+            for tabela, coluna, filtro in origens for j, acao in enumerate(ACOES))
+        modulos = ', '.join(f"('{modulo}', {i})" for i, modulo in enumerate(MODULOS))
+        conn.execute(f'''
+            WITH pares(user_id, modulo, acao) AS ({pares}),
+                 modulos(modulo, indice) AS (VALUES {modulos})
+            UPDATE usuarios SET permissoes = m.mascara
+            FROM (SELECT p.user_id, sum(1 << (m.indice * {len(ACOES)} + p.acao)) AS mascara
+                  FROM pares p JOIN modulos m ON m.modulo = p.modulo
+                  GROUP BY p.user_id) AS m
+            WHERE usuarios.id = m.user_id
+        ''')
+    for tabela, _, _ in origens:
+        conn.execute(f'DROP TABLE {tabela}')
+
+def _sql_semeada():
+    """Máscara após a semeadura: o admin recebe tudo; os demais, o padrão de
+    cada módulo em que não têm nenhuma permissão"""
+    partes = ' | '.join(
+        f'CASE WHEN permissoes & {mascara_modulo(modulo)} = 0 '
+        f'THEN {PADRAO & mascara_modulo(modulo)} ELSE 0 END'
+        for modulo in MODULOS if PADRAO & mascara_modulo(modulo))
+    return f'CASE WHEN username = :admin THEN {TODAS} ELSE permissoes | {partes} END'
+
+def semear_permissoes(conn, simular=False):
+    """Dá as permissões padrão a todos os usuários em um único UPDATE
+
+    Com `simular`, só conta. Retorna {'usuarios', 'alterados'}.
+    """
+    parametros = {'admin': ADMINISTRADOR}
+    if simular:
+        usuarios, alterados = conn.execute(
+            f'SELECT count(*), count(*) FILTER (WHERE {_sql_semeada()} <> permissoes) '
+            f'FROM usuarios', parametros).fetchone()
+        return {'usuarios': usuarios, 'alterados': alterados}
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        usuarios = conn.execute('SELECT count(*) FROM usuarios').fetchone()[0]
+        alterados = conn.execute(
+            f'UPDATE usuarios SET permissoes = {_sql_semeada()} '
+            f'WHERE {_sql_semeada()} <> permissoes', parametros).rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return {'usuarios': usuarios, 'alterados': alterados}
+
+def main():
+    """Linha de comando: python permissoes.py semear [--simular]"""
+    import auth
+    from migracoes import migrar
+
+    if len(sys.argv) < 2 or sys.argv[1] != 'semear':
+        print("Uso: python permissoes.py semear [--simular]")
+        sys.exit(1)
+    simular = '--simular' in sys.argv[2:]
+
+    migrar(auth.DATABASE)
+    conn = auth.conectar_db()
+    try:
+        contagem = semear_permissoes(conn, simular)
+    finally:
+        auth.devolver_db(conn)
+
+    prefixo = "🔍 Simulação: seriam alterados" if simular else "✅ Alterados"
+    print(f"{prefixo} {contagem['alterados']} de {contagem['usuarios']} usuário(s)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+# registro_templates.py - Templates em memória compilados uma única vez
+
+from jinja2 import ChoiceLoader, DictLoader
+
+def registrar_templates(app, templates, recarregar=None):
+    """Registra templates em memória na aplicação e os compila na inicialização
+
+    `templates` é um dicionário nome -> código fonte. Os templates compilados
+    ficam no cache do Jinja e cada requisição apenas preenche as variáveis.
+    Arquivos com o mesmo nome na pasta templates/ da aplicação têm
+    precedência sobre as versões em memória.
+
+    Com `recarregar=True` (ou com o app em modo debug, quando `recarregar` é
+    None) o Jinja verifica a cada renderização se a fonte mudou e recompila
+    apenas o template alterado.
+    """
+    carregadores = [DictLoader(templates)]
+    if app.jinja_loader is not None:
+        carregadores.insert(0, app.jinja_loader)
+    app.jinja_loader = ChoiceLoader(carregadores)
+
+    if recarregar is not None:
+        app.config['TEMPLATES_AUTO_RELOAD'] = recarregar
+        app.jinja_env.auto_reload = recarregar
+
+    compilados = {}
+    for nome in templates:
+        compilados[nome] = app.jinja_env.get_template(nome)
+    return compilados
@@ -0,0 +1,220 @@
+# resumos.py - Totais financeiros das emendas em tabelas de resumo atualizadas por deltas
+import sys
+
+# Dimensões dos resumos; cada uma é totalizada também por ano
+DIMENSOES = ['ano', 'regiao', 'cidade', 'situacao', 'assessor']
+COLUNAS_LOG = ['ano', 'regiao', 'cidade', 'situacao', 'assessor', 'valor', 'valor_pago']
+# Diferença tolerada nos valores ao comparar com a tabela base (arredondamento)
+TOLERANCIA = 0.005
+# Com mais alterações pendentes que isto no log, o relatório aplica o log antes
+# de ler (senão cada consulta somaria o log inteiro)
+LIMITE_LOG = 1000
+
+def _chave(dimensao, tabela):
+    """Expressão da chave da dimensão; valores nulos viram ''"""
+    return f"coalesce(CAST({tabela}.{dimensao} AS TEXT), '')"
+
+SQL_RESUMOS = [
+    '''CREATE TABLE IF NOT EXISTS emendas_resumos (
+        dimensao TEXT NOT NULL,
+        ano INTEGER NOT NULL,
+        chave TEXT NOT NULL,
+        quantidade INTEGER NOT NULL,
+        valor REAL NOT NULL,
+        valor_pago REAL NOT NULL,
+        PRIMARY KEY (dimensao, ano, chave)
+    ) WITHOUT ROWID''',
+    # Cada alteração em emendas grava aqui a linha antiga (sinal -1) e/ou a
+    # nova (+1); atualizar_resumos aplica o log agrupado e o esvazia
+    f'''CREATE TABLE IF NOT EXISTS emendas_resumos_log (
+        id INTEGER PRIMARY KEY,
+        sinal INTEGER NOT NULL,
+        {", ".join(COLUNAS_LOG)}
+    )''',
+    f'''CREATE TRIGGER IF NOT EXISTS emendas_resumos_ai AFTER INSERT ON emendas BEGIN
+        INSERT INTO emendas_resumos_log (sinal, {", ".join(COLUNAS_LOG)})
+        VALUES (1, {", ".join(f"new.{c}" for c in COLUNAS_LOG)});
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS emendas_resumos_ad AFTER DELETE ON emendas BEGIN
+        INSERT INTO emendas_resumos_log (sinal, {", ".join(COLUNAS_LOG)})
+        VALUES (-1, {", ".join(f"old.{c}" for c in COLUNAS_LOG)});
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS emendas_resumos_au AFTER UPDATE OF {", ".join(COLUNAS_LOG)} ON emendas BEGIN
+        INSERT INTO emendas_resumos_log (sinal, {", ".join(COLUNAS_LOG)})
+        VALUES (-1, {", ".join(f"old.{c}" for c in COLUNAS_LOG)}),
+               (1, {", ".join(f"new.{c}" for c in COLUNAS_LOG)});
+    END''',
+]
+
+def criar_resumos(conn):
+    """Cria as tabelas de resumo e os triggers e calcula os resumos
+
+    Usada pelas migrações; não faz commit.
+    """
+    for sql in SQL_RESUMOS:
+        conn.execute(sql)
+    _recalcular(conn)
+
+def _agregar(dimensao, origem, sinal='1', where=''):
+    """SELECT que agrega `origem` na granularidade (dimensao, ano, chave)"""
+    return f'''
+        SELECT '{dimensao}', coalesce({origem}.ano, 0), {_chave(dimensao, origem)},
+               sum({sinal}), sum({sinal} * coalesce({origem}.valor, 0)),
+               sum({sinal} * coalesce({origem}.valor_pago, 0))
+        FROM {origem} {where}
+        GROUP BY 2, 3'''
+
+def atualizar_resumos(conn):
+    """Aplica aos resumos apenas as alterações registradas no log
+
+    Retorna o número de linhas do log aplicadas (0 se já estava em dia).
+    """
+    if not conn.execute('SELECT 1 FROM emendas_resumos_log LIMIT 1').fetchone():
+        return 0
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        ultimo, total = conn.execute(
+            'SELECT max(id), count(*) FROM emendas_resumos_log').fetchone()
+        for dimensao in DIMENSOES:
+            conn.execute(f'''
+                INSERT INTO emendas_resumos (dimensao, ano, chave, quantidade, valor, valor_pago)
+                {_agregar(dimensao, 'emendas_resumos_log', 'sinal', 'WHERE id <= ?')}
+                ON CONFLICT (dimensao, ano, chave) DO UPDATE SET
+                    quantidade = quantidade + excluded.quantidade,
+                    valor = round(valor + excluded.valor, 2),
+                    valor_pago = round(valor_pago + excluded.valor_pago, 2)
+            ''', (ultimo,))
+        conn.execute('DELETE FROM emendas_resumos WHERE quantidade = 0')
+        conn.execute('DELETE FROM emendas_resumos_log WHERE id <= ?', (ultimo,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return total or 0
+
+def _recalcular(conn):
+    """Apaga os resumos e o log e agrega novamente a tabela emendas"""
+    conn.execute('DELETE FROM emendas_resumos')
+    conn.execute('DELETE FROM emendas_resumos_log')
+    for dimensao in DIMENSOES:
+        conn.execute(f'''
+            INSERT INTO emendas_resumos (dimensao, ano, chave, quantidade, valor, valor_pago)
+            {_agregar(dimensao, 'emendas')}
+        ''')
+    conn.execute('UPDATE emendas_resumos SET valor = round(valor, 2), '
+                 'valor_pago = round(valor_pago, 2)')
+
+def reconstruir_resumos(conn):
+    """Recalcula todos os resumos a partir da tabela emendas"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        _recalcular(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def verificar_resumos(conn):
+    """Compara os resumos com a agregação da tabela base
+
+    Aplica o log pendente antes de comparar. Retorna a lista de divergências
+    (dimensao, ano, chave, resumo, base), onde resumo/base são
+    (quantidade, valor, valor_pago) ou None.
+    """
+    atualizar_resumos(conn)
+    divergencias = []
+    for dimensao in DIMENSOES:
+        base = {(r[1], r[2]): tuple(r[3:]) for r in conn.execute(_agregar(dimensao, 'emendas'))}
+        resumo = {(r[0], r[1]): tuple(r[2:]) for r in conn.execute(
+            'SELECT ano, chave, quantidade, valor, valor_pago FROM emendas_resumos '
+            'WHERE dimensao = ?', (dimensao,))}
+        for chave in base.keys() | resumo.keys():
+            a, b = resumo.get(chave), base.get(chave)
+            if a is None or b is None or a[0] != b[0] or \
+                    abs(a[1] - b[1]) > TOLERANCIA or abs(a[2] - b[2]) > TOLERANCIA:
+                divergencias.append((dimensao, chave[0], chave[1], a, b))
+    return divergencias
+
+def relatorio(conn, dimensao, ano=None):
+    """Totais de valor e valor pago por valor da dimensão, lidos dos resumos
+
+    O log pendente entra somado aos resumos na própria consulta, sem a trava
+    de escrita que atualizar_resumos precisa. Só quando o log passa de
+    LIMITE_LOG linhas (gravações fora da importação, que já o aplica) o
+    relatório o aplica antes de ler.
+    """
+    if dimensao not in DIMENSOES:
+        raise ValueError(f'Dimensão não suportada: {dimensao}')
+    # Pelo id (rowid) o tamanho sai sem percorrer o log; ids apagados só o superestimam
+    pendentes = conn.execute(
+        'SELECT coalesce(max(id) - min(id) + 1, 0) FROM emendas_resumos_log').fetchone()[0]
+    if pendentes > LIMITE_LOG:
+        atualizar_resumos(conn)
+
+    sql = f'''
+        SELECT chave, sum(quantidade) AS quantidade, round(sum(valor), 2) AS valor,
+               round(sum(valor_pago), 2) AS valor_pago
+        FROM (
+            SELECT ano, chave, quantidade, valor, valor_pago
+            FROM emendas_resumos WHERE dimensao = ?
+            UNION ALL
+            SELECT coalesce(ano, 0), {_chave(dimensao, 'emendas_resumos_log')}, sinal,
+                   sinal * coalesce(valor, 0), sinal * coalesce(valor_pago, 0)
+            FROM emendas_resumos_log
+        )'''
+    params = [dimensao]
+    if ano is not None:
+        sql += ' WHERE ano = ?'
+        params.append(ano)
+    sql += ' GROUP BY chave HAVING sum(quantidade) != 0 ORDER BY valor DESC, chave'
+
+    cursor = conn.execute(sql, params)
+    nomes = [d[0] for d in cursor.description]
+    linhas = [dict(zip(nomes, row)) for row in cursor]
+    for linha in linhas:
+        linha['saldo'] = round(linha['valor'] - linha['valor_pago'], 2)
+    return {
+        'dimensao': dimensao,
+        'ano': ano,
+        'linhas': linhas,
+        'total': {
+            'quantidade': sum(l['quantidade'] for l in linhas),
+            'valor': round(sum(l['valor'] for l in linhas), 2),
+            'valor_pago': round(sum(l['valor_pago'] for l in linhas), 2),
+        },
+    }
+
+def main():
+    """Linha de comando: python resumos.py atualizar|reconstruir|verificar"""
+    import auth
+    from migracoes import migrar
+
+    comando = sys.argv[1] if len(sys.argv) > 1 else None
+    if comando not in ('atualizar', 'reconstruir', 'verificar'):
+        print("Uso: python resumos.py atualizar|reconstruir|verificar")
+        sys.exit(1)
+
+    migrar(auth.DATABASE)
+    conn = auth.conectar_db()
+    try:
+        if comando == 'atualizar':
+            print(f"✅ {atualizar_resumos(conn)} alteração(ões) aplicada(s) aos resumos")
+        elif comando == 'reconstruir':
+            print("🔧 Reconstruindo resumos de emendas...")
+            reconstruir_resumos(conn)
+            print("✅ Resumos reconstruídos")
+        else:
+            divergencias = verificar_resumos(conn)
+            for dimensao, ano, chave, resumo, base in divergencias[:20]:
+                print(f"⚠️  {dimensao} {ano} '{chave}': resumo={resumo} base={base}")
+            if divergencias:
+                print(f"❌ {len(divergencias)} divergência(s); "
+                      f"use 'python resumos.py reconstruir'")
+                sys.exit(2)
+            print("✅ Resumos conferem com a tabela emendas")
+    finally:
+        auth.devolver_db(conn)
+
+if __name__ == '__main__':
+    main()
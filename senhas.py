@@ -0,0 +1,169 @@
+# senhas.py - Serviço de senhas: hash com KDF (scrypt) em um pool de threads limitado
+import hashlib
+import hmac
+import re
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Custo do scrypt: N (CPU/memória, potência de 2), r (tamanho do bloco), p (paralelismo).
+# Cada verificação usa 128 * N * r bytes (32 MB com os valores padrão).
+SCRYPT_N = 2 ** 15
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+# Verificações simultâneas e pedidos aguardando na fila; acima disso o
+# login é recusado na hora em vez de prender a thread da requisição
+TRABALHADORES = 4
+FILA_MAX = 64
+TIMEOUT = 10.0
+
+# Hashes antigos do auth.py: SHA-256 sem sal, em hexadecimal
+_HASH_LEGADO = re.compile(r'[0-9a-f]{64}')
+
+class ServicoSenhasOcupado(Exception):
+    """Muitas verificações de senha pendentes; tente novamente em instantes"""
+
+_executor = None
+_vagas = None
+_lock = threading.Lock()
+_hash_ficticio = {}
+_estatisticas = {'verificacoes': 0, 'hashes_gerados': 0, 'atualizados': 0,
+                 'recusados': 0, 'tempo_kdf': 0.0}
+
+def configurar(n=None, r=None, p=None, trabalhadores=None, fila_max=None, timeout=None):
+    """Altera os parâmetros de custo e o tamanho do pool
+
+    Hashes gravados com outro custo continuam válidos e são regravados com
+    o custo atual no próximo login bem-sucedido.
+    """
+    global SCRYPT_N, SCRYPT_R, SCRYPT_P, TRABALHADORES, FILA_MAX, TIMEOUT, _executor
+    if n is not None:
+        if n < 2 or n & (n - 1):
+            raise ValueError('SCRYPT_N deve ser uma potência de 2')
+        SCRYPT_N = n
+    SCRYPT_R = r or SCRYPT_R
+    SCRYPT_P = p or SCRYPT_P
+    TIMEOUT = timeout or TIMEOUT
+    with _lock:
+        if trabalhadores or fila_max:
+            TRABALHADORES = trabalhadores or TRABALHADORES
+            FILA_MAX = fila_max if fila_max is not None else FILA_MAX
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+                _executor = None
+
+def metodo_atual():
+    """Método no formato do werkzeug, ex.: 'scrypt:32768:8:1'"""
+    return f'scrypt:{SCRYPT_N}:{SCRYPT_R}:{SCRYPT_P}'
+
+def eh_hash_legado(hash_armazenado):
+    """Indica se o hash é um SHA-256 sem sal do sistema antigo"""
+    return bool(hash_armazenado) and _HASH_LEGADO.fullmatch(hash_armazenado) is not None
+
+def precisa_atualizar(hash_armazenado):
+    """Indica se o hash deve ser regravado (legado ou com custo diferente do atual)"""
+    return eh_hash_legado(hash_armazenado) or not hash_armazenado.startswith(metodo_atual() + '$')
+
+def _obter_executor():
+    global _executor, _vagas
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=TRABALHADORES,
+                                           thread_name_prefix='senhas')
+            _vagas = threading.BoundedSemaphore(TRABALHADORES + FILA_MAX)
+        return _executor, _vagas
+
+def _executar(funcao, *args):
+    """Executa a função no pool e aguarda o resultado
+
+    hashlib.scrypt libera o GIL, então as threads do pool calculam em
+    paralelo enquanto as demais requisições seguem atendidas.
+    """
+    executor, vagas = _obter_executor()
+    if not vagas.acquire(blocking=False):
+        with _lock:
+            _estatisticas['recusados'] += 1
+        raise ServicoSenhasOcupado('Muitas verificações de senha em andamento')
+
+    def medir():
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args)
+        finally:
+            with _lock:
+                _estatisticas['tempo_kdf'] += time.perf_counter() - inicio
+
+    futuro = executor.submit(medir)
+    futuro.add_done_callback(lambda _: vagas.release())
+    try:
+        return futuro.result(TIMEOUT)
+    except TimeoutError:
+        with _lock:
+            _estatisticas['recusados'] += 1
+        raise ServicoSenhasOcupado('Tempo esgotado aguardando a verificação de senha')
+
+def _gerar(senha):
+    return generate_password_hash(senha, method=metodo_atual())
+
+def _verificar(senha, hash_armazenado):
+    if eh_hash_legado(hash_armazenado):
+        calculado = hashlib.sha256(senha.encode()).hexdigest()
+        return hmac.compare_digest(calculado, hash_armazenado)
+    try:
+        return check_password_hash(hash_armazenado, senha)
+    except ValueError:  # formato desconhecido
+        return False
+
+def _verificar_e_atualizar(senha, hash_armazenado):
+    valida = _verificar(senha, hash_armazenado)
+    novo_hash = None
+    if valida and precisa_atualizar(hash_armazenado):
+        novo_hash = _gerar(senha)
+    return valida, novo_hash
+
+def _verificar_ficticio(senha):
+    """Verifica contra o hash de uma senha aleatória, para usuários inexistentes"""
+    metodo = metodo_atual()
+    if metodo not in _hash_ficticio:
+        _hash_ficticio[metodo] = _gerar(secrets.token_hex(16))
+    _verificar(senha, _hash_ficticio[metodo])
+
+def gerar_hash(senha):
+    """Gera o hash da senha com o KDF e o custo atuais"""
+    resultado = _executar(_gerar, senha)
+    with _lock:
+        _estatisticas['hashes_gerados'] += 1
+    return resultado
+
+def verificar_senha(senha, hash_armazenado):
+    """Verifica a senha contra o hash gravado
+
+    Retorna (valida, novo_hash). `novo_hash` vem preenchido quando a senha é
+    válida mas o hash está desatualizado (SHA-256 legado ou outro custo) e
+    deve ser regravado pelo chamador. Com `hash_armazenado` None (usuário
+    inexistente) a verificação é feita contra um hash fictício, para que o
+    tempo de resposta não revele quais usuários existem.
+    """
+    if not hash_armazenado:
+        _executar(_verificar_ficticio, senha)
+        valida, novo_hash = False, None
+    else:
+        valida, novo_hash = _executar(_verificar_e_atualizar, senha, hash_armazenado)
+    with _lock:
+        _estatisticas['verificacoes'] += 1
+        if novo_hash:
+            _estatisticas['atualizados'] += 1
+    return valida, novo_hash
+
+def estatisticas():
+    """Contadores do serviço de senhas"""
+    with _lock:
+        dados = dict(_estatisticas)
+    dados['metodo'] = metodo_atual()
+    dados['trabalhadores'] = TRABALHADORES
+    dados['fila_max'] = FILA_MAX
+    return dados
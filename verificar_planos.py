@@ -0,0 +1,268 @@
+# verificar_planos.py - Confere o plano (EXPLAIN QUERY PLAN) das consultas do sistema em um banco grande
+import argparse
+import ast
+import glob
+import os
+import re
+import sqlite3
+import sys
+import threading
+from collections import Counter
+from urllib.parse import urlencode
+
+import auth
+import permissoes
+from consultas_lentas import normalizar, parametros_nulos
+from listagens import LISTAGENS
+
+# Tabelas com pelo menos tantas linhas no banco populado contam como grandes
+LINHAS_TABELA_GRANDE = 1000
+# Scripts que não rodam com o sistema (migrações e ferramentas)
+IGNORAR = ('benchmark_*.py', 'verificar_planos.py', 'migracoes.py', 'corrigir_login.py')
+# Consultas que leem a tabela inteira de propósito: trecho do SQL normalizado -> motivo
+ACEITAS = {
+    'SELECT * FROM "usuarios"': 'aquecimento do cache na inicialização',
+    'INDEXED BY': 'aquecimento do cache na inicialização',
+    'SELECT id, permissoes FROM usuarios WHERE ativo = ? AND permissoes <> ?':
+        'carga da tabela de permissões, feita só quando usuarios muda',
+    'SELECT id, username, nome, email, ativo, data_criacao FROM usuarios ORDER BY nome':
+        'lista todos os usuários em cache até usuarios mudar; o índice evita a ordenação',
+    'SELECT COUNT(*) as total_admins FROM usuarios': 'conferência feita só ao excluir um usuário',
+    'SELECT count(*) FROM usuarios': 'contagem da semeadura de permissões (comando manual)',
+    'GROUP BY numero, ano HAVING count(*)': 'conferência única antes de criar o índice (numero, ano)',
+    'emendas_resumos': 'os resumos têm uma linha por valor agregado, não por emenda',
+    'FROM emendas ORDER BY ano DESC, id DESC': 'a exportação sem filtro lê todas as emendas',
+}
+
+_COMANDOS = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT', 'REPLACE')
+
+def _eh_consulta(sql):
+    return sql.lstrip().split(None, 1)[0].upper().lstrip('(') in _COMANDOS if sql.strip() else False
+
+def coletar_do_codigo(pasta='.'):
+    """Consultas escritas como texto fixo nas chamadas a execute/executemany
+
+    Retorna ([(sql, origem)], quantidade de consultas montadas em tempo de
+    execução, que só aparecem na captura das rotas).
+    """
+    ignorados = {os.path.normpath(arquivo) for padrao in IGNORAR
+                 for arquivo in glob.glob(os.path.join(pasta, padrao))}
+    consultas = []
+    dinamicas = 0
+    for arquivo in sorted(glob.glob(os.path.join(pasta, '*.py'))):
+        if os.path.normpath(arquivo) in ignorados:
+            continue
+        with open(arquivo, encoding='utf-8') as f:
+            arvore = ast.parse(f.read(), arquivo)
+        constantes = {
+            alvo.id: no.value.value
+            for no in arvore.body if isinstance(no, ast.Assign)
+            and isinstance(no.value, ast.Constant) and isinstance(no.value.value, str)
+            for alvo in no.targets if isinstance(alvo, ast.Name)
+        }
+        for no in ast.walk(arvore):
+            if not (isinstance(no, ast.Call) and isinstance(no.func, ast.Attribute)
+                    and no.func.attr in ('execute', 'executemany') and no.args):
+                continue
+            argumento = no.args[0]
+            if isinstance(argumento, ast.Constant) and isinstance(argumento.value, str):
+                sql = argumento.value
+            elif isinstance(argumento, ast.Name) and argumento.id in constantes:
+                sql = constantes[argumento.id]
+            else:
+                dinamicas += 1
+                continue
+            if _eh_consulta(sql):
+                consultas.append((sql, f'{os.path.basename(arquivo)}:{no.lineno}'))
+    return consultas, dinamicas
+
+def rotas_verificadas(conn, app, admin_id):
+    """Rotas GET que cobrem as consultas montadas em tempo de execução"""
+    from calendario import VISOES, gerar_token
+    from resumos import DIMENSOES
+
+    rotas = ['/', '/agenda', '/contatos', '/emendas', '/demandas', '/usuarios',
+             '/busca?q=maria', '/api/busca?q=rua', '/api/aniversarios',
+             '/emendas/exportar?formato=csv',
+             f'/agenda/feed/{gerar_token(app.secret_key, admin_id)}.ics']
+    rotas += [f'/api/agenda?visao={visao}' for visao in VISOES]
+    rotas += [f'/api/emendas/resumo?por={dimensao}' for dimensao in DIMENSOES]
+    rotas.append('/api/emendas/resumo?por=regiao&ano=2022')
+    for modulo, config in LISTAGENS.items():
+        rotas.append(f'/api/{modulo}')
+        valores = {}
+        for coluna in config.get('filtros', {}):
+            row = conn.execute(f"SELECT {coluna} FROM {modulo} WHERE {coluna} <> '' "
+                               f"LIMIT 1").fetchone()
+            if row:
+                valores[coluna] = row[0]
+                rotas.append(f'/api/{modulo}?{urlencode({coluna: row[0]})}')
+        if len(valores) > 1:
+            rotas.append(f'/api/{modulo}?{urlencode(dict(list(valores.items())[:2]))}')
+    return rotas
+
+def capturar_das_rotas(database):
+    """Executa as rotas com um trace nas conexões do pool e retorna [(sql, origem)]"""
+    from flask import has_request_context, request
+
+    capturadas = []
+    lock = threading.Lock()
+
+    def registrar(sql):
+        if _eh_consulta(sql):
+            origem = f'GET {request.path}' if has_request_context() else 'inicialização'
+            with lock:
+                capturadas.append((sql, origem))
+
+    auth.DATABASE = database
+    auth.obter_pool().ao_conectar.append(lambda conn: conn.set_trace_callback(registrar))
+    from Mandato import app
+
+    conn = sqlite3.connect(database)
+    try:
+        admin = auth.obter_usuario(permissoes.ADMINISTRADOR)
+        rotas = rotas_verificadas(conn, app, admin['id'])
+    finally:
+        conn.close()
+
+    cliente = app.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao.update(logged_in=True, user_id=admin['id'], username=admin['username'])
+    for rota in rotas:
+        resposta = cliente.get(rota, buffered=True)
+        if resposta.status_code >= 400:
+            print(f"⚠️  {rota} respondeu {resposta.status_code}")
+        # Segunda página das listagens: a consulta com o cursor é outra
+        if rota.startswith('/api/') and resposta.is_json:
+            proximo = (resposta.get_json() or {}).get('proximo')
+            if proximo:
+                separador = '&' if '?' in rota else '?'
+                cliente.get(f'{rota}{separador}{urlencode({"cursor": proximo})}', buffered=True)
+    return capturadas
+
+def explicar(conn, sql):
+    """Linhas de detalhe do EXPLAIN QUERY PLAN"""
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', parametros_nulos(sql))]
+
+def avaliar(sql, plano, tamanhos):
+    """Problemas do plano: tabela grande percorrida inteira, ordenação em
+    B-tree temporária ou índice automático"""
+    grandes = {t for t, n in tamanhos.items() if n >= LINHAS_TABELA_GRANDE}
+    tabelas = {m.group(1) for linha in plano for m in [re.match(r'(?:SCAN|SEARCH) (\w+)', linha)]
+               if m}
+    # Sem WHERE, percorrer um índice na ordem pedida até o LIMIT lê só as
+    # linhas devolvidas; com WHERE, pode ler o índice inteiro atrás das que passam
+    limitada = (re.search(r'\bLIMIT\b', sql, re.IGNORECASE) is not None
+                and re.search(r'\bWHERE\b', sql, re.IGNORECASE) is None)
+    problemas = []
+    for linha in plano:
+        encontrado = re.match(r'SCAN (\w+)(.*)', linha)
+        if encontrado and encontrado.group(1) in grandes and 'VIRTUAL TABLE' not in linha:
+            if limitada:
+                continue
+            tabela = encontrado.group(1)
+            problemas.append(f'percorre {tabela} inteira ({tamanhos[tabela]} linhas): {linha}')
+        elif linha.startswith('USE TEMP B-TREE') and tabelas & grandes:
+            problemas.append(f'ordena em B-tree temporária: {linha}')
+        elif 'AUTOMATIC' in linha:
+            problemas.append(f'cria índice automático a cada execução: {linha}')
+    return problemas
+
+def indices_usados(plano):
+    return [m.group(1) for linha in plano
+            for m in [re.search(r'USING (?:COVERING )?INDEX (\w+)', linha)] if m]
+
+def verificar(database, consultas):
+    """Explica as consultas (agrupadas pelo SQL normalizado) e retorna o relatório"""
+    agrupadas = {}
+    for sql, origem in consultas:
+        chave = normalizar(sql)
+        if chave not in agrupadas:
+            agrupadas[chave] = {'sql': sql, 'origens': []}
+        if origem not in agrupadas[chave]['origens']:
+            agrupadas[chave]['origens'].append(origem)
+
+    conn = sqlite3.connect(f'file:{database}?mode=ro', uri=True)
+    try:
+        tamanhos = {}
+        for (tabela,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' "
+                                      "AND sql NOT LIKE 'CREATE VIRTUAL%'"):
+            tamanhos[tabela] = conn.execute(f'SELECT count(*) FROM "{tabela}"').fetchone()[0]
+        indices = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' ORDER BY tbl_name, name")]
+
+        uso = Counter()
+        for chave, consulta in agrupadas.items():
+            try:
+                consulta['plano'] = explicar(conn, consulta['sql'])
+            except sqlite3.Error as e:
+                consulta['plano'] = []
+                consulta['erro'] = str(e)
+                continue
+            uso.update(set(indices_usados(consulta['plano'])))
+            consulta['problemas'] = avaliar(consulta['sql'], consulta['plano'], tamanhos)
+            consulta['aceita'] = next((motivo for trecho, motivo in ACEITAS.items()
+                                       if trecho in chave), None)
+    finally:
+        conn.close()
+    return {'consultas': agrupadas, 'uso_indices': uso, 'indices': indices}
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Confere o plano de execução das consultas em um banco populado')
+    parser.add_argument('--carga', default='benchmark_carga.db',
+                        help='banco populado pelo benchmark_carga.py (gerado se não existir)')
+    parser.add_argument('--detalhes', action='store_true', help='mostra o plano de todas as consultas')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.carga):
+        from benchmark_carga import popular_banco
+        print(f"🔧 Populando {args.carga}...")
+        popular_banco(args.carga)
+
+    consultas, dinamicas = coletar_do_codigo()
+    print(f"📄 {len(consultas)} consultas no código ({dinamicas} montadas em tempo de execução)")
+    capturadas = capturar_das_rotas(args.carga)
+    print(f"🌐 {len(capturadas)} execuções capturadas nas rotas")
+    relatorio = verificar(args.carga, consultas + capturadas)
+    auth.obter_pool().fechar()
+
+    falhas = 0
+    for chave, consulta in relatorio['consultas'].items():
+        problemas = consulta.get('problemas', [])
+        if consulta.get('erro'):
+            marca = '⚠️ '
+        elif problemas and not consulta['aceita']:
+            marca = '❌'
+            falhas += 1
+        else:
+            marca = '✅'
+        if marca == '✅' and not args.detalhes:
+            continue
+        print("-" * 76)
+        print(f"{marca} {chave[:300]}")
+        print(f"   em: {', '.join(consulta['origens'][:4])}")
+        if consulta.get('erro'):
+            print(f"   não foi possível preparar: {consulta['erro']}")
+        for linha in consulta['plano']:
+            print(f"   | {linha}")
+        for problema in problemas:
+            print(f"   {'aceita' if consulta['aceita'] else 'problema'}: {problema}")
+        if problemas and consulta['aceita']:
+            print(f"   motivo: {consulta['aceita']}")
+
+    print("=" * 76)
+    print("Uso dos índices (consultas distintas que usam cada um)")
+    print("=" * 76)
+    for indice in relatorio['indices']:
+        quantidade = relatorio['uso_indices'].get(indice, 0)
+        print(f"   {indice:<50}{quantidade:>5}{'' if quantidade else '   (não usado)'}")
+
+    total = len(relatorio['consultas'])
+    if falhas:
+        print(f"❌ {falhas} de {total} consultas com plano ruim")
+        sys.exit(1)
+    print(f"✅ {total} consultas verificadas, nenhum plano ruim")
+
+if __name__ == '__main__':
+    main()